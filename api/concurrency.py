@@ -0,0 +1,67 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """No quedan huecos ni en ejecución ni en la cola de espera."""
+
+
+class QueueTimeoutError(Exception):
+    """La consulta esperó en cola más de `queue_timeout` segundos."""
+
+
+class QueryLimiter:
+    """
+    Limita el número de consultas RAG simultáneas por worker.
+    Las consultas que superan `max_concurrency` esperan en una cola de como mucho
+    `max_queue` peticiones durante `queue_timeout` segundos; `query_timeout` acota
+    la duración de cada consulta una vez obtiene hueco.
+    """
+    def __init__(self,
+                 max_concurrency: int = 8,
+                 max_queue: int = 64,
+                 queue_timeout: float = 30.0,
+                 query_timeout: float = 120.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.query_timeout = query_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls) -> "QueryLimiter":
+        return cls(
+            max_concurrency=int(os.getenv("RAG_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("RAG_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("RAG_QUEUE_TIMEOUT", "30")),
+            query_timeout=float(os.getenv("RAG_QUERY_TIMEOUT", "120")),
+        )
+
+    async def acquire(self):
+        """Reserva un hueco de ejecución, esperando en cola si es necesario."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise QueueFullError()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise QueueTimeoutError() from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,13 +1,174 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from rag.core import RAGSystem
+from rag.filters import build_metadata_filter
+from rag.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, span
+from api.concurrency import QueryLimiter, QueueFullError, QueueTimeoutError
+
+load_dotenv()
+
+# Los módulos de rag.* e ingest.* registran con `logging`; nivel configurable con LOG_LEVEL
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def get_rag_system() -> RAGSystem:
+    """Instancia única de RAGSystem por proceso (worker de uvicorn)."""
+    return RAGSystem(data_dir=os.getenv("DATA_DIR", "./data"))
+
+def get_limiter(request: Request) -> QueryLimiter:
+    return request.app.state.limiter
+
+def _log_warmup_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Error al precalentar el RAGSystem: %s", task.exception())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Construir el RAGSystem es inmediato (proveedores y conexiones son perezosos). La
+    # conexión a Pinecone y la creación de la cadena se hacen en segundo plano: el worker
+    # acepta peticiones enseguida y la primera consulta solo espera lo que falte.
+    app.state.limiter = QueryLimiter.from_env()
+    rag_factory = app.dependency_overrides.get(get_rag_system, get_rag_system)
+    rag_system = await asyncio.to_thread(rag_factory)
+    app.state.warmup = asyncio.create_task(asyncio.to_thread(rag_system.warmup))
+    app.state.warmup.add_done_callback(_log_warmup_error)
+    yield
+    # Al apagar el worker no se espera a un precalentamiento que no ha terminado
+    app.state.warmup.cancel()
+    try:
+        await app.state.warmup
+    except (asyncio.CancelledError, Exception):
+        pass  # los errores ya los registra `_log_warmup_error`
 
 app = FastAPI(
     title="Chatbot API",
     description="API para el chatbot de IA productivo.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
+class QueryFilters(BaseModel):
+    """Restringe la búsqueda a chunks con esta metadata (OR dentro de un campo, AND entre campos)."""
+    source_type: Optional[List[str]] = None
+    year: Optional[List[int]] = None
+    source: Optional[List[str]] = None
+
+class QueryRequest(BaseModel):
+    question: str
+    filters: Optional[QueryFilters] = None
+
+    def metadata_filter(self) -> Optional[Dict]:
+        return build_metadata_filter(**self.filters.model_dump()) if self.filters else None
+
+class QueryResponse(BaseModel):
+    answer: str
+    sources: List[str]
+
+class _SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que libera el hueco del limitador al terminar de enviarse,
+    también si el cliente se va o el envío falla antes de empezar a iterar el cuerpo
+    (en ese caso el `finally` del generador nunca llega a ejecutarse).
+    """
+    def __init__(self, content, limiter: QueryLimiter, **kwargs):
+        self._limiter = limiter
+        self._released = False
+        super().__init__(content, **kwargs)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def _sse_event(event: str, data: dict) -> str:
+    """Serializa un evento en formato Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the Chatbot API!"}
 
-# Aquí se añadirán los endpoints para RAG, ingestión, etc.
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas del worker en formato Prometheus: latencia por etapa, tokens del LLM, cachés y errores."""
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/query", response_model=QueryResponse)
+async def query(request: QueryRequest,
+                rag_system: RAGSystem = Depends(get_rag_system),
+                limiter: QueryLimiter = Depends(get_limiter)):
+    """Responde una pregunta de forma asíncrona respetando el límite de concurrencia."""
+    try:
+        async with limiter.slot():
+            with span("api.query"):
+                return await asyncio.wait_for(rag_system.aquery(request.question, filter=request.metadata_filter()), timeout=limiter.query_timeout)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Demasiadas consultas en curso. Inténtalo de nuevo más tarde.")
+    except QueueTimeoutError:
+        raise HTTPException(status_code=503, detail="Tiempo de espera en cola agotado.")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="La consulta ha superado el tiempo máximo de respuesta.")
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest,
+                       rag_system: RAGSystem = Depends(get_rag_system),
+                       limiter: QueryLimiter = Depends(get_limiter)):
+    """
+    Devuelve la respuesta como un stream SSE: un evento `token` por fragmento
+    generado por el LLM y un evento final `sources` con las fuentes usadas.
+    """
+    # El hueco se reserva antes de abrir el stream para poder devolver 503 si no lo hay.
+    try:
+        await limiter.acquire()
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Demasiadas consultas en curso. Inténtalo de nuevo más tarde.")
+    except QueueTimeoutError:
+        raise HTTPException(status_code=503, detail="Tiempo de espera en cola agotado.")
+
+    async def event_stream():
+        # `query_timeout` acota el stream completo: se aplica a cada evento con el tiempo que quede
+        deadline = asyncio.get_running_loop().time() + limiter.query_timeout
+        events = rag_system.astream_query(request.question, filter=request.metadata_filter()).__aiter__()
+        try:
+            while True:
+                remaining = deadline - asyncio.get_running_loop().time()
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), timeout=max(remaining, 0))
+                except StopAsyncIteration:
+                    break
+                yield _sse_event(event["type"], event)
+        except asyncio.TimeoutError:
+            yield _sse_event("error", {"type": "error", "detail": "La consulta ha superado el tiempo máximo de respuesta."})
+        except Exception as e:
+            logger.exception("Error en la consulta en streaming")
+            yield _sse_event("error", {"type": "error", "detail": str(e)})
+        finally:
+            await events.aclose()
+            response.release()
+
+    try:
+        response = _SlotStreamingResponse(event_stream(), limiter, media_type="text/event-stream")
+    except BaseException:
+        limiter.release()
+        raise
+    return response
+
+# Aquí se añadirán los endpoints para ingestión, etc.
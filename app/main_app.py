@@ -12,6 +12,7 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from rag.core import RAGSystem
+from rag.filters import build_metadata_filter
 
 # --- CONFIGURACIÓN DE AUTENTICACIÓN ---
 USER_ALLOWLIST_PATH = ROOT / "config" / "user_allowlist.yaml"
@@ -86,10 +87,16 @@ else:
 
         try:
             # La inicialización ahora es mucho más simple y usa los defaults de la clase
-            return RAGSystem(
+            rag_system = RAGSystem(
                 data_dir=data_dir,
                 progress_cb=cb,
             )
+            # RAGSystem es perezoso: construimos aquí el índice (una sola vez, gracias a la caché)
+            # para que el progreso se vea al arrancar y no dentro de la primera respuesta
+            rag_system.warmup()
+            progress.empty()
+            msg.empty()
+            return rag_system
         except Exception as e:
             st.error(f"Error al inicializar el sistema RAG: {e}")
             st.warning("Revisa tus variables de entorno (.env) para Google y Pinecone, y las dependencias.")
@@ -105,9 +112,24 @@ else:
         st.sidebar.write("**Arquitectura RAG:**")
         st.sidebar.code(f"LLM: {rag_system.llm_model_name}")
         st.sidebar.code(f"Embeddings: {rag_system.embed_fn.model}")
-        st.sidebar.code(f"Índice Pinecone: {rag_system.pinecone_index_name}")
+        if rag_system.vector_store_backend == "local":
+            st.sidebar.code(f"Índice local: {rag_system.local_index_dir}")
+        else:
+            st.sidebar.code(f"Índice Pinecone: {rag_system.pinecone_index_name}")
         st.sidebar.code(f"Directorio de Datos: {rag_system.data_dir}")
 
+        st.sidebar.markdown("---")
+        st.sidebar.write("**Filtros de búsqueda:**")
+        filter_source_types = st.sidebar.multiselect(
+            "Tipo de fuente", ["pdf", "docx", "pptx", "txt_md", "xlsx_csv", "video_audio", "web_page", "document"])
+        filter_years = st.sidebar.multiselect("Año", list(range(2020, 2031)))
+        filter_sources = st.sidebar.text_input("Archivo (nombres separados por comas)")
+        metadata_filter = build_metadata_filter(
+            source_type=filter_source_types,
+            year=filter_years,
+            source=[name.strip() for name in filter_sources.split(",")],
+        )
+
         if "messages" not in st.session_state:
             st.session_state.messages = []
 
@@ -123,20 +145,27 @@ else:
                 st.markdown(prompt)
 
             with st.chat_message("assistant"):
-                with st.spinner("Buscando y generando respuesta..."):
-                    try:
-                        response = rag_system.query(prompt)
-                    except Exception as e:
-                        st.error(f"Error durante la consulta: {e}")
-                        response = {"answer": "Error procesando tu consulta.", "sources": []}
-
-                    st.markdown(response.get("answer", ""))
-                    sources = response.get("sources", [])
-                    if sources:
-                        st.caption(f"Fuentes: {', '.join(sources)}")
+                # Los tokens se pintan a medida que llegan; el último evento trae las fuentes.
+                sources = []
+                def token_stream():
+                    for event in rag_system.stream_query(prompt, filter=metadata_filter):
+                        if event["type"] == "token":
+                            yield event["content"]
+                        elif event["type"] == "sources":
+                            sources.extend(event["sources"])
+
+                try:
+                    answer = st.write_stream(token_stream())
+                except Exception as e:
+                    st.error(f"Error durante la consulta: {e}")
+                    answer = "Error procesando tu consulta."
+                    sources = []
+
+                if sources:
+                    st.caption(f"Fuentes: {', '.join(sources)}")
 
                 st.session_state.messages.append(
-                    {"role": "assistant", "content": response.get("answer",""), "sources": sources}
+                    {"role": "assistant", "content": answer, "sources": sources}
                 )
 
         if mode == "Onboarding":
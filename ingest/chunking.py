@@ -0,0 +1,150 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Tamaño por defecto de los chunks, en tokens (~1000 caracteres de texto en español)
+DEFAULT_MAX_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 32
+
+# Aproximación barata a un tokenizador de subpalabras: trozos de hasta 6 caracteres
+# de palabra o un signo de puntuación cuentan como un token.
+_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]")
+# Fin de frase (., !, ?, … seguidos de espacio), salto de línea o de párrafo
+_BOUNDARY_RE = re.compile(r"(?<=[.!?…])[\"')\]»]*[ \t]+|\s*\n\s*")
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    paragraph_end: bool
+
+
+def count_tokens(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Estima los tokens de `text[start:end]` sin copiar el fragmento."""
+    return sum(1 for _ in _TOKEN_RE.finditer(text, start, len(text) if end is None else end))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Recorta `text` a sus primeros `max_tokens` tokens (estimados), sin partir palabras cortas."""
+    if max_tokens <= 0:
+        return ""
+    for i, match in enumerate(_TOKEN_RE.finditer(text)):
+        if i == max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def _split_long_unit(text: str, start: int, end: int, max_tokens: int, paragraph_end: bool) -> Iterator[_Unit]:
+    """Parte una frase más larga que `max_tokens` en trozos de `max_tokens` tokens."""
+    piece_start, tokens, last_end = start, 0, start
+    for match in _TOKEN_RE.finditer(text, start, end):
+        if tokens == max_tokens:
+            yield _Unit(piece_start, last_end, tokens, False)
+            piece_start, tokens = match.start(), 0
+        tokens += 1
+        last_end = match.end()
+    if tokens:
+        yield _Unit(piece_start, last_end, tokens, paragraph_end)
+
+
+def _iter_units(text: str, max_tokens: int) -> Iterator[_Unit]:
+    """Frases/líneas de `text` como offsets, en orden y sin el espacio que las separa."""
+    position = 0
+    boundaries = _BOUNDARY_RE.finditer(text)
+    while position < len(text):
+        match = next(boundaries, None)
+        end = match.start() if match else len(text)
+        while end > position and text[end - 1].isspace():
+            end -= 1
+        if end > position:
+            paragraph_end = match is None or text.count("\n", match.start(), match.end()) >= 2
+            tokens = count_tokens(text, position, end)
+            if tokens > max_tokens:
+                yield from _split_long_unit(text, position, end, max_tokens, paragraph_end)
+            elif tokens:
+                yield _Unit(position, end, tokens, paragraph_end)
+        position = match.end() if match else len(text)
+
+
+def iter_chunk_spans(text: str,
+                     max_tokens: int = DEFAULT_MAX_TOKENS,
+                     overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[Tuple[int, int]]:
+    """
+    Motor de chunking común a todos los pipelines. Emite, de forma perezosa, los
+    chunks de `text` como offsets `(inicio, fin)` sin copiar el texto.
+    - Los cortes caen en límites de frase o de línea; una frase más larga que
+      `max_tokens` se parte entre palabras.
+    - Cada chunk tiene como mucho `max_tokens` tokens (estimados con `count_tokens`).
+    - Si un párrafo termina con el chunk ya por encima de la mitad, se corta ahí.
+    - Chunks consecutivos del mismo párrafo comparten las últimas frases, hasta
+      `overlap_tokens` tokens.
+    """
+    window: deque = deque()
+    total = 0
+    fresh = False  # hay frases en la ventana que aún no se han emitido
+
+    for unit in _iter_units(text, max_tokens):
+        if window and total + unit.tokens > max_tokens:
+            yield window[0].start, window[-1].end
+            # Solapamiento: se conservan las últimas frases que quepan en `overlap_tokens`
+            kept: deque = deque()
+            kept_tokens = 0
+            while window and kept_tokens + window[-1].tokens <= overlap_tokens:
+                kept.appendleft(window.pop())
+                kept_tokens += kept[0].tokens
+            while kept and kept_tokens + unit.tokens > max_tokens:
+                kept_tokens -= kept.popleft().tokens
+            window, total = kept, kept_tokens
+
+        window.append(unit)
+        total += unit.tokens
+        fresh = True
+        if unit.paragraph_end and total >= max_tokens // 2:
+            yield window[0].start, window[-1].end
+            window.clear()
+            total, fresh = 0, False
+
+    if window and fresh:
+        yield window[0].start, window[-1].end
+
+
+def iter_chunks(text: str,
+                metadata: Optional[Dict] = None,
+                max_tokens: int = DEFAULT_MAX_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[Tuple[str, Dict]]:
+    """
+    Emite `(texto_del_chunk, metadata)` para cada chunk de `text`. La metadata es
+    una copia de `metadata` con `chunk_index`, `char_start` y `char_end` (offsets
+    del chunk en el texto original).
+    """
+    for i, (start, end) in enumerate(iter_chunk_spans(text, max_tokens, overlap_tokens)):
+        yield text[start:end], {**(metadata or {}), "chunk_index": i, "char_start": start, "char_end": end}
+
+
+def chunk_text(text: str,
+               max_tokens: int = DEFAULT_MAX_TOKENS,
+               overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[str]:
+    """Lista con el texto de cada chunk (atajo sobre `iter_chunk_spans`)."""
+    return [text[start:end] for start, end in iter_chunk_spans(text, max_tokens, overlap_tokens)]
+
+
+def iter_section_chunks(sections: Iterable[Tuple[str, Dict]],
+                        metadata: Optional[Dict] = None,
+                        max_tokens: int = DEFAULT_MAX_TOKENS,
+                        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[Tuple[str, Dict]]:
+    """
+    Como `iter_chunks`, pero sobre un documento emitido por secciones (páginas,
+    hojas...): ningún chunk cruza dos secciones y cada uno lleva la metadata de la
+    suya. `chunk_index` es correlativo en todo el documento y los offsets se
+    refieren al texto completo, con las secciones unidas por "\\n".
+    """
+    index = 0
+    base = 0
+    for text, section_metadata in sections:
+        section_base = {**(metadata or {}), **section_metadata}
+        for start, end in iter_chunk_spans(text, max_tokens, overlap_tokens):
+            yield text[start:end], {**section_base, "chunk_index": index,
+                                    "char_start": base + start, "char_end": base + end}
+            index += 1
+        base += len(text) + 1
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "ChatboxCrawler/1.0 (+https://github.com/carloscuerda9/Chatbot)"
+
+
+class CrawledPage(NamedTuple):
+    url: str
+    depth: int
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # Entrada de la caché de rastreo, pendiente hasta que la página se indexa (`CrawlCache.commit`)
+    cache_entry: Optional[Dict] = None
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """URL absoluta, sin fragmento y con esquema/host en minúsculas (None si no es http/https)."""
+    url, _ = urldefrag(urljoin(base, url) if base else url)
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower(), path=parts.path or "/").geturl()
+
+
+def extract_text_and_links(html: str, base_url: str) -> Tuple[str, List[str]]:
+    """Texto visible de una página HTML y sus enlaces http(s) normalizados, en orden y sin repetir."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        link = normalize_url(anchor["href"], base_url)
+        if link and link not in links:
+            links.append(link)
+    return soup.get_text(separator="\n", strip=True), links
+
+
+class CrawlCache:
+    """
+    Validadores HTTP (ETag/Last-Modified), texto, hash del texto y enlaces de cada URL
+    rastreada, en un JSON. Permite repetir el rastreo con peticiones condicionales,
+    seguir recorriendo los enlaces de las páginas que no han cambiado y, si el índice
+    se reconstruye, volver a indexarlas sin descargarlas.
+    """
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = {}
+        if self.path and self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def get(self, url: str) -> Optional[Dict]:
+        return self.entries.get(url)
+
+    def put(self, url: str, entry: Dict):
+        self.entries[url] = entry
+
+    def commit(self, page: CrawledPage):
+        """
+        Registra una página nueva o modificada una vez indexada. Hasta entonces la caché
+        conserva la entrada anterior: si la indexación falla, el siguiente rastreo la
+        vuelve a emitir en lugar de responder 304.
+        """
+        if page.cache_entry is not None:
+            self.put(page.url, page.cache_entry)
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+class _HostLimiter:
+    """Límite de peticiones simultáneas a un host y espera mínima entre dos peticiones seguidas."""
+    def __init__(self, concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            async with self._lock:
+                wait = self._next_start - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._next_start = time.monotonic() + self.delay
+        except BaseException:
+            # Cancelada mientras esperaba su turno: `__aexit__` no llegará a ejecutarse
+            self.semaphore.release()
+            raise
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class WebCrawler:
+    """
+    Rastreador asíncrono (aiohttp) de los sitios de config/allowlist.yaml:
+    - una sesión con conexiones reutilizadas para todo el rastreo;
+    - como mucho `max_concurrency` peticiones en total y `per_host_concurrency`
+      por host, con `delay` segundos entre peticiones al mismo host;
+    - recorrido en anchura hasta `depth` saltos desde las URLs base, sin salir del
+      host y de la ruta de cada URL base, y sin visitar dos veces la misma URL;
+    - peticiones condicionales (If-None-Match/If-Modified-Since) con los
+      validadores de `cache`: las páginas sin cambios no se vuelven a emitir o, con
+      `emit_unchanged` (para un índice que se construye desde cero), se emiten con
+      el texto guardado en la caché, sin descargarlas de nuevo.
+      Las páginas nuevas o modificadas no se guardan en la caché: quien las indexa
+      llama a `cache.commit(page)` y `cache.save()` cuando están en el índice.
+    """
+    def __init__(self,
+                 cache: Optional[CrawlCache] = None,
+                 max_concurrency: int = 8,
+                 per_host_concurrency: int = 2,
+                 delay: float = 1.0,
+                 timeout: float = 20.0,
+                 max_pages: int = 1000,
+                 user_agent: str = DEFAULT_USER_AGENT,
+                 emit_unchanged: bool = False):
+        self.cache = cache or CrawlCache()
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.user_agent = user_agent
+        self.emit_unchanged = emit_unchanged
+        self.stats = {"fetched": 0, "unchanged": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls, cache: Optional[CrawlCache] = None, emit_unchanged: bool = False) -> "WebCrawler":
+        return cls(
+            cache,
+            emit_unchanged=emit_unchanged,
+            max_concurrency=int(os.getenv("CRAWL_CONCURRENCY", "8")),
+            per_host_concurrency=int(os.getenv("CRAWL_PER_HOST", "2")),
+            delay=float(os.getenv("CRAWL_DELAY", "1.0")),
+            timeout=float(os.getenv("CRAWL_TIMEOUT", "20")),
+            max_pages=int(os.getenv("CRAWL_MAX_PAGES", "1000")),
+        )
+
+    async def crawl(self, base_urls: Iterable[str], depth: int = 0) -> List[CrawledPage]:
+        """
+        Rastrea desde `base_urls` y devuelve las páginas nuevas o modificadas, con su
+        entrada de caché pendiente (`CrawledPage.cache_entry`), más las que no han
+        cambiado si `emit_unchanged` (sin entrada pendiente). La caché solo se
+        actualiza aquí para las páginas sin cambios.
+        """
+        import aiohttp
+
+        roots = [url for url in (normalize_url(u) for u in base_urls) if url]
+        seen: Set[str] = set(roots)
+        level = roots
+        pages: List[CrawledPage] = []
+        hosts: Dict[str, _HostLimiter] = {}
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_concurrency)
+        session_timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=session_timeout,
+                                         headers={"User-Agent": self.user_agent}) as session:
+            for current_depth in range(depth + 1):
+                results = await asyncio.gather(*(self._visit(session, hosts, url, current_depth) for url in level))
+                level = []
+                for page, links in results:
+                    if page is not None:
+                        pages.append(page)
+                    if current_depth == depth:
+                        continue
+                    for link in links:
+                        if link not in seen and len(seen) < self.max_pages and self._in_scope(link, roots):
+                            seen.add(link)
+                            level.append(link)
+                if not level:
+                    break
+        self.cache.save()
+        changed = sum(1 for page in pages if page.cache_entry is not None)
+        logger.info("Rastreo completado: %d URLs, %d páginas nuevas o modificadas, %d sin cambios, %d con error.",
+                    len(seen), changed, self.stats["unchanged"], self.stats["failed"])
+        return pages
+
+    @staticmethod
+    def _in_scope(url: str, roots: List[str]) -> bool:
+        """Solo se siguen enlaces del mismo host y bajo la ruta de alguna URL base."""
+        parts = urlsplit(url)
+        for root in roots:
+            root_parts = urlsplit(root)
+            prefix = root_parts.path.rsplit("/", 1)[0] + "/"
+            if parts.netloc == root_parts.netloc and parts.path.startswith(prefix):
+                return True
+        return False
+
+    async def _visit(self, session, hosts: Dict[str, _HostLimiter], url: str, depth: int) -> Tuple[Optional[CrawledPage], List[str]]:
+        """
+        Descarga `url`; devuelve la página si es nueva o ha cambiado (o siempre, con
+        `emit_unchanged`), y sus enlaces.
+        """
+        import aiohttp
+
+        cached = self.cache.get(url) or {}
+        headers = {}
+        if self.emit_unchanged and "text" not in cached:
+            # Entrada sin texto (cachés anteriores): un 304 no bastaría para reindexarla
+            cached = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        host = urlsplit(url).netloc
+        limiter = hosts.setdefault(host, _HostLimiter(self.per_host_concurrency, self.delay))
+        try:
+            async with limiter:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        self.stats["unchanged"] += 1
+                        return self._unchanged_page(url, depth, cached), cached.get("links", [])
+                    response.raise_for_status()
+                    if "html" not in response.headers.get("Content-Type", "text/html"):
+                        return None, []
+                    html = await response.text(errors="ignore")
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats["failed"] += 1
+            logger.warning("Error al rastrear %s: %s", url, e)
+            return None, []
+
+        self.stats["fetched"] += 1
+        text, links = extract_text_and_links(html, url)
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        entry = {"etag": etag, "last_modified": last_modified, "hash": content_hash, "links": links, "text": text}
+        # Sin validadores el servidor responde 200 siempre: el hash detecta que no ha cambiado
+        if cached.get("hash") == content_hash:
+            self.stats["unchanged"] += 1
+            self.cache.put(url, entry)
+            return self._unchanged_page(url, depth, entry), links
+        return CrawledPage(url, depth, text, etag, last_modified, entry), links
+
+    def _unchanged_page(self, url: str, depth: int, entry: Dict) -> Optional[CrawledPage]:
+        """Página sin cambios a partir de su entrada de caché (None si no se emiten)."""
+        if not self.emit_unchanged:
+            return None
+        return CrawledPage(url, depth, entry.get("text", ""), entry.get("etag"), entry.get("last_modified"))
+
+
+def crawl_site(site: Dict, crawler: WebCrawler) -> List[CrawledPage]:
+    """
+    Rastrea un sitio de config/allowlist.yaml (`name`, `base_urls`, `crawl`, `depth`).
+    Con `crawl: false` solo se descargan las URLs base.
+    """
+    depth = int(site.get("depth", 0)) if site.get("crawl") else 0
+    return asyncio.run(crawler.crawl(site.get("base_urls", []), depth))
@@ -0,0 +1,71 @@
+import multiprocessing
+from collections import deque
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def parallel_map(func: Callable[[T], R],
+                 items: Iterable[T],
+                 max_workers: int = 1,
+                 timeout: Optional[float] = None,
+                 progress_cb: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[T, Optional[R], Optional[BaseException]]]:
+    """
+    Aplica `func` a cada elemento en un pool de `max_workers` procesos y emite
+    `(item, resultado, error)` en el mismo orden que la entrada, de modo que el
+    resultado es idéntico al de la ruta secuencial.
+
+    Cada archivo está aislado: si `func` lanza una excepción o tarda más de
+    `timeout` segundos (medidos desde que se espera su resultado), se emite el
+    error y se sigue con el resto. Tras un timeout el pool se sustituye por uno
+    nuevo (el worker bloqueado seguiría ocupando su hueco) y las tareas en vuelo
+    que no habían terminado se vuelven a enviar.
+    Como mucho hay `2 * max_workers` tareas en vuelo para acotar la memoria.
+    `func` debe ser una función de módulo (serializable con pickle).
+    Con `max_workers <= 1` se ejecuta en el propio proceso y `timeout` no se
+    aplica: un archivo solo puede interrumpirse si se parsea en otro proceso.
+    """
+    items = list(items)
+    total = len(items)
+
+    if max_workers <= 1 or total <= 1:
+        for i, item in enumerate(items):
+            try:
+                result, error = func(item), None
+            except Exception as e:
+                result, error = None, e
+            if progress_cb:
+                progress_cb(i + 1, total)
+            yield item, result, error
+        return
+
+    def new_pool():
+        return multiprocessing.Pool(processes=min(max_workers, total))
+
+    pool = new_pool()
+    try:
+        pending = deque()
+        next_item = 0
+        for done in range(total):
+            while next_item < total and len(pending) < 2 * max_workers:
+                pending.append((items[next_item], pool.apply_async(func, (items[next_item],))))
+                next_item += 1
+
+            item, async_result = pending.popleft()
+            try:
+                result, error = async_result.get(timeout), None
+            except multiprocessing.TimeoutError:
+                result, error = None, TimeoutError(f"Tiempo máximo de {timeout}s superado")
+                pool.terminate()
+                pool.join()
+                pool = new_pool()
+                pending = deque((other, r if r.ready() else pool.apply_async(func, (other,))) for other, r in pending)
+            except Exception as e:
+                result, error = None, e
+            if progress_cb:
+                progress_cb(done + 1, total)
+            yield item, result, error
+    finally:
+        pool.terminate()
+        pool.join()
@@ -1,7 +1,9 @@
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 class Document:
     """Una clase simple para contener el contenido y metadatos de un documento."""
-    def __init__(self, content: str, metadata: Dict = None):
+    def __init__(self, content: str, metadata: Dict = None, sections: Optional[List[Tuple[str, Dict]]] = None):
         self.page_content = content # Usamos page_content para compatibilidad con Langchain
         self.metadata = metadata if metadata is not None else {}
+        # Partes del documento (texto, metadata) si su parser las emite por separado
+        self.sections = sections
@@ -1,26 +1,51 @@
+import multiprocessing
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
 
-from pathlib import Path
-from typing import List
 from pypdf import PdfReader
 
-def load_pdf(file_path: str) -> str:
-    """Carga el texto de un archivo PDF."""
+from ..parallel import parallel_map
+
+# Páginas que extrae cada tarea cuando un PDF grande se reparte entre procesos
+PAGES_PER_TASK = 50
+
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[str]:
+    """Texto de las páginas [inicio, fin) de un PDF. Es una función de módulo para el pool de procesos."""
+    file_path, start, end = task
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path: str,
+                   workers: Optional[int] = None,
+                   min_pages: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Emite el texto de cada página de un PDF con su número (`{"page": n}`, desde 1),
+    de forma perezosa: el documento nunca se construye entero en memoria.
+    Los PDF con al menos `min_pages` páginas (PDF_PARALLEL_MIN_PAGES, 200 por
+    defecto) se reparten por rangos de páginas entre `workers` procesos
+    (PDF_PAGE_WORKERS, 1 por defecto = sin paralelismo), manteniendo el orden.
+    Dentro de un worker de la ingesta, que ya es un proceso del pool, se lee en serie.
+    """
+    workers = int(os.getenv("PDF_PAGE_WORKERS", "1")) if workers is None else workers
+    min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200")) if min_pages is None else min_pages
     reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text
-
-def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
-    """Divide el texto en chunks con un tamaño y solapamiento definidos."""
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        if end >= len(text):
-            break
-        start += (chunk_size - chunk_overlap)
-    return chunks
+    total = len(reader.pages)
+
+    if workers > 1 and total >= min_pages and not multiprocessing.current_process().daemon:
+        tasks = [(file_path, start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+        for (_, start, _), texts, error in parallel_map(_extract_page_range, tasks, max_workers=workers):
+            if error is not None:
+                raise error
+            for offset, text in enumerate(texts):
+                yield text, {"page": start + offset + 1}
+        return
+
+    for number, page in enumerate(reader.pages, start=1):
+        yield page.extract_text() or "", {"page": number}
+
+
+def load_pdf(file_path: str) -> str:
+    """Carga el texto de un archivo PDF (sus páginas separadas por saltos de línea)."""
+    return "\n".join(text for text, _ in iter_pdf_pages(file_path))
@@ -1,30 +1,11 @@
-from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
 
 def load_pptx(file_path: str) -> str:
     """
     Placeholder para extraer texto de un archivo PPTX.
     Requiere la librería python-pptx.
     """
-    print(f"Advertencia: El parser PPTX para {file_path} no está implementado completamente.")
+    logger.warning("El parser PPTX para %s no está implementado completamente.", file_path)
     return "Contenido PPTX de ejemplo.\n"
-
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
-    """
-    Chunking genérico para PPTX.
-    """
-    # Implementación de chunking genérico, similar a pdf.py o main_parser.py
-    chunks = []
-    if not text:
-        return chunks
-
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end >= len(text):
-            break
-        start += (chunk_size - chunk_overlap)
-        if start < 0:
-            start = 0
-    return chunks
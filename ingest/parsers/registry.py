@@ -0,0 +1,209 @@
+import csv
+import importlib
+import re
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# Una sección es un trozo del documento con su propia metadata (p. ej. {"page": 3})
+Section = Tuple[str, Dict]
+
+
+class ParserSpec(NamedTuple):
+    """
+    Descripción de un parser. Su módulo (relativo a este paquete, o absoluto si
+    contiene un punto, para parsers de terceros) solo se importa la primera vez
+    que llega un archivo de su tipo.
+    - `function(ruta) -> str` devuelve el texto completo.
+    - `streaming` indica si el parser puede emitir el documento por partes
+      ("page", "section", "row"...); en ese caso `section_function(ruta)` emite
+      pares (texto, metadata) de forma perezosa.
+    - `placeholder` marca parsers aún no implementados (devuelven texto de ejemplo):
+      RAGSystem no los usa; los pipelines heredados sí, como hasta ahora.
+    """
+    name: str
+    module: str
+    function: str
+    extensions: Tuple[str, ...]
+    source_type: str
+    mime_types: Tuple[str, ...] = ()
+    streaming: Optional[str] = None
+    section_function: Optional[str] = None
+    placeholder: bool = False
+
+
+# Firmas de formatos binarios para archivos sin extensión o con una desconocida
+_MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"ID3", "audio/mpeg"),
+]
+# Los formatos de Office son ZIP; se distinguen por su carpeta principal
+_OFFICE_MIME_BY_FOLDER = {
+    "word/": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "ppt/": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "xl/": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Bytes que se leen para decidir si un archivo sin firma binaria es texto
+_TEXT_SAMPLE_BYTES = 4096
+_MARKDOWN_LINE = re.compile(r"^(#{1,6} |```|- \[[ x]\] )", re.MULTILINE)
+
+
+def _sniff_text(sample: bytes, truncated: bool) -> Optional[str]:
+    """text/csv, text/markdown o text/plain si `sample` es texto UTF-8; None si parece binario."""
+    if b"\x00" in sample:
+        return None
+    try:
+        text = sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # La muestra puede cortar un carácter multibyte al final
+        if not truncated or e.start < len(sample) - 3:
+            return None
+        text = sample[:e.start].decode("utf-8")
+    text = text.lstrip("\ufeff")
+    if not text.strip():
+        return None
+    lines = text.splitlines()
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]  # la última línea puede estar cortada
+    lines = [line for line in lines if line.strip()]
+    if len(lines) >= 2:
+        try:
+            dialect = csv.Sniffer().sniff("\n".join(lines), delimiters=",;\t|")
+            widths = {len(row) for row in csv.reader(lines, dialect)}
+            if len(widths) == 1 and widths.pop() > 1:
+                return "text/csv"
+        except csv.Error:
+            pass
+    if _MARKDOWN_LINE.search(text):
+        return "text/markdown"
+    return "text/plain"
+
+
+def sniff_mime(path: Union[str, Path]) -> Optional[str]:
+    """
+    Tipo MIME a partir de los primeros bytes del archivo (None si no se reconoce).
+    Sin firma binaria, el texto UTF-8 se clasifica como CSV, Markdown o texto plano.
+    """
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(_TEXT_SAMPLE_BYTES)
+    except OSError:
+        return None
+    head = sample[:16]
+    for magic, mime in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime
+    if head[4:8] == b"ftyp":
+        return "video/mp4"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return None
+        for folder, mime in _OFFICE_MIME_BY_FOLDER.items():
+            if any(name.startswith(folder) for name in names):
+                return mime
+        return None
+    return _sniff_text(sample, truncated=len(sample) == _TEXT_SAMPLE_BYTES)
+
+
+class ParserRegistry:
+    """Tabla de despacho extensión/MIME -> parser, con carga perezosa de cada parser."""
+    def __init__(self):
+        self._by_extension: Dict[str, ParserSpec] = {}
+        self._by_mime: Dict[str, ParserSpec] = {}
+        self._functions: Dict[Tuple[str, str], Callable] = {}
+
+    def register(self, spec: ParserSpec):
+        """Registra (o sustituye) el parser de sus extensiones y tipos MIME."""
+        for extension in spec.extensions:
+            self._by_extension[extension.lower()] = spec
+        for mime in spec.mime_types:
+            self._by_mime[mime] = spec
+
+    def for_path(self, path: Union[str, Path], include_placeholders: bool = False,
+                 sniff: bool = True) -> Optional[ParserSpec]:
+        """
+        Parser de `path` por su extensión o, si no se conoce y `sniff` es True, por sus
+        primeros bytes (abre el archivo, y los ZIP se listan para distinguir los Office).
+        """
+        path = Path(path)
+        spec = self._by_extension.get(path.suffix.lower())
+        if spec is None and sniff:
+            mime = sniff_mime(path)
+            spec = self._by_mime.get(mime) if mime else None
+        if spec is not None and spec.placeholder and not include_placeholders:
+            return None
+        return spec
+
+    def extensions(self, include_placeholders: bool = False) -> List[str]:
+        return sorted(ext for ext, spec in self._by_extension.items() if include_placeholders or not spec.placeholder)
+
+    def _load(self, spec: ParserSpec, function: str) -> Callable:
+        key = (spec.module, function)
+        if key not in self._functions:
+            # Relativo a este paquete: funciona como `ingest.parsers` y como `chatbox.ingest.parsers`
+            name = spec.module if "." in spec.module else f"{__package__}.{spec.module}"
+            self._functions[key] = getattr(importlib.import_module(name), function)
+        return self._functions[key]
+
+    def _require(self, path: Path, spec: Optional[ParserSpec]) -> ParserSpec:
+        spec = spec or self.for_path(path)
+        if spec is None:
+            raise ValueError(f"Tipo de archivo no soportado: {path}")
+        return spec
+
+    def read_text(self, path: Union[str, Path], spec: Optional[ParserSpec] = None) -> str:
+        """Texto completo de `path`."""
+        path = Path(path)
+        spec = self._require(path, spec)
+        if spec.streaming:
+            return "\n".join(text for text, _ in self.iter_sections(path, spec))
+        return self._load(spec, spec.function)(str(path))
+
+    def iter_sections(self, path: Union[str, Path], spec: Optional[ParserSpec] = None) -> Iterator[Section]:
+        """
+        Emite `path` como pares (texto, metadata de la sección). Los parsers sin
+        streaming emiten una única sección con todo el texto.
+        """
+        path = Path(path)
+        spec = self._require(path, spec)
+        if spec.streaming:
+            yield from self._load(spec, spec.section_function)(str(path))
+        else:
+            yield self._load(spec, spec.function)(str(path)), {}
+
+
+def source_type_for(path: Union[str, Path], spec: Optional[ParserSpec]) -> str:
+    """`source_type` de la metadata de un archivo (los .txt de transcripciones_tiktok son vídeo)."""
+    if spec is None:
+        return "unknown"
+    if spec.source_type == "txt_md" and "transcripciones_tiktok" in str(path).lower():
+        return "video_audio"
+    return spec.source_type
+
+
+PARSERS = ParserRegistry()
+PARSERS.register(ParserSpec("txt", "txt", "load_txt", (".txt", ".md"), "txt_md",
+                            mime_types=("text/plain", "text/markdown")))
+PARSERS.register(ParserSpec("pdf", "pdf", "load_pdf", (".pdf",), "pdf", mime_types=("application/pdf",),
+                            streaming="page", section_function="iter_pdf_pages"))
+PARSERS.register(ParserSpec("docx", "docx", "load_docx", (".docx",), "docx",
+                            mime_types=(_OFFICE_MIME_BY_FOLDER["word/"],)))
+PARSERS.register(ParserSpec("pptx", "pptx", "load_pptx", (".pptx",), "pptx",
+                            mime_types=(_OFFICE_MIME_BY_FOLDER["ppt/"],), placeholder=True))
+PARSERS.register(ParserSpec("xlsx", "xlsx", "load_xlsx", (".xlsx", ".csv"), "xlsx_csv",
+                            mime_types=(_OFFICE_MIME_BY_FOLDER["xl/"], "text/csv"),
+                            streaming="row", section_function="iter_row_groups"))
+PARSERS.register(ParserSpec("video", "video", "load_video_transcript", (".mp4", ".avi", ".mov", ".wav", ".mp3"),
+                            "video_audio", mime_types=("video/mp4", "audio/wav", "audio/mpeg"),
+                            streaming="segment", section_function="iter_transcript_segments"))
+PARSERS.register(ParserSpec("image", "image", "load_image_ocr", (".png", ".jpg", ".jpeg", ".gif"), "image",
+                            mime_types=("image/png", "image/jpeg", "image/gif"), placeholder=True))
@@ -1,30 +1,24 @@
-from typing import List
+from typing import Dict, Iterable, Iterator, Tuple
+
+from ..transcription import TranscriptSegment, transcribe_media
 
-def load_video_transcript(file_path: str) -> str:
-    """
-    Placeholder para transcribir audio/video.
-    Requiere librerías como openai-whisper o APIs de Speech-to-Text.
-    """
-    print(f"Advertencia: El transcriptor de video/audio para {file_path} no está implementado completamente.")
-    return "Transcripción de video/audio de ejemplo.\n"
 
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+def transcript_sections(segments: Iterable[TranscriptSegment]) -> Iterator[Tuple[str, Dict]]:
+    """Segmentos de una transcripción como secciones, con sus marcas de tiempo en segundos."""
+    for segment in segments:
+        if segment.text:
+            yield segment.text, {"time_start": segment.start, "time_end": segment.end}
+
+
+def iter_transcript_segments(file_path: str) -> Iterator[Tuple[str, Dict]]:
     """
-    Chunking genérico para transcripciones de video/audio.
+    Emite la transcripción de un archivo de audio/vídeo por segmentos, con sus
+    marcas de tiempo en segundos (`{"time_start": 0.0, "time_end": 28.5}`).
+    El backend se elige con TRANSCRIBER_BACKEND (ver `ingest.transcription`).
     """
-    # Implementación de chunking genérico, similar a pdf.py o main_parser.py
-    chunks = []
-    if not text:
-        return chunks
+    yield from transcript_sections(transcribe_media(file_path))
 
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end >= len(text):
-            break
-        start += (chunk_size - chunk_overlap)
-        if start < 0:
-            start = 0
-    return chunks
+
+def load_video_transcript(file_path: str) -> str:
+    """Transcribe un archivo de audio/vídeo (texto de todos sus segmentos)."""
+    return "\n".join(text for text, _ in iter_transcript_segments(file_path))
@@ -1,4 +1,4 @@
-
+import logging
 import requests
 from bs4 import BeautifulSoup
 
@@ -6,12 +6,19 @@ from bs4 import BeautifulSoup
 # from langchain.docstore.document import Document 
 from chatbox.ingest.parsers.base import Document
 
+logger = logging.getLogger(__name__)
+
+# Segundos máximos por petición; sin timeout una web colgada bloqueaba toda la ingesta
+REQUEST_TIMEOUT = 20
+# Sesión compartida: reutiliza las conexiones entre páginas del mismo sitio
+_session = requests.Session()
+
 def parse_web(url: str) -> Document:
     """
     Extrae el contenido de texto de una URL y lo devuelve como nuestro objeto Document custom.
     """
     try:
-        response = requests.get(url)
+        response = _session.get(url, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Lanza un error para respuestas HTTP no exitosas
         
         soup = BeautifulSoup(response.content, 'html.parser')
@@ -20,10 +27,14 @@ def parse_web(url: str) -> Document:
         text_content = soup.get_text(separator='\n', strip=True)
         
         # Crear nuestro documento custom
-        metadata = {'source': url, 'file_name': url}
+        metadata = {'source': url, 'file_name': url, 'source_type': 'web_page'}
         return Document(content=text_content, metadata=metadata)
         
     except requests.RequestException as e:
-        print(f"Error al acceder a la URL {url}: {e}")
+        logger.error("Error al acceder a la URL %s: %s", url, e)
         return None
 
+def page_to_document(page) -> Document:
+    """Convierte una página de `ingest.crawler.WebCrawler` en nuestro objeto Document custom."""
+    metadata = {'source': page.url, 'file_name': page.url, 'source_type': 'web_page', 'crawl_depth': page.depth}
+    return Document(content=page.text, metadata=metadata)
@@ -1,30 +1,96 @@
-from typing import List
+import csv
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-def load_xlsx(file_path: str) -> str:
+from ..chunking import DEFAULT_MAX_TOKENS, count_tokens
+
+# Separador entre celdas al convertir una fila en texto
+CELL_SEPARATOR = " | "
+
+
+def _format_row(values: Sequence) -> str:
+    return CELL_SEPARATOR.join("" if value is None else str(value).strip() for value in values)
+
+
+def _group_rows(rows: Iterable[Tuple[int, Sequence]], sheet: Optional[str], max_tokens: int) -> Iterator[Tuple[str, Dict]]:
     """
-    Placeholder para extraer texto de un archivo XLSX/CSV.
-    Requiere librerías como openpyxl o pandas.
+    Agrupa filas `(número, valores)` en secciones de como mucho `max_tokens` tokens
+    que empiezan todas por la fila de cabecera (la primera fila no vacía).
+    Una hoja con solo la cabecera se emite como una sección con esa fila.
+    Solo se mantiene en memoria el grupo en curso.
     """
-    print(f"Advertencia: El parser XLSX/CSV para {file_path} no está implementado completamente.")
-    return "Contenido XLSX/CSV de ejemplo.\n"
+    header = None
+    group: List[str] = []
+    tokens = 0
+    first_row = last_row = 0
+
+    def section() -> Tuple[str, Dict]:
+        metadata = {"row_start": first_row, "row_end": last_row}
+        if sheet is not None:
+            metadata = {"sheet": sheet, **metadata}
+        return "\n".join([header, *group]), metadata
+
+    for number, values in rows:
+        line = _format_row(values)
+        if not line.replace(CELL_SEPARATOR, "").strip():
+            continue
+        if header is None:
+            header, header_tokens = line, count_tokens(line)
+            header_row = number
+            continue
+        line_tokens = count_tokens(line)
+        if group and header_tokens + tokens + line_tokens > max_tokens:
+            yield section()
+            group, tokens = [], 0
+        if not group:
+            first_row = number
+        group.append(line)
+        tokens += line_tokens
+        last_row = number
+    if group:
+        yield section()
+    elif header is not None:
+        first_row = last_row = header_row
+        yield section()
 
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
+
+def _iter_csv_rows(file_path: str) -> Iterator[Tuple[int, List[str]]]:
+    with open(file_path, "r", encoding="utf-8-sig", errors="ignore", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        yield from enumerate(csv.reader(f, dialect), start=1)
+
+
+def iter_row_groups(file_path: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> Iterator[Tuple[str, Dict]]:
     """
-    Chunking genérico para XLSX/CSV.
+    Emite una hoja de cálculo (XLSX o CSV) como grupos de filas `(texto, metadata)`.
+    Cada grupo repite la cabecera de su hoja y cabe en un chunk de `max_tokens`
+    tokens; la metadata lleva la hoja (solo XLSX) y las filas `row_start`-`row_end`.
+    Las filas se leen en streaming (openpyxl en modo read-only, `csv` para CSV),
+    así que la memoria no depende del tamaño del archivo.
+    Requiere la librería openpyxl para los XLSX.
     """
-    # Implementación de chunking genérico, similar a pdf.py o main_parser.py
-    chunks = []
-    if not text:
-        return chunks
-
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end >= len(text):
-            break
-        start += (chunk_size - chunk_overlap)
-        if start < 0:
-            start = 0
-    return chunks
+    # Los XLSX son ZIP; lo demás (p. ej. un CSV sin extensión detectado por su contenido) se lee como CSV
+    if Path(file_path).suffix.lower() == ".csv" or not zipfile.is_zipfile(file_path):
+        yield from _group_rows(_iter_csv_rows(file_path), None, max_tokens)
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = enumerate(worksheet.iter_rows(values_only=True), start=1)
+            yield from _group_rows(rows, worksheet.title, max_tokens)
+    finally:
+        # En modo read-only el libro mantiene el archivo abierto hasta cerrarlo
+        workbook.close()
+
+
+def load_xlsx(file_path: str) -> str:
+    """Extrae el texto de un archivo XLSX/CSV (grupos de filas, cada uno con su cabecera)."""
+    return "\n".join(text for text, _ in iter_row_groups(file_path))
@@ -1,14 +1,27 @@
 import os
 import sys
 import asyncio
+import logging
 import shutil
-import traceback
 from dotenv import load_dotenv
 
 from langchain_community.document_loaders import DirectoryLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+# --- sys.path para importar rag.embedding_cache ---
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from rag.embedding_cache import CachedEmbeddings
+from rag.embedding_scheduler import EmbeddingScheduler
+from ingest.streaming import batched, prefetch
+from ingest.chunking import iter_chunks as iter_text_chunks
+from rag.metrics import INGESTED_CHUNKS, span
+
+logger = logging.getLogger(__name__)
 
 # Cargar variables de entorno
 load_dotenv()
@@ -20,6 +33,10 @@ import yaml
 FAISS_INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "index", "vector", "faiss_index"))
 # Ruta al archivo de configuración de fuentes
 SOURCES_CONFIG_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "config", "sources.yaml"))
+# Caché de embeddings por hash de chunk (compartida con RAGSystem)
+EMBEDDING_CACHE_PATH = os.path.join(ROOT, ".cache", "embeddings")
+# Chunks que se embeben y añaden al índice en cada lote
+EMBED_BATCH_SIZE = 256
 
 def load_sources_config(config_path):
     with open(config_path, 'r', encoding='utf-8') as f:
@@ -46,88 +63,104 @@ def _ensure_event_loop():
     except RuntimeError:
         asyncio.set_event_loop(asyncio.new_event_loop())
 
+def iter_documents(stats):
+    """Carga los documentos de todas las rutas configuradas de uno en uno."""
+    for path in ALL_DATA_PATHS:
+        if not os.path.exists(path):
+            logger.warning("La ruta de datos '%s' no existe y será omitida.", path)
+            continue
+        logger.info("Cargando documentos desde: %s", path)
+        loader = DirectoryLoader(
+            path,
+            glob="**/*.*",
+            show_progress=True,
+            use_multithreading=True,
+            silent_errors=True,
+        )
+        for document in loader.lazy_load():
+            stats["documents"] += 1
+            yield document
+
+def iter_chunks(documents, stats):
+    """Divide cada documento en chunks a medida que se carga, con el motor de chunking común."""
+    for document in documents:
+        for text, metadata in iter_text_chunks(document.page_content, document.metadata):
+            stats["chunks"] += 1
+            yield Document(page_content=text, metadata=metadata)
+
 def main():
     """Función principal para indexar los documentos."""
-    print("Iniciando el proceso de indexación...")
-    print(f"Rutas de datos configuradas: {ALL_DATA_PATHS}")
-    print(f"Carpeta destino del índice FAISS: {FAISS_INDEX_PATH}")
-    print(f"CWD (carpeta desde la que ejecutas): {os.getcwd()}")
+    logger.info("Iniciando el proceso de indexación...")
+    logger.info("Rutas de datos configuradas: %s", ALL_DATA_PATHS)
+    logger.info("Carpeta destino del índice FAISS: %s", FAISS_INDEX_PATH)
+    logger.info("CWD (carpeta desde la que ejecutas): %s", os.getcwd())
 
     # Asegurar event loop antes de inicializar clientes que usan asyncio
     _ensure_event_loop()
 
     # Validar API Key
     if not os.getenv("GOOGLE_API_KEY"):
-        print("Error: La variable de entorno GOOGLE_API_KEY no está configurada.")
+        logger.error("La variable de entorno GOOGLE_API_KEY no está configurada.")
         return
 
     # Validar que haya rutas de datos configuradas
     if not ALL_DATA_PATHS:
-        print("Error: No se han configurado rutas de datos en sources.yaml.")
+        logger.error("No se han configurado rutas de datos en sources.yaml.")
         return
 
     try:
-        # 1) Cargar documentos
-        all_documents = []
-        for path in ALL_DATA_PATHS:
-            if not os.path.exists(path):
-                print(f"Advertencia: La ruta de datos '{path}' no existe y será omitida.")
-                continue
-            print(f"Cargando documentos desde: {path}")
-            loader = DirectoryLoader(
-                path,
-                glob="**/*.*",
-                show_progress=True,
-                use_multithreading=True,
-                silent_errors=True,
-            )
-            documents = loader.load()
-            all_documents.extend(documents)
-
-        if not all_documents:
-            print("No se encontraron documentos para indexar en ninguna de las rutas configuradas. Revisa las carpetas y los formatos.")
-            return
-
-        documents = all_documents # Usar el nombre de variable original para el resto del script
-
-        if not documents:
-            print("No se encontraron documentos para indexar. Revisa la carpeta y los formatos.")
-            return
-
-        print(f"Se cargaron {len(documents)} documentos.")
-
-        # 2) Split en chunks
-        print("Dividiendo documentos en chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-        docs = text_splitter.split_documents(documents)
-        print(f"Se han creado {len(docs)} chunks de texto.")
-
-        # 3) Embeddings (forzar REST si la versión lo permite; si no, fallback)
-        print("Creando embeddings con el modelo de Google...")
+        # 1) Embeddings (forzar REST si la versión lo permite; si no, fallback)
         try:
             embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004", transport="rest")
         except TypeError:
             embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+        # Lotes concurrentes con límite de peticiones y reintentos ante 429 (configurable con EMBED_*)
+        scheduler = EmbeddingScheduler.from_env(embeddings)
+        # Solo se llama a la API para chunks cuyo contenido no se haya embebido antes
+        embeddings = CachedEmbeddings(scheduler, model_name="models/text-embedding-004", cache_dir=EMBEDDING_CACHE_PATH)
+
+        # 2) Carga -> chunks -> embeddings -> FAISS en streaming, por lotes de EMBED_BATCH_SIZE.
+        # La carga y el chunking corren en segundo plano con una cola acotada, así que
+        # nunca se tienen todos los documentos ni todos los chunks en memoria a la vez.
+        logger.info("Cargando, dividiendo y creando embeddings por lotes... (esto puede tardar)")
+        stats = {"documents": 0, "chunks": 0}
+        chunk_batches = prefetch(batched(iter_chunks(iter_documents(stats), stats), EMBED_BATCH_SIZE), maxsize=2)
+
+        db = None
+        for batch in chunk_batches:
+            with span("ingest.upsert"):
+                if db is None:
+                    db = FAISS.from_documents(batch, embeddings)
+                else:
+                    db.add_documents(batch)
+            INGESTED_CHUNKS.inc(len(batch))
+            logger.info("  -> %s chunks indexados de %s documentos...", stats['chunks'], stats['documents'])
+
+        if db is None:
+            logger.warning("No se encontraron documentos para indexar en ninguna de las rutas configuradas. Revisa las carpetas y los formatos.")
+            return
 
-        # 4) Crear y guardar índice FAISS
-        print("Creando y guardando el índice FAISS... (esto puede tardar)")
+        logger.info("Se cargaron %s documentos y se crearon %s chunks de texto.", stats['documents'], stats['chunks'])
 
+        # 3) Guardar índice FAISS
         if os.path.exists(FAISS_INDEX_PATH):
-            print(f"Eliminando índice antiguo en '{FAISS_INDEX_PATH}'...")
+            logger.info("Eliminando índice antiguo en '%s'...", FAISS_INDEX_PATH)
             shutil.rmtree(FAISS_INDEX_PATH)
 
-        db = FAISS.from_documents(docs, embeddings)
         db.save_local(FAISS_INDEX_PATH)
+        logger.info("Embeddings reutilizados de la caché: %s, nuevos: %s", embeddings.stats['document_hits'], embeddings.stats['document_misses'])
+        throughput = scheduler.throughput()
+        logger.info("Rendimiento de embeddings: %.1f chunks/s, %.0f tokens/s, %d reintentos por rate limit.",
+                    throughput['chunks_per_second'], throughput['tokens_per_second'], throughput['retries'])
 
-        print("\n¡Proceso de indexación completado con éxito!")
-        print(f"El índice ha sido guardado en: '{FAISS_INDEX_PATH}'")
-        print("Archivos esperados: 'index.faiss' y 'index.pkl' dentro de esa carpeta.")
+        logger.info("¡Proceso de indexación completado con éxito!")
+        logger.info("El índice ha sido guardado en: '%s'", FAISS_INDEX_PATH)
+        logger.info("Archivos esperados: 'index.faiss' y 'index.pkl' dentro de esa carpeta.")
 
-    except Exception as e:
-        print("\nOcurrió un error durante la indexación:")
-        print(e)
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Ocurrió un error durante la indexación")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     main()
 
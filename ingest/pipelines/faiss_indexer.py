@@ -0,0 +1,75 @@
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from langchain_core.documents import Document as LCDocument
+from langchain_core.embeddings import Embeddings
+
+from chatbox.rag.embedding_cache import CachedEmbeddings
+from chatbox.rag.embedding_scheduler import EmbeddingScheduler
+
+logger = logging.getLogger(__name__)
+
+# Modelo de embeddings de cada proveedor (el mismo que el indexador heredado para Google)
+EMBEDDING_MODELS = {
+    "google": "models/text-embedding-004",
+    "openai": "text-embedding-3-small",
+}
+
+
+def _provider_embeddings(llm_provider: str, model: str) -> Embeddings:
+    if llm_provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model)
+    if llm_provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=model)
+    raise ValueError(f"Proveedor de embeddings no soportado: {llm_provider} (disponibles: {', '.join(EMBEDDING_MODELS)})")
+
+
+class FAISSIndexer:
+    """
+    Índice FAISS que `ingest_all` construye desde cero en cada ejecución.
+    Los chunks se embeben a través de `EmbeddingScheduler` (lotes concurrentes,
+    límite de peticiones y reintentos ante 429, configurable con EMBED_*) y de la
+    caché de embeddings por contenido: solo los chunks nuevos llegan a la API.
+    El índice se escribe en `index_path` (FAISS_INDEX_PATH) al llamar a `save`.
+    """
+    def __init__(self,
+                 llm_provider: str = "google",
+                 index_path: Optional[Union[str, Path]] = None,
+                 cache_dir: Optional[Union[str, Path]] = "./.cache/embeddings"):
+        model = EMBEDDING_MODELS.get(llm_provider, "")
+        self.scheduler = EmbeddingScheduler.from_env(_provider_embeddings(llm_provider, model))
+        self.embeddings = CachedEmbeddings(self.scheduler, model_name=model, cache_dir=cache_dir)
+        self.index_path = Path(index_path or os.getenv("FAISS_INDEX_PATH", "./index/vector/faiss_index"))
+        self._db = None
+
+    def add_documents(self, chunks: List[Dict]):
+        """Embebe y añade chunks de `chunk_document` (`{"content", "metadata"}`)."""
+        from langchain_community.vectorstores import FAISS
+        documents = [LCDocument(page_content=chunk["content"], metadata=chunk["metadata"]) for chunk in chunks]
+        if not documents:
+            return
+        if self._db is None:
+            self._db = FAISS.from_documents(documents, self.embeddings)
+        else:
+            self._db.add_documents(documents)
+
+    def save(self) -> bool:
+        """Sustituye el índice guardado por el construido; False si no se añadió ningún chunk."""
+        if self._db is None:
+            return False
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        self._db.save_local(str(tmp_path))
+        shutil.rmtree(self.index_path, ignore_errors=True)
+        tmp_path.rename(self.index_path)
+        throughput = self.scheduler.throughput()
+        logger.info("Embeddings reutilizados de la caché: %d, nuevos: %d",
+                    self.embeddings.stats["document_hits"], self.embeddings.stats["document_misses"])
+        logger.info("Rendimiento de embeddings: %.1f chunks/s, %.0f tokens/s, %d reintentos por rate limit.",
+                    throughput["chunks_per_second"], throughput["tokens_per_second"], throughput["retries"])
+        return True
@@ -1,3 +1,5 @@
+import logging
+import os
 import sys
 from pathlib import Path
 import yaml
@@ -10,7 +12,13 @@ load_dotenv() # Carga las variables de entorno desde el archivo .env
 
 from chatbox.ingest.parsers.main_parser import parse_document, chunk_document
 from chatbox.ingest.parsers.base import Document
-from chatbox.index.vector.faiss_index import FAISSIndexer
+from chatbox.ingest.parallel import parallel_map
+from chatbox.ingest.crawler import CrawlCache, WebCrawler, crawl_site
+from chatbox.ingest.parsers.web import page_to_document
+from chatbox.ingest.pipelines.faiss_indexer import FAISSIndexer
+from chatbox.rag.metrics import INGESTED_CHUNKS, INGESTED_FILES, span
+
+logger = logging.getLogger(__name__)
 
 def generate_hash(content: str) -> str:
     """
@@ -18,7 +26,7 @@ def generate_hash(content: str) -> str:
     """
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
-def process_source(source: Dict, indexer: FAISSIndexer):
+def process_source(source: Dict, indexer: FAISSIndexer, max_workers: int = 1):
     """
     Procesa una única fuente de datos (directorio local o página web).
     """
@@ -28,7 +36,7 @@ def process_source(source: Dict, indexer: FAISSIndexer):
     for path_str in paths:
         if kind == 'local_folder':
             directory_path = project_root / path_str
-            ingest_documents_from_directory(directory_path, indexer)
+            ingest_documents_from_directory(directory_path, indexer, max_workers=max_workers)
         elif kind == 'web_page':
             ingest_document_from_web(path_str, indexer)
 
@@ -36,57 +44,106 @@ def ingest_document_from_web(url: str, indexer: FAISSIndexer):
     """
     Ingesta un documento desde una URL.
     """
-    print(f"Procesando página web: {url}")
+    logger.info("Procesando página web: %s", url)
     try:
-        doc = parse_document(url, source_kind='web_page')
+        with span("ingest.parse"):
+            doc = parse_document(url, source_kind='web_page')
         if not doc or not doc.page_content:
-            print(f"Advertencia: No se pudo extraer contenido de {url}. Saltando.")
+            logger.warning("No se pudo extraer contenido de %s. Saltando.", url)
+            INGESTED_FILES.inc(result="failed")
             return
 
         # Enriquecer metadatos para la web
         doc.metadata["ingested_at"] = datetime.datetime.now().isoformat()
         doc.metadata["hash"] = generate_hash(doc.page_content)
 
-        chunks = chunk_document(doc)
-        if chunks:
-            indexer.add_documents(chunks)
-            print(f"  -> {len(chunks)} chunks generados y añadidos al índice.")
+        _index_document(doc, indexer)
 
     except Exception as e:
-        print(f"Error al procesar {url}: {e}")
+        INGESTED_FILES.inc(result="failed")
+        logger.error("Error al procesar %s: %s", url, e)
+
+def ingest_sites(sites: List[Dict], indexer: FAISSIndexer, cache_path: Union[str, Path, None] = None,
+                 rebuild: bool = False):
+    """
+    Rastrea los sitios de config/allowlist.yaml (respetando `crawl` y `depth`) e
+    indexa las páginas nuevas o modificadas. Los validadores HTTP de cada página se
+    guardan en `cache_path` solo cuando está indexada, así que en cada re-rastreo se
+    saltan las páginas sin cambios y se reintentan las que fallaron.
+    Con `rebuild` (el índice destino se construye desde cero) se indexan todas las
+    páginas, pero las peticiones siguen siendo condicionales: las que no han cambiado
+    se indexan con el texto guardado en la caché, sin volver a descargarlas.
+    """
+    cache = CrawlCache(cache_path)
+    crawler = WebCrawler.from_env(cache, emit_unchanged=rebuild)
+    for site in sites:
+        logger.info("Rastreando sitio: %s (crawl=%s, depth=%s)", site.get('name'), site.get('crawl', False), site.get('depth', 0))
+        with span("ingest.crawl"):
+            pages = crawl_site(site, crawler)
+        for page in pages:
+            try:
+                doc = page_to_document(page)
+                if doc.page_content:
+                    doc.metadata["ingested_at"] = datetime.datetime.now().isoformat()
+                    doc.metadata["hash"] = generate_hash(doc.page_content)
+                    _index_document(doc, indexer)
+            except Exception as e:
+                INGESTED_FILES.inc(result="failed")
+                logger.error("Error al procesar %s: %s", page.url, e)
+                continue
+            cache.commit(page)
+        cache.save()
+
+def _index_document(doc: Document, indexer: FAISSIndexer):
+    """Chunkea un documento ya parseado y sube sus chunks al índice."""
+    with span("ingest.chunk"):
+        chunks = chunk_document(doc)
+    if chunks:
+        with span("ingest.upsert"):
+            indexer.add_documents(chunks)
+        INGESTED_CHUNKS.inc(len(chunks))
+        logger.info("  -> %d chunks generados y añadidos al índice.", len(chunks))
+    INGESTED_FILES.inc(result="indexed")
 
 def ingest_documents_from_directory(directory_path: Union[str, Path], 
-                                    indexer: FAISSIndexer):
+                                    indexer: FAISSIndexer,
+                                    max_workers: int = 1,
+                                    timeout: float = 300.0):
     """
     Ingesta documentos de un directorio, parsea, chunkea y extrae metadatos.
+    Con `max_workers` > 1 el parseo se reparte en un pool de procesos, con un
+    límite de `timeout` segundos por archivo; el resultado es el mismo que en serie.
     """
     directory_path = Path(directory_path)
     if not directory_path.is_dir():
-        print(f"Error: La ruta no es un directorio válido: {directory_path}")
+        logger.error("La ruta no es un directorio válido: %s", directory_path)
         return
 
-    for file_path in directory_path.rglob('*'):
-        if file_path.is_file():
-            print(f"Procesando archivo: {file_path}")
-            try:
-                doc = parse_document(file_path, source_kind='local_folder')
-                if not doc.page_content:
-                    print(f"Advertencia: No se pudo extraer contenido de {file_path}. Saltando.")
-                    continue
-
-                # Enriquecer metadatos
-                doc.metadata["ingested_at"] = datetime.datetime.now().isoformat()
-                doc.metadata["hash"] = generate_hash(doc.page_content)
-
-                chunks = chunk_document(doc)
-                if chunks:
-                    indexer.add_documents(chunks)
-                    print(f"  -> {len(chunks)} chunks generados y añadidos al índice.")
-
-            except Exception as e:
-                print(f"Error al procesar {file_path}: {e}")
+    files = [p for p in directory_path.rglob('*') if p.is_file()]
+    for file_path, doc, error in parallel_map(parse_document, files, max_workers=max_workers, timeout=timeout):
+        logger.info("Procesando archivo: %s", file_path)
+        if error is not None:
+            INGESTED_FILES.inc(result="failed")
+            logger.error("Error al procesar %s: %s", file_path, error)
+            continue
+        try:
+            if not doc.page_content:
+                INGESTED_FILES.inc(result="failed")
+                logger.warning("No se pudo extraer contenido de %s. Saltando.", file_path)
+                continue
+
+            # Enriquecer metadatos
+            doc.metadata["ingested_at"] = datetime.datetime.now().isoformat()
+            doc.metadata["hash"] = generate_hash(doc.page_content)
+
+            _index_document(doc, indexer)
+
+        except Exception as e:
+            INGESTED_FILES.inc(result="failed")
+            logger.error("Error al procesar %s: %s", file_path, e)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     project_root = Path(__file__).resolve().parents[3]
     # Cargar configuración de fuentes
     config_path = project_root / 'chatbox' / 'config' / 'sources.yaml'
@@ -95,15 +152,34 @@ if __name__ == "__main__":
 
     # Inicializar el indexador FAISS
     try:
-        indexer = FAISSIndexer(llm_provider="openai")
+        indexer = FAISSIndexer(llm_provider="openai",
+                               index_path=os.getenv("FAISS_INDEX_PATH", str(project_root / 'chatbox' / 'index' / 'vector' / 'faiss_index')),
+                               cache_dir=project_root / 'chatbox' / '.cache' / 'embeddings')
     except Exception as e:
-        print(f"Error al inicializar el indexador: {e}")
-        print("Asegúrate de que tu API Key (OPENAI_API_KEY o GOOGLE_API_KEY) esté configurada correctamente.")
+        logger.error("Error al inicializar el indexador: %s", e)
+        logger.error("Asegúrate de que tu API Key (OPENAI_API_KEY o GOOGLE_API_KEY) esté configurada correctamente.")
         exit()
 
+    # Número de procesos para parsear archivos en paralelo
+    max_workers = int(os.getenv("INGEST_WORKERS", "1"))
+
     # Procesar cada fuente definida en el YAML
     for source in config.get('sources', []):
-        print(f"\n--- Procesando fuente: {source.get('name')} ({source.get('kind')}) ---")
-        process_source(source, indexer)
-
-    print("\n--- Ingesta completada para todas las fuentes ---")
\ No newline at end of file
+        logger.info("--- Procesando fuente: %s (%s) ---", source.get('name'), source.get('kind'))
+        process_source(source, indexer, max_workers=max_workers)
+
+    # Sitios web a rastrear (crawl/depth) definidos en allowlist.yaml
+    sites_path = project_root / 'chatbox' / 'config' / 'allowlist.yaml'
+    if sites_path.exists():
+        with open(sites_path, 'r') as f:
+            sites = (yaml.safe_load(f) or {}).get('sites', [])
+        # El índice FAISS se construye desde cero en cada ejecución (como los directorios
+        # locales): las páginas sin cambios también se indexan, desde la caché de rastreo
+        ingest_sites(sites, indexer, rebuild=True,
+                     cache_path=os.getenv("CRAWL_CACHE_PATH", str(project_root / 'chatbox' / '.cache' / 'crawl_cache.json')))
+
+    if indexer.save():
+        logger.info("Índice FAISS guardado en: %s", indexer.index_path)
+    else:
+        logger.warning("No se indexó ningún chunk; se conserva el índice FAISS anterior.")
+    logger.info("--- Ingesta completada para todas las fuentes ---")
\ No newline at end of file
@@ -0,0 +1,69 @@
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _ProducerError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Agrupa `iterable` en listas de como mucho `size` elementos, sin materializarlo."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 4) -> Iterator[T]:
+    """
+    Consume `iterable` en un hilo en segundo plano y entrega sus elementos a través
+    de una cola acotada a `maxsize`. Sirve para solapar dos etapas del pipeline
+    (p. ej. parseo y subida) sin que la etapa rápida acumule memoria: si el
+    consumidor va por detrás, el productor se bloquea.
+    Las excepciones del productor se relanzan en el consumidor.
+    """
+    items: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put(item):
+                    break
+        except BaseException as e:
+            put(_ProducerError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            put(_DONE)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
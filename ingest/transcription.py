@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import wave
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .parallel import parallel_map
+
+logger = logging.getLogger(__name__)
+
+# Frecuencia a la que se decodifica el audio (la que espera Whisper)
+SAMPLE_RATE = 16000
+# Ventana para medir la energía del audio al buscar silencios
+_FRAME_SECONDS = 0.03
+
+
+class TranscriptSegment(NamedTuple):
+    start: float  # segundos
+    end: float
+    text: str
+
+
+# --- BACKENDS DE TRANSCRIPCIÓN ---
+class Transcriber:
+    """
+    Interfaz de los backends: `transcribe(audio, sample_rate)` recibe un segmento
+    mono en float32 ([-1, 1]) y devuelve su texto. `name` identifica el backend y
+    el modelo en la caché de transcripciones. Los backends se envían por pickle a
+    los procesos del pool, así que no deben guardar el modelo cargado en su estado.
+    """
+    name = "base"
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        raise NotImplementedError
+
+
+# Modelos de Whisper cargados en este proceso (uno por nombre)
+_WHISPER_MODELS: Dict[str, object] = {}
+
+
+class WhisperTranscriber(Transcriber):
+    """Transcripción local en CPU con openai-whisper. Requiere la librería openai-whisper."""
+    def __init__(self, model: str = "base", language: Optional[str] = "es"):
+        self.model = model
+        self.language = language
+        self.name = f"whisper-{model}"
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int) -> str:
+        if self.model not in _WHISPER_MODELS:
+            import whisper
+            _WHISPER_MODELS[self.model] = whisper.load_model(self.model, device="cpu")
+        if sample_rate != SAMPLE_RATE:
+            audio = _resample(audio, sample_rate, SAMPLE_RATE)
+        result = _WHISPER_MODELS[self.model].transcribe(audio, language=self.language, fp16=False)
+        return result["text"].strip()
+
+
+TRANSCRIBERS: Dict[str, Callable[[], Transcriber]] = {
+    "whisper": lambda: WhisperTranscriber(os.getenv("WHISPER_MODEL", "base"), os.getenv("WHISPER_LANGUAGE", "es") or None),
+}
+
+
+def register_transcriber(name: str, factory: Callable[[], Transcriber]):
+    """Añade (o sustituye) un backend seleccionable con TRANSCRIBER_BACKEND."""
+    TRANSCRIBERS[name] = factory
+
+
+def get_transcriber(name: Optional[str] = None) -> Transcriber:
+    name = name or os.getenv("TRANSCRIBER_BACKEND", "whisper")
+    if name not in TRANSCRIBERS:
+        raise ValueError(f"Backend de transcripción desconocido: {name} (disponibles: {', '.join(sorted(TRANSCRIBERS))})")
+    return TRANSCRIBERS[name]()
+
+
+# --- AUDIO ---
+def _resample(audio: np.ndarray, rate: int, target: int) -> np.ndarray:
+    positions = np.linspace(0, len(audio) - 1, int(len(audio) * target / rate))
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def load_audio(file_path: str) -> Tuple[np.ndarray, int]:
+    """
+    Audio mono en float32 y su frecuencia de muestreo. Los WAV PCM de 16 bits se
+    leen con la librería estándar; el resto de formatos (mp3, mp4, mov...) se
+    decodifican a 16 kHz con ffmpeg (requiere ffmpeg-python y el binario ffmpeg).
+    """
+    if Path(file_path).suffix.lower() == ".wav":
+        with wave.open(file_path, "rb") as wav:
+            if wav.getsampwidth() == 2:
+                frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+                audio = frames.reshape(-1, wav.getnchannels()).mean(axis=1)
+                return (audio / 32768.0).astype(np.float32), wav.getframerate()
+
+    import ffmpeg
+    out, _ = (ffmpeg.input(file_path)
+              .output("-", format="s16le", acodec="pcm_s16le", ac=1, ar=SAMPLE_RATE)
+              .run(capture_stdout=True, capture_stderr=True))
+    return (np.frombuffer(out, dtype=np.int16) / 32768.0).astype(np.float32), SAMPLE_RATE
+
+
+def split_on_silence(audio: np.ndarray,
+                     sample_rate: int,
+                     min_seconds: float = 10.0,
+                     max_seconds: float = 30.0) -> List[Tuple[int, int]]:
+    """
+    Parte el audio en segmentos `(inicio, fin)` (en muestras) de entre `min_seconds`
+    y `max_seconds`, cortando en el momento más silencioso de cada ventana para
+    no partir palabras. El último segmento puede ser más corto.
+    """
+    frame = max(1, int(_FRAME_SECONDS * sample_rate))
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+    # Energía (RMS) de cada ventana
+    energy = np.sqrt(np.mean(audio[:n_frames * frame].reshape(n_frames, frame) ** 2, axis=1))
+
+    min_frames = max(1, int(min_seconds * sample_rate / frame))
+    max_frames = max(min_frames, int(max_seconds * sample_rate / frame))
+    segments = []
+    start = 0
+    while n_frames - start > max_frames:
+        window = energy[start + min_frames:start + max_frames + 1]
+        # En caso de empate (silencio total), el último: segmentos lo más largos posible
+        cut = start + min_frames + len(window) - 1 - int(np.argmin(window[::-1]))
+        segments.append((start * frame, cut * frame))
+        start = cut
+    segments.append((start * frame, len(audio)))
+    return segments
+
+
+# --- TRANSCRIPCIÓN ---
+def _transcribe_segment(task: Tuple[Transcriber, np.ndarray, int]) -> str:
+    """Transcribe un segmento. Es una función de módulo para poder usarla en un pool de procesos."""
+    transcriber, audio, sample_rate = task
+    return transcriber.transcribe(audio, sample_rate)
+
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """Transcripciones por hash del archivo y backend: un vídeo renombrado o movido no se vuelve a transcribir."""
+    def __init__(self, cache_dir: Optional[str]):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+    def _path(self, media_hash: str, transcriber: Transcriber) -> Optional[Path]:
+        return self.cache_dir / f"{media_hash}-{transcriber.name}.json" if self.cache_dir else None
+
+    def get(self, media_hash: str, transcriber: Transcriber) -> Optional[List[TranscriptSegment]]:
+        path = self._path(media_hash, transcriber)
+        if path is None or not path.exists():
+            return None
+        return [TranscriptSegment(*row) for row in json.loads(path.read_text(encoding="utf-8"))]
+
+    def put(self, media_hash: str, transcriber: Transcriber, segments: List[TranscriptSegment]):
+        path = self._path(media_hash, transcriber)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps([list(segment) for segment in segments], ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+
+def transcribe_media(file_path: str,
+                     transcriber: Optional[Transcriber] = None,
+                     workers: Optional[int] = None,
+                     cache_dir: Optional[str] = None,
+                     min_seconds: float = 10.0,
+                     max_seconds: float = 30.0) -> List[TranscriptSegment]:
+    """
+    Transcribe un archivo de audio/vídeo por segmentos alineados con silencios.
+    - Los segmentos se transcriben en paralelo en `workers` procesos
+      (TRANSCRIBE_WORKERS, 1 por defecto); dentro de un worker de la ingesta, que
+      ya es un proceso del pool, se transcriben en serie.
+    - La transcripción se guarda en `cache_dir` (TRANSCRIPT_CACHE_DIR,
+      ./.cache/transcripts por defecto) por hash del archivo y backend.
+    Un segmento que falla hace fallar el archivo entero, como cualquier parser.
+    """
+    transcriber = transcriber or get_transcriber()
+    workers = int(os.getenv("TRANSCRIBE_WORKERS", "1")) if workers is None else workers
+    cache = TranscriptCache(cache_dir if cache_dir is not None else os.getenv("TRANSCRIPT_CACHE_DIR", "./.cache/transcripts"))
+
+    media_hash = file_hash(file_path)
+    cached = cache.get(media_hash, transcriber)
+    if cached is not None:
+        logger.debug("Transcripción de %s recuperada de la caché", file_path)
+        return cached
+
+    audio, sample_rate = load_audio(file_path)
+    spans = split_on_silence(audio, sample_rate, min_seconds, max_seconds)
+    if multiprocessing.current_process().daemon:
+        workers = 1
+    tasks = [(transcriber, audio[start:end], sample_rate) for start, end in spans]
+    segments = []
+    for (start, end), (_, text, error) in zip(spans, parallel_map(_transcribe_segment, tasks, max_workers=workers)):
+        if error is not None:
+            raise error
+        segments.append(TranscriptSegment(round(start / sample_rate, 2), round(end / sample_rate, 2), text))
+    logger.info("Transcrito %s: %d segmentos (%.1fs de audio)", file_path, len(segments), len(audio) / sample_rate)
+    cache.put(media_hash, transcriber, segments)
+    return segments
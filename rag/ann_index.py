@@ -0,0 +1,144 @@
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Índice aproximado de tipo IVF (inverted file) para vectores normalizados.
+    - `train` agrupa los vectores en `n_lists` clusters con k-means esférico
+      (similitud coseno) sobre una muestra de como mucho `train_sample` filas.
+    - Cada fila de la matriz se asigna a su centroide más cercano; la búsqueda solo
+      puntúa las filas de las `n_probe` listas cuyos centroides se parecen más a la
+      consulta. Más `n_probe` => más recall y más latencia.
+    - La asignación es incremental: las filas nuevas se añaden a su lista sin
+      reentrenar. `needs_training` indica cuándo conviene reentrenar porque el índice
+      ha crecido mucho desde el último entrenamiento.
+    Las filas son las de la matriz del vector store; el índice no guarda vectores.
+    """
+    def __init__(self, n_lists: int = 256, n_probe: int = 8, n_iter: int = 10,
+                 train_sample: Optional[int] = None, retrain_growth: float = 2.0, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.train_sample = train_sample or 256 * n_lists
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, n_rows: int) -> bool:
+        if n_rows < self.n_lists:
+            return False
+        return not self.is_trained or n_rows > self.retrain_growth * self.trained_rows
+
+    # --- Entrenamiento y asignación ---
+    def _nearest(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        nearest = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            nearest[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        return nearest
+
+    def train(self, matrix: np.ndarray):
+        """Calcula los centroides con k-means esférico y reasigna todas las filas de `matrix`."""
+        n_rows = len(matrix)
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self.n_lists, n_rows)
+        sample_rows = np.sort(rng.choice(n_rows, size=min(n_rows, self.train_sample), replace=False))
+        sample = np.ascontiguousarray(matrix[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            nearest = self._nearest(sample, centroids)
+            counts = np.bincount(nearest, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            order = np.argsort(nearest, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            non_empty = counts > 0
+            sums[non_empty] = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+            # Los clusters vacíos se vuelven a sembrar con puntos aleatorios de la muestra
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.set_rows(np.arange(n_rows), matrix)
+        self.trained_rows = n_rows
+
+    def set_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        """Asigna (o reasigna) las filas `rows`, cuyos vectores son `vectors`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        if rows.max() >= len(self.assignments):
+            grown = np.full(int(rows.max()) + 1, -1, dtype=np.int32)
+            grown[:len(self.assignments)] = self.assignments
+            self.assignments = grown
+        for start in range(0, len(rows), 8192):
+            batch = np.ascontiguousarray(vectors[start:start + 8192], dtype=np.float32)
+            self.assignments[rows[start:start + 8192]] = self._nearest(batch, self.centroids)
+        self._order = None
+
+    def compact(self, live_rows: np.ndarray):
+        """Renumera las filas igual que la matriz compactada (solo quedan `live_rows`)."""
+        self.assignments = self.assignments[live_rows]
+        self._order = None
+
+    def reset(self):
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self._order = None
+
+    # --- Búsqueda ---
+    def candidates(self, query: np.ndarray, n_probe: Optional[int] = None) -> np.ndarray:
+        """Filas (ordenadas) de las `n_probe` listas más cercanas a `query`."""
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind="stable")
+            self._offsets = np.searchsorted(self.assignments[self._order], np.arange(len(self.centroids) + 1))
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        rows = np.concatenate([self._order[self._offsets[l]:self._offsets[l + 1]] for l in probe])
+        # Ordenadas para leer la matriz memory-mapped de forma secuencial
+        return np.sort(rows)
+
+    # --- Persistencia ---
+    def save(self, directory: Union[str, Path]):
+        directory = Path(directory)
+        if not self.is_trained:
+            for name in ("ivf_centroids.npy", "ivf_assignments.npy"):
+                (directory / name).unlink(missing_ok=True)
+            return
+        for name, array in (("ivf_centroids.npy", self.centroids),
+                            ("ivf_assignments.npy", self.assignments)):
+            tmp_path = directory / f"{name}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            tmp_path.replace(directory / name)
+        (directory / "ivf_trained_rows").write_text(str(self.trained_rows))
+
+    def load(self, directory: Union[str, Path], n_rows: int) -> bool:
+        """Carga el índice guardado; devuelve False si no existe o no cuadra con la matriz."""
+        directory = Path(directory)
+        try:
+            centroids = np.load(directory / "ivf_centroids.npy")
+            assignments = np.load(directory / "ivf_assignments.npy")
+            trained_rows = int((directory / "ivf_trained_rows").read_text())
+        except (OSError, ValueError):
+            return False
+        if len(centroids) != min(self.n_lists, trained_rows) or len(assignments) != n_rows:
+            return False
+        self.centroids, self.assignments, self.trained_rows = centroids, assignments, trained_rows
+        self._order = None
+        return True
@@ -0,0 +1,201 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .metrics import CACHE_REQUESTS
+
+INDEX_VERSION_FILE = "index_version"
+
+
+def read_index_version(cache_dir: Optional[Union[str, Path]]) -> str:
+    """Versión actual del índice vectorial (cambia cada vez que se modifica el índice)."""
+    if cache_dir is None:
+        return ""
+    version_file = Path(cache_dir) / INDEX_VERSION_FILE
+    return version_file.read_text(encoding="utf-8").strip() if version_file.exists() else ""
+
+
+def bump_index_version(cache_dir: Optional[Union[str, Path]]) -> str:
+    """
+    Marca el índice como modificado. Cualquier proceso que comparta `cache_dir`
+    (la app, la API, scripts/reindex.py) descarta sus respuestas cacheadas.
+    """
+    version = uuid.uuid4().hex
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        (cache_dir / INDEX_VERSION_FILE).write_text(version, encoding="utf-8")
+    return version
+
+
+class SemanticAnswerCache:
+    """
+    Caché de respuestas indexada por el embedding de la pregunta.
+    Una pregunta nueva a distancia coseno <= `max_distance` de una cacheada recibe
+    la respuesta y fuentes de esta, siempre que se hiciera con el mismo `scope`
+    (p. ej. los mismos filtros de metadata). Las entradas caducan a los `ttl` segundos y la
+    caché entera se invalida cuando cambia la versión del índice (`bump_index_version`).
+    Los embeddings se guardan en una matriz NumPy normalizada, así cada búsqueda es
+    un único producto matriz-vector.
+    En disco las entradas se añaden a una tabla SQLite (nunca se reescribe la caché
+    entera), así varios workers que comparten `cache_dir` no se pisan: cada uno
+    incorpora en cada consulta las entradas que han añadido los demás.
+    """
+    def __init__(self,
+                 cache_dir: Optional[Union[str, Path]] = None,
+                 max_distance: float = 0.05,
+                 ttl: float = 24 * 3600,
+                 max_entries: int = 1000):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._created_at = np.empty(0, dtype=np.float64)
+        self._entries: List[Dict] = []
+        self._index_version = read_index_version(self.cache_dir)
+        # Última fila de la tabla ya incorporada a memoria
+        self._last_id = 0
+        self._db = None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.cache_dir / "answer_cache.sqlite"), timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, index_version TEXT NOT NULL, created_at REAL NOT NULL,
+                scope TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, sources TEXT NOT NULL,
+                vector BLOB NOT NULL)""")
+            self._db.commit()
+        self._load()
+
+    # --- Persistencia ---
+    def _load(self):
+        """Incorpora las entradas añadidas a disco (por este u otros procesos) desde la última lectura."""
+        if self._db is None:
+            return
+        rows = self._db.execute(
+            "SELECT id, created_at, scope, question, answer, sources, vector FROM answers "
+            "WHERE id > ? AND index_version = ? ORDER BY id",
+            (self._last_id, self._index_version)).fetchall()
+        if not rows:
+            return
+        self._last_id = rows[-1][0]
+        rows = [row for row in rows if row[1] + self.ttl >= time.time()]
+        if not rows:
+            return
+        self._entries += [{"question": question, "answer": answer, "sources": json.loads(sources),
+                           "scope": scope, "created_at": created_at}
+                          for _, created_at, scope, question, answer, sources, _ in rows]
+        self._created_at = np.append(self._created_at, [row[1] for row in rows])
+        vectors = np.stack([np.frombuffer(row[6], dtype=np.float32) for row in rows])
+        self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+
+    def _append(self, vector: np.ndarray, entry: Dict):
+        if self._db is None:
+            self._entries.append(entry)
+            self._created_at = np.append(self._created_at, entry["created_at"])
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+            return
+        with self._db:
+            self._db.execute(
+                "INSERT INTO answers (index_version, created_at, scope, question, answer, sources, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._index_version, entry["created_at"], entry["scope"], entry["question"], entry["answer"],
+                 json.dumps(entry["sources"], ensure_ascii=False), vector.astype(np.float32).tobytes()))
+            # Limpieza en disco: otras versiones del índice, entradas caducadas y exceso sobre `max_entries`
+            self._db.execute("DELETE FROM answers WHERE index_version != ? OR created_at < ?",
+                             (self._index_version, entry["created_at"] - self.ttl))
+            self._db.execute("DELETE FROM answers WHERE id <= (SELECT id FROM answers ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                             (self.max_entries,))
+        self._load()
+
+    # --- Mantenimiento ---
+    def _reset(self):
+        self._vectors = None
+        self._created_at = np.empty(0, dtype=np.float64)
+        self._entries = []
+        self._last_id = 0
+
+    def _check_index_version(self):
+        current = read_index_version(self.cache_dir)
+        if current != self._index_version:
+            self._index_version = current
+            self._reset()
+            self.stats["invalidations"] += 1
+        self._load()
+
+    def _keep(self, mask: np.ndarray):
+        self._entries = [e for e, keep in zip(self._entries, mask) if keep]
+        self._created_at = self._created_at[mask]
+        self._vectors = self._vectors[mask] if mask.any() else None
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def clear(self):
+        """Vacía la caché (p. ej. tras reindexar desde este mismo proceso)."""
+        with self._lock:
+            self._index_version = read_index_version(self.cache_dir)
+            self._reset()
+            self.stats["invalidations"] += 1
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM answers")
+
+    # --- API ---
+    def get(self, query_vector: List[float], scope: str = "") -> Optional[Dict]:
+        with self._lock:
+            self._check_index_version()
+            if self._vectors is None:
+                self.stats["misses"] += 1
+                CACHE_REQUESTS.inc(cache="answer", result="miss")
+                return None
+
+            similarities = self._vectors @ self._normalize(query_vector)
+            similarities[self._created_at + self.ttl < time.time()] = -np.inf
+            similarities[np.array([e.get("scope", "") != scope for e in self._entries])] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] >= 1.0 - self.max_distance:
+                self.stats["hits"] += 1
+                CACHE_REQUESTS.inc(cache="answer", result="hit")
+                entry = self._entries[best]
+                return {"answer": entry["answer"], "sources": list(entry["sources"])}
+
+            self.stats["misses"] += 1
+            CACHE_REQUESTS.inc(cache="answer", result="miss")
+            return None
+
+    def put(self, query_vector: List[float], question: str, answer: str, sources: List[str], scope: str = ""):
+        with self._lock:
+            self._check_index_version()
+            now = time.time()
+            vector = self._normalize(query_vector)
+
+            if self._vectors is not None:
+                self._keep(self._created_at + self.ttl >= now)
+            if self._vectors is not None and len(self._entries) >= self.max_entries:
+                mask = np.ones(len(self._entries), dtype=bool)
+                mask[:len(self._entries) - self.max_entries + 1] = False
+                self._keep(mask)
+
+            self._append(vector, {"question": question, "answer": answer, "sources": list(sources),
+                                  "scope": scope, "created_at": now})
+
+    def hit_rate(self) -> float:
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "hit_rate": self.hit_rate(), "entries": len(self._entries)}
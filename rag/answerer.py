@@ -1,19 +1,25 @@
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.documents import Document as LCDocument
-from typing import List, Dict
+from typing import List, Dict, Iterator
 import os
 
+from .context import DEFAULT_CONTEXT_TOKENS, build_context
+from .metrics import LLMUsageCallback, span
+
 class Answerer:
-    def __init__(self, llm_provider: str = "openai", model_name: str = "gpt-3.5-turbo"):
+    def __init__(self, llm_provider: str = "openai", model_name: str = "gpt-3.5-turbo",
+                 context_max_tokens: int = DEFAULT_CONTEXT_TOKENS):
         self.llm_provider = llm_provider
         self.model_name = model_name
+        self.context_max_tokens = context_max_tokens
 
+        # SDK del proveedor importado solo al usarlo (tardan segundos en cargar)
         if self.llm_provider == "openai":
+            from langchain_openai import ChatOpenAI
             self.llm = ChatOpenAI(model=self.model_name, temperature=0.7)
         elif self.llm_provider == "gemini":
+            from langchain_google_genai import ChatGoogleGenerativeAI
             self.llm = ChatGoogleGenerativeAI(model=self.model_name, temperature=0.7)
         else:
             raise ValueError(f"Proveedor LLM no soportado: {llm_provider}. Use 'openai' o 'gemini'.")
@@ -24,14 +30,15 @@ class Answerer:
         ])
         self.output_parser = StrOutputParser()
         self.chain = self.prompt_template | self.llm | self.output_parser
+        # Latencia de generación y tokens de prompt/respuesta de cada llamada
+        self._chain_config = {"callbacks": [LLMUsageCallback(stage="answerer.generate")]}
 
-    def generate_answer(self, question: str, documents: List[LCDocument]) -> Dict:
-        """
-        Genera una respuesta a la pregunta basándose en los documentos proporcionados.
-        Devuelve la respuesta y las fuentes citadas.
-        """
-        context_str = "\n\n".join([doc.page_content for doc in documents])
-        
+    def _build_context(self, documents: List[LCDocument]) -> str:
+        with span("context"):
+            return build_context(documents, max_tokens=self.context_max_tokens)
+
+    @staticmethod
+    def _collect_sources(documents: List[LCDocument]) -> set:
         # Recopilar fuentes únicas para citación
         sources = set()
         for doc in documents:
@@ -39,8 +46,17 @@ class Answerer:
                 sources.add(doc.metadata["file_name"])
             elif "source" in doc.metadata: # Para el caso de documentos dummy o de prueba
                 sources.add(doc.metadata["source"])
-        
-        response = self.chain.invoke({"context": context_str, "question": question})
+        return sources
+
+    def generate_answer(self, question: str, documents: List[LCDocument]) -> Dict:
+        """
+        Genera una respuesta a la pregunta basándose en los documentos proporcionados.
+        Devuelve la respuesta y las fuentes citadas.
+        """
+        context_str = self._build_context(documents)
+        sources = self._collect_sources(documents)
+
+        response = self.chain.invoke({"context": context_str, "question": question}, config=self._chain_config)
         
         # Añadir citaciones al final de la respuesta
         if sources:
@@ -48,6 +64,21 @@ class Answerer:
 
         return {"answer": response, "sources": list(sources)}
 
+    def stream_answer(self, question: str, documents: List[LCDocument]) -> Iterator[Dict]:
+        """
+        Igual que `generate_answer`, pero emite la respuesta token a token como eventos
+        `{"type": "token", "content": ...}` y termina con `{"type": "sources", "sources": [...]}`.
+        """
+        context_str = self._build_context(documents)
+        sources = self._collect_sources(documents)
+
+        for token in self.chain.stream({"context": context_str, "question": question}, config=self._chain_config):
+            yield {"type": "token", "content": token}
+
+        if sources:
+            yield {"type": "token", "content": "\n\nFuentes: " + ", ".join(sorted(list(sources)))}
+        yield {"type": "sources", "sources": list(sources)}
+
 if __name__ == "__main__":
     # Ejemplo de uso:
     # Asegúrate de tener las variables de entorno GOOGLE_API_KEY o OPENAI_API_KEY configuradas
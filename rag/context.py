@@ -0,0 +1,124 @@
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document as LCDocument
+
+from ingest.chunking import count_tokens, truncate_to_tokens
+
+# Presupuesto por defecto de tokens de contexto que se envían al LLM
+DEFAULT_CONTEXT_TOKENS = 3000
+# Por debajo de este resto de presupuesto no merece la pena añadir un pasaje recortado
+_MIN_TRUNCATED_TOKENS = 40
+
+
+class _Passage:
+    """Texto contiguo de un archivo, formado por uno o varios chunks fusionados."""
+    def __init__(self, doc: LCDocument, rank: int):
+        # Copia: al fusionar chunks de páginas distintas se amplía su rango de páginas
+        self.metadata = dict(doc.metadata)
+        self.text = doc.page_content
+        self.rank = rank
+        self.start: Optional[int] = doc.metadata.get("char_start")
+        self.end: Optional[int] = doc.metadata.get("char_end")
+
+    def try_extend(self, doc: LCDocument, rank: int) -> bool:
+        """
+        Añade al final `doc` si se solapa o es contiguo a este pasaje. `doc` no puede
+        empezar antes que el pasaje: `_merge_source` recorre los chunks por `char_start`.
+        """
+        start, end = doc.metadata["char_start"], doc.metadata["char_end"]
+        if start > self.end + 2:
+            return False
+        overlap = self.end - start
+        if overlap >= len(doc.page_content):
+            pass  # contenido entero en el pasaje
+        elif overlap > 0:
+            self.text += doc.page_content[overlap:]
+        else:
+            self.text += " " + doc.page_content
+        self.end = max(self.end, end)
+        self.rank = min(self.rank, rank)
+        page = doc.metadata.get("page")
+        if page is not None and self.metadata.get("page") is not None:
+            last_page = self.metadata.get("page_end", self.metadata["page"])
+            self.metadata["page"] = min(self.metadata["page"], page)
+            if max(last_page, page) != self.metadata["page"]:
+                self.metadata["page_end"] = max(last_page, page)
+        if doc.metadata.get("time_start") is not None and self.metadata.get("time_start") is not None:
+            self.metadata["time_start"] = min(self.metadata["time_start"], doc.metadata["time_start"])
+            self.metadata["time_end"] = max(self.metadata.get("time_end", 0), doc.metadata.get("time_end", 0))
+        return True
+
+
+def _merge_source(ranked: List[Tuple[int, LCDocument]]) -> List[_Passage]:
+    """
+    Pasajes de un mismo archivo: los chunks con offsets se ordenan por `char_start`
+    y se fusionan en una sola pasada (la fusión es transitiva aunque se recuperen
+    en cualquier orden); sin offsets solo se reconocen los duplicados exactos.
+    """
+    passages: List[_Passage] = []
+    by_text: Dict[str, _Passage] = {}
+    with_offsets = []
+    for rank, doc in ranked:
+        if doc.metadata.get("char_start") is not None and doc.metadata.get("char_end") is not None:
+            with_offsets.append((rank, doc))
+        elif doc.page_content in by_text:
+            by_text[doc.page_content].rank = min(by_text[doc.page_content].rank, rank)
+        else:
+            by_text[doc.page_content] = _Passage(doc, rank)
+            passages.append(by_text[doc.page_content])
+
+    current: Optional[_Passage] = None
+    for rank, doc in sorted(with_offsets, key=lambda item: item[1].metadata["char_start"]):
+        if current is None or not current.try_extend(doc, rank):
+            current = _Passage(doc, rank)
+            passages.append(current)
+    return passages
+
+
+def _timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def citation_header(index: int, metadata: Dict) -> str:
+    """Cabecera compacta de cita, p. ej. `[1] informe.pdf (pdf, 2024, p. 3)` o `[2] video.mp4 (video_audio, 00:30-01:00)`."""
+    name = metadata.get("file_name") or metadata.get("source") or metadata.get("file_path") or "desconocido"
+    details = [str(metadata[key]) for key in ("source_type", "year") if metadata.get(key) not in (None, "", "unknown")]
+    if metadata.get("page") is not None:
+        page_end = metadata.get("page_end")
+        details.append(f"pp. {metadata['page']}-{page_end}" if page_end else f"p. {metadata['page']}")
+    if metadata.get("time_start") is not None:
+        details.append(f"{_timestamp(metadata['time_start'])}-{_timestamp(metadata.get('time_end', metadata['time_start']))}")
+    return f"[{index}] {name}" + (f" ({', '.join(details)})" if details else "")
+
+
+def build_context(docs: List[LCDocument], max_tokens: int = DEFAULT_CONTEXT_TOKENS) -> str:
+    """
+    Construye el contexto del prompt a partir de los chunks recuperados (en orden
+    de relevancia) sin pasarse de `max_tokens` tokens:
+    - los chunks solapados o contiguos del mismo archivo se fusionan en un pasaje
+      (en el orden del texto original), así el texto compartido por el solapamiento
+      del chunking se envía una sola vez;
+    - cada pasaje lleva una cabecera de cita compacta en lugar de su metadata en JSON;
+    - los pasajes entran por orden de relevancia y el último que no cabe se recorta.
+    """
+    by_source: Dict[str, List[Tuple[int, LCDocument]]] = {}
+    for rank, doc in enumerate(docs):
+        source = doc.metadata.get("file_path") or doc.metadata.get("source") or doc.metadata.get("file_name") or ""
+        by_source.setdefault(source, []).append((rank, doc))
+    passages = [passage for ranked in by_source.values() for passage in _merge_source(ranked)]
+
+    blocks = []
+    remaining = max_tokens
+    for passage in sorted(passages, key=lambda p: p.rank):
+        header = citation_header(len(blocks) + 1, passage.metadata)
+        needed = count_tokens(header) + count_tokens(passage.text)
+        if needed <= remaining:
+            blocks.append(f"{header}\n{passage.text}")
+            remaining -= needed
+            continue
+        available = remaining - count_tokens(header) - count_tokens(" […]")
+        if available >= _MIN_TRUNCATED_TOKENS:
+            blocks.append(f"{header}\n{truncate_to_tokens(passage.text, available)} […]")
+        break
+    return "\n\n".join(blocks)
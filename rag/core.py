@@ -1,56 +1,87 @@
+import asyncio
 import os
 import re
 import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import cached_property
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Callable, Iterator, AsyncIterator, Tuple
 
-# --- NUEVAS DEPENDENCIAS (CON CORRECCIÓN DE PINECONE) ---
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_core.documents import Document as LCDocument
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.vectorstores import VectorStore
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 
-# --- DEPENDENCIAS EXISTENTES ---
-from pypdf import PdfReader
-from docx import Document as DocxDocument
+from .embedding_cache import CachedEmbeddings
+from .embedding_scheduler import EmbeddingScheduler
+from .answer_cache import SemanticAnswerCache, bump_index_version
+from .manifest import FileManifest, iter_chunk_ids
+from .local_store import LocalVectorStore
+from .lexical_index import BM25Index
+from .retriever import Retriever, STATIC_SCORE_KEY, static_score
+from .filters import filter_scope
+from .context import DEFAULT_CONTEXT_TOKENS, build_context
+from .metrics import INGESTED_CHUNKS, INGESTED_FILES, STAGE_ERRORS, STAGE_SECONDS, LLMUsageCallback, span
+from .providers import LazyEmbeddings, gemini_chat, gemini_embeddings, pinecone_client
+from ingest.parallel import parallel_map
+from ingest.streaming import prefetch
+from ingest.chunking import iter_section_chunks
+from ingest.parsers.registry import PARSERS, ParserSpec, Section, source_type_for
 
-# --- PARSERS DE ARCHIVOS (sin cambios) ---
-def _read_txt(p: Path) -> str: return p.read_text(encoding="utf-8", errors="ignore")
-def _read_pdf(p: Path) -> str:
-    r = PdfReader(str(p))
-    return "\n".join(page.extract_text() or "" for page in r.pages)
-def _read_docx(p: Path) -> str:
-    d = DocxDocument(str(p))
-    return "\n".join(p.text for p in d.paragraphs)
+# Pinecone, pypdf y python-docx se importan al usarse (ver rag.providers): importarlos
+# aquí añadía segundos a cada arranque de la API, de Streamlit y de los scripts.
+if TYPE_CHECKING:
+    from pinecone import Pinecone
+    from langchain_pinecone import PineconeVectorStore
 
-READERS = { ".txt": _read_txt, ".md": _read_txt, ".pdf": _read_pdf, ".docx": _read_docx}
+logger = logging.getLogger(__name__)
 
-# --- LÓGICA DE METADATA (sin cambios) ---
+# --- PARSERS DE ARCHIVOS (registro de ingest.parsers) ---
+def read_document(file_path: Path) -> str:
+    """Lee el texto de un archivo soportado. Es una función de módulo para poder usarla en un pool de procesos."""
+    return PARSERS.read_text(file_path)
+
+def read_sections(file_path: Path) -> List[Section]:
+    """Secciones (texto, metadata) de un archivo soportado; una sola si su parser no trabaja por partes."""
+    return list(PARSERS.iter_sections(file_path))
+
+def _is_media(spec: ParserSpec) -> bool:
+    """Audio/vídeo: se indexa transcribiéndolo, solo si RAGSystem lo activa (`index_media`)."""
+    return spec.name == "video"
+
+# Los archivos con parser por partes (PDF, hojas de cálculo, transcripciones) a partir
+# de este tamaño se leen en streaming en el proceso principal en lugar de en el pool
+STREAM_MIN_BYTES = 8 * 1024 * 1024
+
+def _timed_read_document(file_path: Path) -> Tuple[List[Section], float]:
+    """`read_sections` más su duración, medida en el proceso que parsea (las métricas se registran en el padre)."""
+    start = time.perf_counter()
+    return read_sections(file_path), time.perf_counter() - start
+
+# --- LÓGICA DE METADATA ---
 def get_document_metadata(file_path: Path) -> Dict:
     """Crea metadata rica para un documento, incluyendo tipo y año."""
-    suffix = file_path.suffix.lower()
     metadata = {
         "file_path": str(file_path),
         "file_name": file_path.name,
-        "file_extension": suffix,
-        "source_type": "unknown"
+        "file_extension": file_path.suffix.lower(),
+        "source_type": source_type_for(file_path, PARSERS.for_path(file_path, include_placeholders=True)),
     }
-    if suffix in [ ".pdf", ".docx", ".pptx", ".xlsx"]:
-        metadata["source_type"] = "document"
-    elif suffix == ".txt":
-        if 'transcripciones_tiktok' in str(file_path).lower():
-            metadata["source_type"] = "video_audio"
-        else:
-            metadata["source_type"] = "txt_md"
     year_match = re.search(r'(202[0-9])', str(file_path))
     if year_match:
         metadata["year"] = int(year_match.group(1))
+    # Prioridad de re-ranking precalculada, para no recalcularla en cada consulta
+    metadata[STATIC_SCORE_KEY] = static_score(metadata)
     
     if "transcripciones_tiktok" in str(file_path):
-        print(f"DEBUG: Metadata for {file_path}: {metadata}")
+        logger.debug("Metadata de %s: %s", file_path, metadata)
 
     return metadata
 
@@ -61,57 +92,369 @@ class RAGSystem:
                  llm_model_name: str = "models/gemini-2.5-pro",
                  pinecone_index_name: str = "chatbot-rag-gemini",
                  data_dir: str = "./data",
-                 progress_cb: Optional[Callable] = None):
+                 vector_store_backend: Optional[str] = None,
+                 local_index_dir: Optional[str] = None,
+                 cache_dir: Optional[str] = "./.cache",
+                 answer_cache_max_distance: float = 0.05,
+                 answer_cache_ttl: float = 24 * 3600,
+                 progress_cb: Optional[Callable] = None,
+                 parse_workers: int = 1,
+                 parse_timeout: float = 300.0,
+                 upsert_batch_size: int = 100,
+                 context_max_tokens: int = DEFAULT_CONTEXT_TOKENS,
+                 index_media: Optional[bool] = None,
+                 embed_fn: Optional[Embeddings] = None,
+                 llm: Optional[BaseChatModel] = None,
+                 vector_store: Optional[VectorStore] = None):
+        """
+        `embed_fn`, `llm` y `vector_store` permiten inyectar proveedores alternativos
+        (p. ej. stubs para tests offline). Si no se pasan se usan Gemini y el backend de
+        vectores `vector_store_backend` ("pinecone" o "local"; por defecto la variable
+        VECTOR_STORE_BACKEND o "pinecone"). Los proveedores y la conexión al índice se
+        crean en el primer uso (ver `warmup`), así que construir el sistema es inmediato.
+        El backend local guarda el índice en `local_index_dir` (por defecto
+        LOCAL_INDEX_DIR o ./index/vector/local).
+        `cache_dir` guarda las cachés persistentes; con `None` solo se cachea en memoria.
+        `parse_workers` > 1 parsea los archivos en un pool de procesos durante la
+        indexación, con un límite de `parse_timeout` segundos por archivo (el límite
+        solo se aplica con `parse_workers` > 1: en el propio proceso no se puede
+        interrumpir un parser bloqueado). Los archivos de más de `STREAM_MIN_BYTES`
+        con parser por partes se leen en streaming fuera del pool (ver `_parse_files`),
+        también sin ese límite. Los chunks se embeben y suben en lotes de
+        `upsert_batch_size`. El contexto que se envía al LLM se limita a
+        `context_max_tokens` tokens.
+        Preguntas a distancia coseno <= `answer_cache_max_distance` de una ya respondida
+        hace menos de `answer_cache_ttl` segundos reutilizan su respuesta.
+        Los archivos de audio/vídeo solo se indexan con `index_media` (por defecto la
+        variable INDEX_MEDIA): transcribirlos cuesta minutos de CPU por archivo. Se
+        transcriben fuera del pool de parseo, con su propio pool (TRANSCRIBE_WORKERS),
+        y las transcripciones se guardan en `cache_dir`/transcripts.
+        """
 
         self.llm_model_name = llm_model_name
         self.pinecone_index_name = pinecone_index_name
+        self.vector_store_backend = (vector_store_backend or os.getenv("VECTOR_STORE_BACKEND", "pinecone")).lower()
+        self.local_index_dir = Path(local_index_dir or os.getenv("LOCAL_INDEX_DIR", "./index/vector/local"))
         self.top_k = 5
         self.data_dir = Path(data_dir)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
         self._progress = progress_cb or (lambda *_, **__: None)
+        self.parse_workers = parse_workers
+        self.parse_timeout = parse_timeout
+        self.upsert_batch_size = upsert_batch_size
+        self.context_max_tokens = context_max_tokens
+        if index_media is None:
+            index_media = os.getenv("INDEX_MEDIA", "false").lower() in ("1", "true", "yes")
+        self.index_media = index_media
+
+        base_embed_fn = embed_fn or LazyEmbeddings(lambda: gemini_embeddings(embeddings_model_name),
+                                                   model=embeddings_model_name)
+        # Lotes concurrentes con límite de peticiones y reintentos ante 429 (configurable con EMBED_*)
+        self.embedding_scheduler = EmbeddingScheduler.from_env(base_embed_fn)
+        # Las consultas repetidas se sirven desde caché (LRU en memoria + SQLite en disco).
+        self.embed_fn = CachedEmbeddings(
+            self.embedding_scheduler,
+            model_name=getattr(base_embed_fn, "model", embeddings_model_name),
+            cache_dir=self.cache_dir / "embeddings" if self.cache_dir is not None else None,
+        )
+        self.answer_cache = SemanticAnswerCache(
+            cache_dir=self.cache_dir / "answers" if self.cache_dir is not None else None,
+            max_distance=answer_cache_max_distance,
+            ttl=answer_cache_ttl,
+        )
+        # Manifiesto de archivos indexados, usado por la sincronización incremental (`sync_index`)
+        self.manifest = FileManifest(self._manifest_path())
+        # Índice BM25 que se construye junto al vectorial para la recuperación híbrida
+        self.lexical_index = BM25Index(self._lexical_index_path())
+        if self.lexical_index.count() == 0 and any(e.get("chunk_ids") for e in self.manifest.entries.values()):
+            logger.warning("El índice BM25 está vacío; la búsqueda será solo densa hasta ejecutar `scripts/reindex.py --full`.")
+        # El vector store (conexión a Pinecone o apertura del índice local) se crea al primer uso
+        self._vector_store: Optional[VectorStore] = vector_store
+        self._vector_store_ready = vector_store is not None
+        self._vector_store_lock = threading.RLock()
+        self._llm = llm
+        # Latencia de generación y tokens de prompt/respuesta de cada llamada al LLM
+        self._llm_usage = LLMUsageCallback(stage="generate")
+        self.retriever = RunnableLambda(self._retrieve)
+
+    @property
+    def vector_store(self) -> VectorStore:
+        if not self._vector_store_ready:
+            with self._vector_store_lock:
+                # Re-entrante: la construcción del índice local llama a `sync_index`, que
+                # ya ve el store asignado por `_init_local`; el resto de hilos esperan a que termine.
+                if self._vector_store is None:
+                    self._vector_store = self._init_vector_store()
+                    self._vector_store_ready = True
+        return self._vector_store
 
-        self.embed_fn = GoogleGenerativeAIEmbeddings(model=embeddings_model_name, task_type="retrieval_query")
-        self.vector_store = self._init_pinecone()
-        self.llm = ChatGoogleGenerativeAI(model=self.llm_model_name, temperature=0.1, convert_system_message_to_human=True)
-        self.rag_chain = self._create_rag_chain()
+    @cached_property
+    def llm(self) -> BaseChatModel:
+        return self._llm or gemini_chat(self.llm_model_name)
+
+    @cached_property
+    def hybrid_retriever(self) -> Retriever:
+        return Retriever(self.vector_store, self.lexical_index, fetch_k=4 * self.top_k)
+
+    @cached_property
+    def answer_chain(self):
+        return self._create_answer_chain()
+
+    @cached_property
+    def rag_chain(self):
+        return self._create_rag_chain()
+
+    def warmup(self):
+        """Crea por adelantado el LLM, el vector store y las cadenas (p. ej. al arrancar la API)."""
+        self.hybrid_retriever
+        self.rag_chain
+
+    def _manifest_path(self) -> Optional[Path]:
+        # El índice local guarda su manifiesto junto a los vectores para que ambos vayan siempre a la par
+        if self.vector_store_backend == "local":
+            return self.local_index_dir / "manifest.json"
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / "manifests" / f"{self.pinecone_index_name}.json"
+
+    def _lexical_index_path(self) -> Optional[Path]:
+        if self.vector_store_backend == "local":
+            return self.local_index_dir / "bm25.sqlite"
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / "lexical" / f"{self.pinecone_index_name}.sqlite"
+
+    def _init_vector_store(self) -> VectorStore:
+        if self.vector_store_backend == "pinecone":
+            return self._init_pinecone()
+        if self.vector_store_backend == "local":
+            return self._init_local()
+        raise ValueError(f"Backend de vectores no soportado: {self.vector_store_backend}. Use 'pinecone' o 'local'.")
+
+    def _init_local(self) -> LocalVectorStore:
+        """Abre (o construye si está vacío) el índice local en `local_index_dir`."""
+        # Tipo de índice (exacto o IVF aproximado) configurable con LOCAL_INDEX_TYPE / LOCAL_IVF_*
+        self._vector_store = LocalVectorStore.from_env(self.local_index_dir, self.embed_fn)
+        if self.vector_store.count() == 0:
+            logger.info("El índice local en '%s' está vacío. Construyendo desde cero...", self.local_index_dir)
+            self.manifest.save({})
+            self.sync_index()
+        else:
+            logger.info("Índice local encontrado en '%s' (%d chunks). Cargando...", self.local_index_dir, self.vector_store.count())
+        return self.vector_store
 
-    def _init_pinecone(self) -> PineconeVectorStore:
+    def _init_pinecone(self) -> "PineconeVectorStore":
         """Inicializa la conexión a Pinecone usando la nueva sintaxis."""
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        from langchain_pinecone import PineconeVectorStore
+        pc = pinecone_client()
 
         if self.pinecone_index_name not in pc.list_indexes().names():
-            print(f"El índice '{self.pinecone_index_name}' no existe. Construyendo desde cero...")
+            logger.info("El índice '%s' no existe. Construyendo desde cero...", self.pinecone_index_name)
             self._build_and_upload_index(pinecone_client=pc)
         else:
-            print(f"Índice '{self.pinecone_index_name}' encontrado. Cargando...")
+            logger.info("Índice '%s' encontrado. Cargando...", self.pinecone_index_name)
 
         return PineconeVectorStore.from_existing_index(self.pinecone_index_name, self.embed_fn)
 
-    def _chunk_text(self, text: str, size: int = 1000, overlap: int = 150) -> List[str]:
-        return [text[i:i+size] for i in range(0, len(text), size - overlap)]
+    def _list_data_files(self) -> List[Path]:
+        # Solo se miran los primeros bytes de los archivos sin extensión: abrir (y listar,
+        # si son ZIP) cada archivo de extensión desconocida en cada sincronización es caro
+        files = []
+        for p in self.data_dir.rglob("*"):
+            spec = PARSERS.for_path(p, sniff=not p.suffix) if p.is_file() else None
+            if spec is not None and (self.index_media or not _is_media(spec)):
+                files.append(p)
+        return files
 
-    def _build_and_upload_index(self, pinecone_client: Pinecone):
-        """Crea un índice en Pinecone y sube los documentos."""
-        all_chunks = []
-        files_to_process = [p for p in self.data_dir.rglob("*") if p.suffix.lower() in READERS and p.is_file()]
-        total_files = len(files_to_process)
+    def _iter_media_sections(self, file_path: Path) -> Iterator[Section]:
+        """Transcripción de un archivo de audio/vídeo en este proceso, con la caché de `cache_dir`."""
+        from ingest.parsers.video import transcript_sections
+        from ingest.transcription import transcribe_media
+        # "" desactiva la caché (None usaría TRANSCRIPT_CACHE_DIR)
+        cache_dir = str(self.cache_dir / "transcripts") if self.cache_dir is not None else ""
+        yield from transcript_sections(transcribe_media(str(file_path), cache_dir=cache_dir))
+
+    def _streams_in_process(self, file_path: Path) -> bool:
+        """Si el archivo se lee en streaming en este proceso en lugar de parsearse entero en el pool."""
+        if self.parse_workers <= 1:
+            return True
+        spec = PARSERS.for_path(file_path)
+        if spec is not None and _is_media(spec):
+            return True
+        return bool(spec and spec.streaming) and file_path.stat().st_size >= STREAM_MIN_BYTES
+
+    def _parse_files(self, relative_paths: List[str]) -> Iterator[Tuple[str, Optional[Iterable[Section]], Optional[BaseException]]]:
+        """
+        Emite (ruta, secciones, error) por cada archivo de `data_dir`, en orden. Sin pool
+        (`parse_workers` <= 1), y para los archivos grandes con parser por partes, las
+        secciones son un iterador perezoso: se parsean a medida que se consumen y la
+        memoria no depende del tamaño del archivo (esos archivos reparten su trabajo
+        entre procesos dentro del parser y no tienen límite de `parse_timeout`). El
+        audio/vídeo también se lee aquí: se transcribe con su propio pool y no ocupa
+        durante minutos un hueco del pool de parseo. El resto se parsea entero en el
+        pool de `parse_workers` procesos.
+        """
+        paths = [self.data_dir / p for p in relative_paths]
+        streamed = [self._streams_in_process(p) for p in paths]
+        results = parallel_map(
+            _timed_read_document,
+            [p for p, lazy in zip(paths, streamed) if not lazy],
+            max_workers=self.parse_workers,
+            timeout=self.parse_timeout,
+        )
+        for relative_path, path, lazy in zip(relative_paths, paths, streamed):
+            if lazy:
+                spec = PARSERS.for_path(path)
+                sections = self._iter_media_sections(path) if spec and _is_media(spec) else PARSERS.iter_sections(path)
+                yield relative_path, sections, None
+                continue
+            _, result, error = next(results)
+            if error is not None:
+                STAGE_ERRORS.inc(stage="ingest.parse")
+                yield relative_path, None, error
+                continue
+            sections, seconds = result
+            STAGE_SECONDS.observe(seconds, stage="ingest.parse")
+            yield relative_path, sections, None
+
+    def _iter_file_chunks(self, relative_path: str, sections: Iterable[Section]) -> Iterator[Tuple[LCDocument, str]]:
+        """
+        Divide las secciones de un archivo en chunks a medida que llegan y emite cada
+        uno con su ID estable. Registra por separado el tiempo de parseo (el que se
+        pasa esperando secciones perezosas) y el de chunking.
+        """
+        parse_seconds = 0.0
+
+        def timed_sections():
+            nonlocal parse_seconds
+            iterator = iter(sections)
+            while True:
+                start = time.perf_counter()
+                try:
+                    section = next(iterator)
+                except StopIteration:
+                    return
+                except Exception:
+                    STAGE_ERRORS.inc(stage="ingest.parse")
+                    raise
+                finally:
+                    parse_seconds += time.perf_counter() - start
+                yield section
+
+        metadata = get_document_metadata(self.data_dir / relative_path)
+        # Offsets del chunk en el texto original en la metadata (char_start/char_end)
+        chunks = zip(iter_section_chunks(timed_sections(), metadata), iter_chunk_ids(relative_path))
+        total_seconds = 0.0
+        while True:
+            start = time.perf_counter()
+            item = next(chunks, None)
+            total_seconds += time.perf_counter() - start
+            if item is None:
+                break
+            (text, chunk_metadata), id_ = item
+            yield LCDocument(page_content=text, metadata=chunk_metadata), id_
+        if not isinstance(sections, list):
+            STAGE_SECONDS.observe(parse_seconds, stage="ingest.parse")
+        STAGE_SECONDS.observe(total_seconds - parse_seconds, stage="ingest.chunk")
+
+    def _chunk_file(self, relative_path: str, sections: Iterable[Section]) -> Tuple[List[LCDocument], List[str]]:
+        """Chunks de un archivo y sus IDs estables, en listas."""
+        pairs = list(self._iter_file_chunks(relative_path, sections))
+        return [doc for doc, _ in pairs], [id_ for _, id_ in pairs]
+
+    def _index_files(self, vector_store: VectorStore, relative_paths: List[str], stage: str) -> Iterator[Tuple[str, List[str], Optional[BaseException]]]:
+        """
+        Pipeline en streaming: parseo -> chunking -> embedding + upsert en lotes de
+        `upsert_batch_size`. El parseo y la subida se solapan a través de colas acotadas
+        (de archivos y, dentro de cada archivo, de chunks), así que la memoria no crece
+        con el número ni con el tamaño de los archivos.
+        Emite (ruta, ids, None) cuando todos los chunks de un archivo están subidos y
+        (ruta, ids, error) si falla su parseo o la subida de alguno de sus lotes; en ese
+        caso `ids` son los generados hasta el fallo, que pueden estar ya (en parte) subidos.
+        """
+        pending = deque()  # (chunk, id, ruta) pendientes de subir
+        remaining: Dict[str, int] = {}
+        file_ids: Dict[str, List[str]] = {}
+        reading: Optional[str] = None  # archivo cuyos chunks aún se están generando
 
-        for i, file_path in enumerate(files_to_process):
-            self._progress("Procesando archivos", i + 1, total_files)
+        def upload(size: int):
+            batch = [pending.popleft() for _ in range(min(size, len(pending)))]
             try:
-                content = READERS[file_path.suffix.lower()](file_path)
-                if not content: continue
-                metadata = get_document_metadata(file_path)
-                chunks = self._chunk_text(content)
-                for chunk_content in chunks:
-                    all_chunks.append(LCDocument(page_content=chunk_content, metadata=metadata))
+                # Incluye el embedding del lote (se hace dentro de add_documents)
+                with span("ingest.upsert"):
+                    vector_store.add_documents([doc for doc, _, _ in batch], ids=[id_ for _, id_, _ in batch])
+                    self.lexical_index.add([doc for doc, _, _ in batch], [id_ for _, id_, _ in batch])
             except Exception as e:
-                print(f"Error procesando {file_path}: {e}")
+                failed = list(dict.fromkeys(path for _, _, path in batch))
+                survivors = [item for item in pending if item[2] not in failed]
+                pending.clear()
+                pending.extend(survivors)
+                for path in failed:
+                    remaining.pop(path, None)
+                    INGESTED_FILES.inc(result="failed")
+                    yield path, file_ids.pop(path, []), e
+                return
+            INGESTED_CHUNKS.inc(len(batch))
+            for _, _, path in batch:
+                remaining[path] -= 1
+                if remaining[path] == 0 and path != reading:
+                    del remaining[path]
+                    INGESTED_FILES.inc(result="indexed")
+                    yield path, file_ids.pop(path), None
 
-        if not all_chunks:
-            print("No se encontraron documentos para indexar.")
+        parsed_files = prefetch(self._parse_files(relative_paths), maxsize=4)
+        for i, (path, sections, error) in enumerate(parsed_files):
+            # El progreso se notifica desde este hilo (el del llamante, p. ej. el de Streamlit),
+            # no desde el hilo de `prefetch`
+            self._progress(stage, i + 1, len(relative_paths))
+            if error is not None:
+                INGESTED_FILES.inc(result="failed")
+                yield path, [], error
+                continue
+            reading, remaining[path], file_ids[path] = path, 0, []
+            chunks = prefetch(self._iter_file_chunks(path, sections), maxsize=self.upsert_batch_size)
+            try:
+                for doc, id_ in chunks:
+                    pending.append((doc, id_, path))
+                    remaining[path] += 1
+                    file_ids[path].append(id_)
+                    while len(pending) >= self.upsert_batch_size:
+                        yield from upload(self.upsert_batch_size)
+                    if path not in file_ids:  # falló la subida de uno de sus lotes
+                        break
+            except Exception as e:
+                # Error al parsear o trocear a mitad de archivo: sus chunks pendientes se descartan
+                survivors = [item for item in pending if item[2] != path]
+                pending.clear()
+                pending.extend(survivors)
+                remaining.pop(path, None)
+                ids = file_ids.pop(path, None)
+                if ids is not None:
+                    INGESTED_FILES.inc(result="failed")
+                    yield path, ids, e
+                continue
+            finally:
+                reading = None
+                chunks.close()
+            if path in file_ids and remaining[path] == 0:
+                del remaining[path]
+                INGESTED_FILES.inc(result="indexed")
+                yield path, file_ids.pop(path), None
+
+        while pending:
+            yield from upload(self.upsert_batch_size)
+
+    @span("ingest.build")
+    def _build_and_upload_index(self, pinecone_client: "Pinecone"):
+        """Crea un índice en Pinecone y sube los documentos."""
+        from pinecone import ServerlessSpec
+        from langchain_pinecone import PineconeVectorStore
+        entries = self.manifest.scan(self.data_dir, self._list_data_files())
+        if not entries:
+            logger.warning("No se encontraron documentos para indexar.")
             return
 
-        print(f"Creando índice '{self.pinecone_index_name}' en Pinecone...")
+        logger.info("Creando índice '%s' en Pinecone...", self.pinecone_index_name)
         # La dimensión para 'models/embedding-001' de Gemini es 768
         embedding_dimension = 768
         pinecone_client.create_index(
@@ -121,29 +464,140 @@ class RAGSystem:
             spec=ServerlessSpec(cloud='aws', region='us-east-1') # Spec recomendada
         )
 
-        print(f"Subiendo {len(all_chunks)} chunks al índice...")
-        PineconeVectorStore.from_documents(
-            documents=all_chunks,
-            embedding=self.embed_fn,
-            index_name=self.pinecone_index_name
-        )
-        print("Índice creado y documentos subidos.")
+        logger.info("Subiendo los chunks de %d archivos en lotes de %d...", len(entries), self.upsert_batch_size)
+        self.lexical_index.clear()
+        vector_store = PineconeVectorStore(index_name=self.pinecone_index_name, embedding=self.embed_fn)
+        orphan_ids = []
+        for path, ids, error in self._index_files(vector_store, list(entries), "Procesando archivos"):
+            if error is not None:
+                logger.error("Error procesando %s: %s", path, error)
+                # Los chunks que llegaron a subirse no quedan en ninguna entrada del manifiesto
+                orphan_ids.extend(ids)
+                entries.pop(path)
+            else:
+                entries[path]["chunk_ids"] = ids
+        if orphan_ids:
+            vector_store.delete(ids=orphan_ids)
+            self.lexical_index.delete(orphan_ids)
+
+        self.lexical_index.flush()
+        self.manifest.save(entries)
+        logger.info("Índice creado y documentos subidos.")
+        logger.info("Embeddings reutilizados de la caché: %d, nuevos: %d",
+                    self.embed_fn.stats['document_hits'], self.embed_fn.stats['document_misses'])
+        self._print_embedding_throughput()
+        self._mark_index_changed()
 
     def rebuild_index(self):
-        """Deletes the existing Pinecone index and rebuilds it."""
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+        """Deletes the existing index (Pinecone or local) and rebuilds it."""
+        if self.vector_store_backend == "local":
+            logger.info("Clearing local index '%s'...", self.local_index_dir)
+            self.vector_store.clear()
+            self.lexical_index.clear()
+            self.manifest.save({})
+            self._mark_index_changed()
+            self.sync_index()
+            return
+
+        pc = pinecone_client()
         if self.pinecone_index_name in pc.list_indexes().names():
-            print(f"Deleting existing index '{self.pinecone_index_name}'...")
+            logger.info("Deleting existing index '%s'...", self.pinecone_index_name)
             pc.delete_index(self.pinecone_index_name)
-            print("Index deleted.")
+            logger.info("Index deleted.")
+            self.manifest.save({})
+            self._mark_index_changed()
         self._build_and_upload_index(pinecone_client=pc)
+        self._reset_vector_store()
 
-    def _create_rag_chain(self):
+    def _reset_vector_store(self):
+        """Descarta la conexión a un índice de Pinecone borrado y recreado; se reabre al usarse."""
+        with self._vector_store_lock:
+            self._vector_store = None
+            self._vector_store_ready = False
+            self.__dict__.pop("hybrid_retriever", None)
+
+    def _indexed_vector_count(self) -> Optional[int]:
+        """Vectores del índice, o None si el backend no permite contarlos."""
+        if isinstance(self.vector_store, LocalVectorStore):
+            return self.vector_store.count()
+        index = getattr(self.vector_store, "index", None) or getattr(self.vector_store, "_index", None)
+        if index is not None and hasattr(index, "describe_index_stats"):
+            return getattr(index.describe_index_stats(), "total_vector_count", 0)
+        return None
+
+    @span("ingest.sync")
+    def sync_index(self) -> Dict:
+        """
+        Sincroniza el índice con `data_dir` de forma incremental usando el manifiesto:
+        sube los chunks de archivos nuevos o modificados (con IDs estables, así que
+        se sobrescriben) y borra los vectores de archivos eliminados o los chunks
+        sobrantes de archivos que han encogido.
+        Un índice con vectores pero sin manifiesto (creado por versiones anteriores, con
+        IDs aleatorios) se reconstruye desde cero: sincronizarlo duplicaría cada chunk.
+        """
+        if not self.manifest.entries and self._indexed_vector_count():
+            logger.warning("El índice tiene vectores pero no hay manifiesto (índice anterior con IDs aleatorios). "
+                           "Se reconstruye desde cero para no duplicar los chunks.")
+            self.rebuild_index()
+            return {"added": len(self.manifest.entries), "changed": 0, "removed": 0}
+
+        entries = self.manifest.scan(self.data_dir, self._list_data_files())
+        added, changed, removed = self.manifest.diff(entries)
+        to_process = added + changed
+        logger.info("Sincronizando índice: %d nuevos, %d modificados, %d borrados.", len(added), len(changed), len(removed))
+
+        stale_ids = []
+        for path in removed:
+            stale_ids.extend(self.manifest.entries[path].get("chunk_ids", []))
+
+        for path, ids, error in self._index_files(self.vector_store, to_process, "Sincronizando archivos"):
+            old_ids = self.manifest.entries.get(path, {}).get("chunk_ids", [])
+            if error is not None:
+                logger.error("Error procesando %s: %s", path, error)
+                # Se reintentará en la próxima sincronización. Los chunks ya subidos que no
+                # son de la versión anterior (todos, si el archivo es nuevo) quedarían huérfanos.
+                stale_ids.extend(set(ids) - set(old_ids))
+                if path in self.manifest.entries:
+                    entries[path] = self.manifest.entries[path]
+                else:
+                    entries.pop(path)
+                continue
+            entries[path]["chunk_ids"] = ids
+            stale_ids.extend(set(old_ids) - set(ids))
+
+        if stale_ids:
+            self.vector_store.delete(ids=stale_ids)
+            self.lexical_index.delete(stale_ids)
+
+        if isinstance(self.vector_store, LocalVectorStore):
+            # El índice IVF se (re)entrena y se guarda aquí, una vez por sincronización
+            self.vector_store.flush()
+        self.lexical_index.flush()
+        self.manifest.save(entries)
+        if to_process:
+            self._print_embedding_throughput()
+        if to_process or removed:
+            self._mark_index_changed()
+        return {"added": len(added), "changed": len(changed), "removed": len(removed)}
+
+    def _print_embedding_throughput(self):
+        throughput = self.embedding_scheduler.throughput()
+        logger.info("Embeddings: %.1f chunks/s, %.0f tokens/s, %d reintentos por rate limit.",
+                    throughput['chunks_per_second'], throughput['tokens_per_second'], throughput['retries'])
+
+    def _mark_index_changed(self):
+        """Invalida las respuestas cacheadas en este y en cualquier otro proceso que comparta `cache_dir`."""
+        bump_index_version(self.answer_cache.cache_dir)
+        self.answer_cache.clear()
+
+    def _create_answer_chain(self):
+        """Cadena de generación: recibe {"docs", "question"} y devuelve el texto de la respuesta."""
         template = """
 Eres un asistente experto de la agencia Labelium. Tu nombre es Labelix.
 Responde a la pregunta del usuario basándote ESTRICTA Y ÚNICAMENTE en el siguiente contexto.
 Al final de tu respuesta, cita TODAS las fuentes que has usado de la metadata en una sección llamada 'Fuentes:'.
-Si un documento en el contexto tiene `"source_type": "video_audio"`, DEBES indicar que la información proviene de una transcripción de video.
+Cada fragmento del contexto empieza con una cabecera `[n] archivo (tipo, año, página)`; cita los archivos por su nombre y, si la hay, su página.
+Si un fragmento es de tipo `video_audio`, DEBES indicar que la información proviene de una transcripción de video.
 
 CONTEXTO:
 {context}
@@ -154,35 +608,135 @@ PREGUNTA:
 RESPUESTA:
 """
         prompt_template = ChatPromptTemplate.from_template(template)
-        retriever = self.vector_store.as_retriever(search_kwargs={'k': self.top_k})
 
         def format_docs(docs: List[LCDocument]) -> str:
-            formatted_docs = []
-            for doc in docs:
-                metadata_str = json.dumps(doc.metadata, ensure_ascii=False, indent=2)
-                formatted_docs.append(f"Contenido: {doc.page_content}\nMetadata:\n{metadata_str}")
-            print("DEBUG: Formatted context for LLM:")
-            print("\n\n---\n\n".join(formatted_docs))
-            
-            return "\n\n---\n\n".join(formatted_docs)
-
-        rag_chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
+            # Chunks solapados fusionados, citas compactas y como mucho `context_max_tokens` tokens
+            with span("context"):
+                return build_context(docs, max_tokens=self.context_max_tokens)
+
+        return (
+            RunnablePassthrough.assign(context=lambda x: format_docs(x["docs"]))
             | prompt_template
             | self.llm
             | StrOutputParser()
         )
-        return rag_chain
 
-    def query(self, prompt: str) -> Dict:
+    def _create_rag_chain(self):
+        # Una sola recuperación por pregunta: los mismos documentos alimentan
+        # el prompt y la lista de fuentes que devuelve la cadena.
+        return (
+            RunnableParallel(docs=self.retriever, question=itemgetter("question"))
+            | RunnablePassthrough.assign(answer=self.answer_chain)
+        )
+
+    def _retrieve(self, inputs: Dict) -> List[LCDocument]:
+        """Recupera los chunks para {"question", "filter"}; el filtro se aplica dentro de la búsqueda."""
+        with span("retrieve"):
+            return [doc for doc, _ in self.hybrid_retriever.search(inputs["question"], k=self.top_k,
+                                                                   filter=inputs.get("filter"))]
+
+    def _chain_config(self) -> Dict:
+        # El callback mide la generación (etapa "generate") y cuenta los tokens del LLM
+        return {"callbacks": [self._llm_usage]}
+
+    @staticmethod
+    def _collect_sources(docs: List[LCDocument]) -> List[str]:
+        return list(set(doc.metadata.get("file_path", "") for doc in docs if doc.metadata))
+
+    @span("query")
+    def query(self, prompt: str, filter: Optional[Dict] = None) -> Dict:
+        """
+        Responde `prompt`. `filter` restringe la búsqueda a los chunks cuya metadata lo
+        cumple (ver `rag.filters.build_metadata_filter`), p. ej. solo PDFs de 2024.
+        """
         if not prompt:
             return {"answer": "Por favor, haz una pregunta.", "sources": []}
 
-        # La cadena ahora se invoca con el prompt (string) directamente.
-        answer = self.rag_chain.invoke(prompt)
-        
-        # Para encontrar las fuentes, necesitamos ejecutar el retriever por separado.
-        retrieved_docs = self.vector_store.as_retriever(search_kwargs={'k': self.top_k}).invoke(prompt)
-        sources = list(set(doc.metadata.get("file_path", "") for doc in retrieved_docs if doc.metadata))
+        # El embedding queda en la caché de embeddings, así que la recuperación
+        # posterior no vuelve a llamar al proveedor.
+        with span("embed_query"):
+            query_vector = self.embed_fn.embed_query(prompt)
+        cached = self.answer_cache.get(query_vector, scope=filter_scope(filter))
+        if cached is not None:
+            return cached
+
+        # La cadena devuelve la respuesta junto con los documentos recuperados,
+        # así que no hace falta volver a consultar el índice para las fuentes.
+        result = self.rag_chain.invoke({"question": prompt, "filter": filter}, config=self._chain_config())
+        sources = self._collect_sources(result["docs"])
+
+        self.answer_cache.put(query_vector, prompt, result["answer"], sources, scope=filter_scope(filter))
+        return {"answer": result["answer"], "sources": sources}
+
+    async def aquery(self, prompt: str, filter: Optional[Dict] = None) -> Dict:
+        """Equivalente asíncrono de `query`, basado en `rag_chain.ainvoke`."""
+        if not prompt:
+            return {"answer": "Por favor, haz una pregunta.", "sources": []}
+
+        with span("query"):
+            with span("embed_query"):
+                query_vector = await self.embed_fn.aembed_query(prompt)
+            # La caché lee y escribe en SQLite: fuera del event loop
+            cached = await asyncio.to_thread(self.answer_cache.get, query_vector, scope=filter_scope(filter))
+            if cached is not None:
+                return cached
+
+            result = await self.rag_chain.ainvoke({"question": prompt, "filter": filter}, config=self._chain_config())
+            sources = self._collect_sources(result["docs"])
+
+            await asyncio.to_thread(self.answer_cache.put, query_vector, prompt, result["answer"], sources,
+                                    scope=filter_scope(filter))
+            return {"answer": result["answer"], "sources": sources}
+
+    def stream_query(self, prompt: str, filter: Optional[Dict] = None) -> Iterator[Dict]:
+        """
+        Versión en streaming de `query`. Emite eventos `{"type": "token", "content": ...}`
+        a medida que el LLM genera la respuesta y termina con
+        `{"type": "sources", "sources": [...]}`.
+        """
+        if not prompt:
+            yield {"type": "token", "content": "Por favor, haz una pregunta."}
+            yield {"type": "sources", "sources": []}
+            return
+
+        with span("embed_query"):
+            query_vector = self.embed_fn.embed_query(prompt)
+        cached = self.answer_cache.get(query_vector, scope=filter_scope(filter))
+        if cached is not None:
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "sources", "sources": cached["sources"]}
+            return
+
+        docs = self.retriever.invoke({"question": prompt, "filter": filter})
+        tokens = []
+        for token in self.answer_chain.stream({"docs": docs, "question": prompt}, config=self._chain_config()):
+            tokens.append(token)
+            yield {"type": "token", "content": token}
+        sources = self._collect_sources(docs)
+        yield {"type": "sources", "sources": sources}
+        self.answer_cache.put(query_vector, prompt, "".join(tokens), sources, scope=filter_scope(filter))
+
+    async def astream_query(self, prompt: str, filter: Optional[Dict] = None) -> AsyncIterator[Dict]:
+        """Equivalente asíncrono de `stream_query` (usado por el endpoint SSE de la API)."""
+        if not prompt:
+            yield {"type": "token", "content": "Por favor, haz una pregunta."}
+            yield {"type": "sources", "sources": []}
+            return
+
+        with span("embed_query"):
+            query_vector = await self.embed_fn.aembed_query(prompt)
+        cached = await asyncio.to_thread(self.answer_cache.get, query_vector, scope=filter_scope(filter))
+        if cached is not None:
+            yield {"type": "token", "content": cached["answer"]}
+            yield {"type": "sources", "sources": cached["sources"]}
+            return
 
-        return {"answer": answer, "sources": sources}
+        docs = await self.retriever.ainvoke({"question": prompt, "filter": filter})
+        tokens = []
+        async for token in self.answer_chain.astream({"docs": docs, "question": prompt}, config=self._chain_config()):
+            tokens.append(token)
+            yield {"type": "token", "content": token}
+        sources = self._collect_sources(docs)
+        yield {"type": "sources", "sources": sources}
+        await asyncio.to_thread(self.answer_cache.put, query_vector, prompt, "".join(tokens), sources,
+                                scope=filter_scope(filter))
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from langchain_core.embeddings import Embeddings
+
+from .metrics import CACHE_REQUESTS
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 del contenido exacto de un chunk (misma función que `generate_hash` en la ingesta)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_query(text: str) -> str:
+    """Normaliza una consulta para que variaciones triviales compartan embedding."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Envuelve un proveedor de embeddings y cachea:
+    - Consultas (`embed_query`) en dos niveles: un LRU en memoria acotado a
+      `max_memory_items` entradas y un almacén SQLite en disco. La clave es el
+      texto normalizado más el nombre del modelo.
+    - Chunks (`embed_documents`) en un almacén en disco direccionado por contenido:
+      la clave es el hash del chunk más el nombre del modelo, de modo que al reindexar
+      solo se llama al proveedor para el texto nuevo.
+    """
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model_name: str,
+                 cache_dir: Optional[Union[str, Path]] = None,
+                 max_memory_items: int = 2048):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                      "document_hits": 0, "document_misses": 0}
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_dir is not None:
+            cache_dir = Path(cache_dir)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(cache_dir / "embeddings.sqlite"), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS document_embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    @property
+    def model(self) -> str:
+        return self.model_name
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                CACHE_REQUESTS.inc(cache="query_embedding", result="hit")
+                return self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array("d", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    CACHE_REQUESTS.inc(cache="query_embedding", result="hit")
+                    return vector
+
+            self.stats["misses"] += 1
+            CACHE_REQUESTS.inc(cache="query_embedding", result="miss")
+            return None
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, key: str, vector: List[float]):
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                                 (key, array("d", vector).tobytes()))
+                self._db.commit()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # SQLite es síncrono: las lecturas y escrituras se hacen fuera del event loop
+        key = self._key(text)
+        vector = await asyncio.to_thread(self._lookup, key)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, key, vector)
+        return vector
+
+    # --- Chunks de documentos (direccionados por contenido) ---
+    def _document_key(self, text: str) -> str:
+        return content_hash(f"{self.model_name}\x00{text}")
+
+    def _lookup_documents(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM document_embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update((key, array("d", blob).tolist()) for key, blob in rows)
+        return found
+
+    def _store_documents(self, items: Dict[str, List[float]]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO document_embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("d", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._db.commit()
+
+    def _split_cached(self, texts: List[str]):
+        """Devuelve las claves, los vectores ya conocidos y los textos que faltan por embeber."""
+        keys = [self._document_key(t) for t in texts]
+        found = self._lookup_documents(keys)
+        missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in found))
+        hits = len(texts) - sum(1 for k in keys if k not in found)
+        self.stats["document_hits"] += hits
+        self.stats["document_misses"] += len(missing)
+        CACHE_REQUESTS.inc(hits, cache="document_embedding", result="hit")
+        CACHE_REQUESTS.inc(len(missing), cache="document_embedding", result="miss")
+        return keys, found, missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._db is None or not texts:
+            return self.embeddings.embed_documents(texts)
+
+        keys, found, missing = self._split_cached(texts)
+        if missing:
+            new = dict(zip((self._document_key(t) for t in missing), self.embeddings.embed_documents(missing)))
+            self._store_documents(new)
+            found.update(new)
+        return [found[k] for k in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self._db is None or not texts:
+            return await self.embeddings.aembed_documents(texts)
+
+        keys, found, missing = await asyncio.to_thread(self._split_cached, texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(missing)
+            new = dict(zip((self._document_key(t) for t in missing), vectors))
+            await asyncio.to_thread(self._store_documents, new)
+            found.update(new)
+        return [found[k] for k in keys]
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "hit_rate": self.hit_rate(), "memory_items": len(self._memory)}
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación barata de tokens (~4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Detecta errores de cuota/límite de peticiones (HTTP 429, RESOURCE_EXHAUSTED...)."""
+    for attr in ("status_code", "code", "status"):
+        if getattr(error, attr, None) == 429:
+            return True
+    name = type(error).__name__.lower()
+    if "ratelimit" in name or "resourceexhausted" in name:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in ("429", "rate limit", "resource_exhausted", "resource exhausted", "quota"))
+
+
+class TokenBucket:
+    """Token bucket thread-safe: `rate` unidades por segundo con ráfagas de hasta `capacity`."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Envuelve un proveedor de embeddings para indexaciones grandes:
+    - agrupa los textos en lotes de `batch_size`,
+    - embebe hasta `max_concurrency` lotes a la vez,
+    - respeta un límite de peticiones por minuto y, opcionalmente, de tokens por
+      minuto (token buckets),
+    - reintenta los errores de rate limit (429) con backoff exponencial con jitter,
+    - lleva la cuenta del rendimiento (chunks/s, tokens/s).
+    """
+    def __init__(self,
+                 embeddings: Embeddings,
+                 batch_size: int = 100,
+                 max_concurrency: int = 4,
+                 requests_per_minute: float = 600,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 6,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._request_bucket = TokenBucket(requests_per_minute / 60.0, max(1.0, float(max_concurrency)))
+        self._token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self._stats_lock = threading.Lock()
+        self.stats = {"chunks": 0, "tokens": 0, "requests": 0, "retries": 0, "seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings) -> "EmbeddingScheduler":
+        tokens_per_minute = os.getenv("EMBED_TOKENS_PER_MINUTE")
+        return cls(
+            embeddings,
+            batch_size=int(os.getenv("EMBED_BATCH_SIZE", "100")),
+            max_concurrency=int(os.getenv("EMBED_CONCURRENCY", "4")),
+            requests_per_minute=float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "600")),
+            tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None,
+            max_retries=int(os.getenv("EMBED_MAX_RETRIES", "6")),
+        )
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.embeddings, "model", None)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": espera aleatoria entre 0 y el backoff exponencial
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call_with_retry(self, func, tokens: int):
+        for attempt in range(self.max_retries + 1):
+            self._request_bucket.acquire()
+            if self._token_bucket is not None:
+                self._token_bucket.acquire(tokens)
+            try:
+                with self._stats_lock:
+                    self.stats["requests"] += 1
+                return func()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                time.sleep(self._backoff(attempt))
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        return self._call_with_retry(lambda: self.embeddings.embed_documents(batch),
+                                     sum(estimate_tokens(t) for t in batch))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.monotonic()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            results = [self._embed_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+
+        with self._stats_lock:
+            self.stats["chunks"] += len(texts)
+            self.stats["tokens"] += sum(estimate_tokens(t) for t in texts)
+            self.stats["seconds"] += time.monotonic() - start
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call_with_retry(lambda: self.embeddings.embed_query(text), estimate_tokens(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def throughput(self) -> Dict:
+        seconds = self.stats["seconds"]
+        return {
+            "chunks_per_second": self.stats["chunks"] / seconds if seconds else 0.0,
+            "tokens_per_second": self.stats["tokens"] / seconds if seconds else 0.0,
+            "retries": self.stats["retries"],
+        }
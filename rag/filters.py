@@ -0,0 +1,138 @@
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Filtros expuestos en la API/Streamlit -> campo de metadata de cada chunk
+FILTER_FIELDS = {"source_type": "source_type", "year": "year", "source": "file_name"}
+
+
+def build_metadata_filter(**values: Optional[Iterable]) -> Optional[Dict]:
+    """
+    Construye un filtro de metadata en la sintaxis de Pinecone
+    (`{"source_type": {"$in": ["pdf"]}, "year": {"$in": [2024]}}`) a partir de los
+    parámetros de consulta `source_type`, `year` y `source` (nombre del archivo).
+    Dentro de un campo los valores se combinan con OR y entre campos con AND.
+    Devuelve None si no hay ningún valor.
+    """
+    unknown = set(values) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Filtros no soportados: {sorted(unknown)}. Use {sorted(FILTER_FIELDS)}.")
+    metadata_filter = {}
+    for name, field in FILTER_FIELDS.items():
+        field_values = [v for v in (values.get(name) or []) if v not in (None, "")]
+        if field_values:
+            metadata_filter[field] = {"$in": list(dict.fromkeys(field_values))}
+    return metadata_filter or None
+
+
+def normalize_filter(metadata_filter: Optional[Dict]) -> Dict[str, List]:
+    """Pasa `{"campo": valor | {"$eq": valor} | {"$in": [...]}}` a `{"campo": [valores]}`."""
+    normalized = {}
+    for field, condition in (metadata_filter or {}).items():
+        if isinstance(condition, dict):
+            if set(condition) == {"$eq"}:
+                normalized[field] = [condition["$eq"]]
+            elif set(condition) == {"$in"}:
+                normalized[field] = list(condition["$in"])
+            else:
+                raise ValueError(f"Operador de filtro no soportado para '{field}': {sorted(condition)}. Use $eq o $in.")
+        else:
+            normalized[field] = [condition]
+    return normalized
+
+
+def matches(metadata_filter: Optional[Dict], metadata: Dict) -> bool:
+    """True si la metadata de un chunk cumple el filtro."""
+    return all(metadata.get(field) in values for field, values in normalize_filter(metadata_filter).items())
+
+
+def filter_scope(metadata_filter: Optional[Dict]) -> str:
+    """Clave estable de un filtro, para no mezclar en caché respuestas con filtros distintos."""
+    normalized = normalize_filter(metadata_filter)
+    if not normalized:
+        return ""
+    return json.dumps({f: sorted(map(str, v)) for f, v in normalized.items()}, sort_keys=True, ensure_ascii=False)
+
+
+class MetadataBitmaps:
+    """
+    Bitmaps por valor de metadata (`campo -> valor -> array bool por fila`) para
+    filtrar antes de puntuar. Cada campo se construye la primera vez que se filtra
+    por él con `loader(campo)`, que devuelve pares (fila, valor), y después se
+    mantiene al día con `update` y `compact`.
+    """
+    def __init__(self, loader: Callable[[str], Iterable[Tuple[int, Any]]]):
+        self._loader = loader
+        self._fields: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._size = 0
+
+    def _ensure_size(self, size: int):
+        if size <= self._size:
+            return
+        for bitmaps in self._fields.values():
+            for value, bitmap in bitmaps.items():
+                grown = np.zeros(size, dtype=bool)
+                grown[:len(bitmap)] = bitmap
+                bitmaps[value] = grown
+        self._size = size
+
+    def _field(self, field: str) -> Dict[Any, np.ndarray]:
+        if field not in self._fields:
+            pairs = list(self._loader(field))
+            self._size = max(self._size, max((row for row, _ in pairs), default=-1) + 1)
+            rows_by_value: Dict[Any, List[int]] = {}
+            for row, value in pairs:
+                if value is not None:
+                    rows_by_value.setdefault(value, []).append(row)
+            bitmaps: Dict[Any, np.ndarray] = {}
+            for value, rows in rows_by_value.items():
+                bitmaps[value] = np.zeros(self._size, dtype=bool)
+                bitmaps[value][rows] = True
+            self._fields[field] = bitmaps
+        return self._fields[field]
+
+    def mask(self, metadata_filter: Optional[Dict], size: int) -> np.ndarray:
+        """Array bool de longitud `size` con las filas que cumplen el filtro."""
+        result = np.ones(size, dtype=bool)
+        for field, values in normalize_filter(metadata_filter).items():
+            bitmaps = self._field(field)
+            self._ensure_size(size)
+            field_mask = np.zeros(size, dtype=bool)
+            for value in values:
+                bitmap = bitmaps.get(value)
+                if bitmap is not None:
+                    field_mask |= bitmap[:size]
+            result &= field_mask
+        return result
+
+    def update(self, rows: List[int], metadatas: List[Dict]):
+        """Registra (o sobrescribe) la metadata de `rows` en los campos ya construidos."""
+        if not self._fields or not rows:
+            return
+        # Solo las filas sobrescritas pueden tener bits de un valor anterior
+        overwritten = [row for row in rows if row < self._size]
+        self._ensure_size(max(rows) + 1)
+        for field, bitmaps in self._fields.items():
+            if overwritten:
+                for bitmap in bitmaps.values():
+                    bitmap[overwritten] = False
+            for row, metadata in zip(rows, metadatas):
+                value = metadata.get(field)
+                if value is not None:
+                    if value not in bitmaps:
+                        bitmaps[value] = np.zeros(self._size, dtype=bool)
+                    bitmaps[value][row] = True
+
+    def compact(self, live_rows: np.ndarray):
+        """Renumera las filas como la matriz compactada (solo quedan `live_rows`)."""
+        if len(live_rows):
+            self._ensure_size(int(live_rows[-1]) + 1)
+        for bitmaps in self._fields.values():
+            for value in list(bitmaps):
+                bitmaps[value] = bitmaps[value][live_rows]
+        self._size = len(live_rows)
+
+    def reset(self):
+        self._fields.clear()
+        self._size = 0
@@ -0,0 +1,303 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document as LCDocument
+
+from .filters import MetadataBitmaps
+
+# Palabras vacías del español (sin tildes, igual que los tokens)
+_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el ella ellas
+ellos en entre era eran es esa esas ese eso esos esta estas este esto estos fue fueron ha han hasta hay la las
+le les lo los mas me mi mis mucho muchos muy nada ni no nos nosotros o os otra otras otro otros para pero poco
+por porque que quien quienes se ser si sin sobre son su sus tambien te ti todo todos tu tus un una unas uno unos
+y ya yo
+""".split())
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin tildes ("Campaña" -> "campana") para que la consulta no dependa de ellas."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _stem(token: str) -> str:
+    """Stemming ligero de plurales; los tokens con dígitos (años, modelos) se dejan intactos."""
+    if any(c.isdigit() for c in token) or len(token) <= 3:
+        return token
+    if token.endswith("ces") and len(token) > 4:
+        return token[:-3] + "z"  # luces -> luz
+    if token.endswith("es") and len(token) > 5 and token[-3] in "lrndj":
+        return token[:-2]        # ciudades -> ciudad
+    if token.endswith("s"):
+        return token[:-1]        # campanas -> campana
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenizador para español: sin tildes, sin palabras vacías y con plurales reducidos."""
+    return [_stem(t) for t in _TOKEN_RE.findall(_fold(text)) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """
+    Índice léxico BM25 persistido en SQLite (`path`), construido en la ingesta junto
+    al índice vectorial y con los mismos IDs de chunk.
+    - Las postings de cada término se guardan compactas: números de documento
+      (uint32, ordenados) y frecuencias (uint16) como dos blobs.
+    - Las altas y bajas se acumulan en memoria y se escriben juntas en `flush`
+      (también antes de buscar y cada `flush_every` postings), así que la ingesta
+      por lotes es barata y el disco nunca queda a medias.
+    - Los borrados y sobrescrituras solo marcan el documento como muerto; las
+      postings se reescriben sin ellos cuando más de la mitad están muertos.
+    - Si otro proceso (p. ej. `reindex.py` mientras la API sirve consultas) escribe
+      en el mismo archivo, el índice se recarga antes de la siguiente operación.
+    Con `path=None` el índice vive solo en memoria.
+    """
+    def __init__(self, path: Optional[Union[str, Path]] = None, k1: float = 1.2, b: float = 0.75,
+                 max_cached_terms: int = 4096, flush_every: int = 200_000):
+        self.path = Path(path) if path is not None else None
+        self.k1 = k1
+        self.b = b
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._max_cached_terms = max_cached_terms
+        self._postings_cache: "OrderedDict[str, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._pending: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._pending_count = 0
+        self._pending_docs: List[Tuple] = []
+        self._pending_deletes: List[int] = []
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path) if self.path is not None else ":memory:", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                         "text TEXT NOT NULL, metadata TEXT NOT NULL, length INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT PRIMARY KEY, docs BLOB NOT NULL, tfs BLOB NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._bitmaps = MetadataBitmaps(self._load_metadata_field)
+        self._data_version = None
+        self._refresh()
+
+    def _load_metadata_field(self, field: str):
+        return self._db.execute("SELECT doc, json_extract(metadata, ?) FROM docs", (f'$."{field}"',)).fetchall()
+
+    def _load(self):
+        rows = self._db.execute("SELECT doc, id, length FROM docs").fetchall()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'next_doc'").fetchone()
+        # Los números de documento no se reutilizan: las postings pueden seguir citando los muertos
+        self._next_doc = int(row[0]) if row else 0
+        self._doc_of_id: Dict[str, int] = {id_: doc for doc, id_, _ in rows}
+        self._lengths = np.zeros(self._next_doc, dtype=np.float32)
+        self._alive = np.zeros(self._next_doc, dtype=bool)
+        for doc, _, length in rows:
+            self._lengths[doc] = length
+            self._alive[doc] = True
+        self._total_length = float(self._lengths[self._alive].sum())
+        # Números de documento muertos que aún pueden aparecer en las postings
+        self._dead = self._next_doc - len(rows)
+
+    def _refresh(self):
+        """
+        Recarga el índice si otro proceso lo ha modificado: `data_version` de SQLite
+        solo cambia con los commits de otras conexiones. Con escrituras propias
+        pendientes no se recarga (se perderían); las escribe `flush`.
+        """
+        if self._pending or self._pending_docs or self._pending_deletes:
+            return
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._postings_cache.clear()
+        self._bitmaps.reset()
+        self._load()
+        self._data_version = data_version
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._doc_of_id)
+
+    # --- Escritura ---
+    def add(self, documents: List[LCDocument], ids: List[str]):
+        """Indexa (o sobrescribe) los chunks `documents` con sus `ids`."""
+        with self._lock:
+            self._refresh()
+            self._mark_dead([id_ for id_ in ids if id_ in self._doc_of_id])
+            numbers = []
+            for doc, id_ in zip(documents, ids):
+                if id_ in self._doc_of_id:  # id repetido dentro del lote: gana el último
+                    self._mark_dead([id_])
+                terms = Counter(tokenize(doc.page_content))
+                length = sum(terms.values())
+                number = self._next_doc
+                self._next_doc += 1
+                numbers.append(number)
+                if number >= len(self._alive):
+                    grow = max(1024, len(self._alive))
+                    self._lengths = np.concatenate([self._lengths, np.zeros(grow, dtype=np.float32)])
+                    self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+                self._doc_of_id[id_] = number
+                self._lengths[number] = length
+                self._alive[number] = True
+                self._total_length += length
+                self._pending_docs.append((number, id_, doc.page_content,
+                                           json.dumps(doc.metadata, ensure_ascii=False), length))
+                for term, tf in terms.items():
+                    self._pending[term].append((number, min(tf, 65535)))
+                self._pending_count += len(terms)
+            self._bitmaps.update(numbers, [doc.metadata for doc in documents])
+            if self._pending_count >= self.flush_every:
+                self.flush()
+
+    def delete(self, ids: Iterable[str]):
+        with self._lock:
+            self._refresh()
+            ids = [id_ for id_ in ids if id_ in self._doc_of_id]
+            if not ids:
+                return
+            self._mark_dead(ids)
+            if self._dead > self.count():
+                self._compact()
+
+    def _mark_dead(self, ids: List[str]):
+        for id_ in ids:
+            number = self._doc_of_id.pop(id_)
+            self._pending_deletes.append(number)
+            self._alive[number] = False
+            self._total_length -= float(self._lengths[number])
+            self._dead += 1
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM docs")
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM meta")
+            self._db.commit()
+            self._pending.clear()
+            self._pending_count = 0
+            self._pending_docs.clear()
+            self._pending_deletes.clear()
+            self._postings_cache.clear()
+            self._bitmaps.reset()
+            self._load()
+
+    def flush(self):
+        """Escribe en disco, en una sola transacción, las altas y bajas pendientes."""
+        with self._lock:
+            if not (self._pending or self._pending_docs or self._pending_deletes):
+                return
+            self._db.executemany("DELETE FROM docs WHERE doc = ?", [(n,) for n in self._pending_deletes])
+            # Un chunk añadido y sobrescrito antes del flush ya no está vivo
+            self._db.executemany("INSERT INTO docs (doc, id, text, metadata, length) VALUES (?, ?, ?, ?, ?)",
+                                 [row for row in self._pending_docs if self._alive[row[0]]])
+            for term, new in self._pending.items():
+                docs, tfs = self._read_postings(term)
+                new = np.asarray(new, dtype=np.uint32)
+                docs = np.concatenate([docs, new[:, 0]])
+                tfs = np.concatenate([tfs, new[:, 1].astype(np.uint16)])
+                self._db.execute("INSERT OR REPLACE INTO postings (term, docs, tfs) VALUES (?, ?, ?)",
+                                 (term, docs.tobytes(), tfs.tobytes()))
+                self._postings_cache.pop(term, None)
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_doc', ?)", (str(self._next_doc),))
+            self._db.commit()
+            self._pending.clear()
+            self._pending_count = 0
+            self._pending_docs.clear()
+            self._pending_deletes.clear()
+
+    def _compact(self):
+        """Reescribe las postings sin los documentos muertos."""
+        self.flush()
+        rows = self._db.execute("SELECT term, docs, tfs FROM postings").fetchall()
+        updates, empty = [], []
+        for term, docs, tfs in rows:
+            docs, tfs = np.frombuffer(docs, dtype=np.uint32), np.frombuffer(tfs, dtype=np.uint16)
+            keep = self._alive[docs]
+            if keep.any():
+                updates.append((docs[keep].tobytes(), tfs[keep].tobytes(), term))
+            else:
+                empty.append((term,))
+        self._db.executemany("UPDATE postings SET docs = ?, tfs = ? WHERE term = ?", updates)
+        self._db.executemany("DELETE FROM postings WHERE term = ?", empty)
+        self._db.commit()
+        self._postings_cache.clear()
+        self._dead = 0
+
+    # --- Lectura ---
+    def _read_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        cached = self._postings_cache.get(term)
+        if cached is not None:
+            self._postings_cache.move_to_end(term)
+            return cached
+        row = self._db.execute("SELECT docs, tfs FROM postings WHERE term = ?", (term,)).fetchone()
+        if row is None:
+            postings = np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+        else:
+            postings = np.frombuffer(row[0], dtype=np.uint32), np.frombuffer(row[1], dtype=np.uint16)
+        self._postings_cache[term] = postings
+        if len(self._postings_cache) > self._max_cached_terms:
+            self._postings_cache.popitem(last=False)
+        return postings
+
+    def search(self, query: str, k: int = 10, filter: Optional[Dict] = None) -> List[Tuple[LCDocument, float]]:
+        """
+        Devuelve los `k` chunks con mayor puntuación BM25 para `query`. Con `filter`
+        (sintaxis de Pinecone, ver `rag.filters`) solo se puntúan los chunks que lo cumplen.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = self.count()
+            if not terms or n_docs == 0:
+                return []
+            self.flush()
+            avg_length = self._total_length / n_docs
+            allowed = self._alive
+            if filter:
+                allowed = allowed & self._bitmaps.mask(filter, len(allowed))
+            scores = np.zeros(len(self._alive), dtype=np.float32)
+            for term in terms:
+                docs, tfs = self._read_postings(term)
+                # Postings escritas por otro proceso después de la última recarga
+                known = docs < len(self._alive)
+                docs, tfs = docs[known], tfs[known]
+                # El idf se calcula sobre todo el corpus vivo; el filtro solo decide qué se puntúa
+                live = self._alive[docs]
+                docs, tfs = docs[live], tfs[live].astype(np.float32)
+                if not len(docs):
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                if filter:
+                    keep = allowed[docs]
+                    docs, tfs = docs[keep], tfs[keep]
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / avg_length)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            matched = np.flatnonzero(scores)
+            if not len(matched):
+                return []
+            k = min(k, len(matched))
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            placeholders = ",".join("?" * len(top))
+            found = {doc: (id_, text, metadata) for doc, id_, text, metadata in self._db.execute(
+                f"SELECT doc, id, text, metadata FROM docs WHERE doc IN ({placeholders})", [int(d) for d in top])}
+        results = []
+        for doc in top:
+            if int(doc) not in found:
+                # Borrado por otro proceso entre la recarga y esta consulta
+                continue
+            id_, text, metadata = found[int(doc)]
+            results.append((LCDocument(id=id_, page_content=text, metadata=json.loads(metadata)), float(scores[doc])))
+        return results
@@ -0,0 +1,373 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document as LCDocument
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .ann_index import IVFIndex
+from .filters import MetadataBitmaps
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store local, sin servicios externos, pensado para corpus medianos.
+    - Los embeddings (normalizados) viven en una matriz float32 en disco
+      (`vectors.f32`) que se abre con `np.memmap`, así que no se cargan enteros en RAM.
+    - El texto y la metadata de cada chunk se guardan en SQLite (`chunks.sqlite`),
+      indexados por la fila de la matriz.
+    - Con `index_type="flat"` la búsqueda es exacta: un producto matriz-vector y
+      `argpartition` para el top-k. Con `index_type="ivf"` se usa un índice aproximado
+      (`IVFIndex`, `n_lists` listas, `n_probe` listas exploradas por consulta) una vez
+      hay al menos `ann_min_rows` filas; por debajo la búsqueda exacta es igual de rápida.
+    - `filter` (sintaxis de Pinecone, ver `rag.filters`) se resuelve con bitmaps por
+      valor de metadata antes de puntuar: solo se calculan similitudes de los chunks
+      que cumplen el filtro.
+    Los borrados marcan la fila como muerta; la matriz se compacta cuando más de la
+    mitad de las filas están muertas.
+    Si otro proceso modifica el mismo directorio (p. ej. scripts/reindex.py mientras
+    la API sirve consultas), el estado en memoria se recarga antes de la siguiente
+    operación (ver `_refresh`).
+    """
+    def __init__(self, directory: Union[str, Path], embedding: Embeddings,
+                 index_type: str = "flat", n_lists: int = 1024, n_probe: int = 16,
+                 ann_min_rows: int = 50_000):
+        if index_type not in ("flat", "ivf"):
+            raise ValueError(f"Tipo de índice no soportado: {index_type}. Use 'flat' o 'ivf'.")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._embedding = embedding
+        self._vectors_path = self.directory / "vectors.f32"
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.memmap] = None
+
+        self._db = sqlite3.connect(str(self.directory / "chunks.sqlite"), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                         "text TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+
+        self.dim: Optional[int] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._bitmaps = MetadataBitmaps(self._load_metadata_field)
+        self.index_type = index_type
+        self.ann_min_rows = ann_min_rows
+        self._ann = IVFIndex(n_lists=n_lists, n_probe=n_probe) if index_type == "ivf" else None
+        # El índice IVF en memoria tiene cambios sin guardar (se guardan en `flush`)
+        self._ann_dirty = False
+        self._signature = None
+        self._refresh()
+
+    # --- Estado compartido entre procesos ---
+    def _state_signature(self) -> Tuple:
+        """
+        Cambia cuando otro proceso modifica el índice: `data_version` de SQLite cambia
+        con cada commit de otra conexión, y la matriz y el índice IVF se reescriben
+        fuera de SQLite (append, compactación).
+        """
+        files = []
+        for path in (self._vectors_path, self.directory / "ivf_assignments.npy"):
+            try:
+                stat = path.stat()
+                files.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                files.append(None)
+        return (self._db.execute("PRAGMA data_version").fetchone()[0], *files)
+
+    def _refresh(self):
+        """Recarga dimensión, filas vivas, bitmaps e índice IVF si el índice ha cambiado en disco."""
+        signature = self._state_signature()
+        if signature == self._signature:
+            return
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._alive = np.zeros(self._n_rows(), dtype=bool)
+        live_rows = [r for (r,) in self._db.execute("SELECT row FROM chunks")]
+        self._alive[[r for r in live_rows if r < len(self._alive)]] = True
+        self._matrix = None
+        self._bitmaps.reset()
+        if self._ann is not None:
+            self._ann.reset()
+            self._ann.load(self.directory, len(self._alive))
+        self._signature = signature
+
+    def _remember_state(self):
+        """Tras escribir, el estado en memoria ya está al día: no hay que recargarlo."""
+        self._signature = self._state_signature()
+
+    def _load_metadata_field(self, field: str):
+        return self._db.execute("SELECT row, json_extract(metadata, ?) FROM chunks", (f'$."{field}"',)).fetchall()
+
+    @classmethod
+    def from_env(cls, directory: Union[str, Path], embedding: Embeddings) -> "LocalVectorStore":
+        return cls(
+            directory,
+            embedding,
+            index_type=os.getenv("LOCAL_INDEX_TYPE", "flat").lower(),
+            n_lists=int(os.getenv("LOCAL_IVF_LISTS", "1024")),
+            n_probe=int(os.getenv("LOCAL_IVF_PROBE", "16")),
+            ann_min_rows=int(os.getenv("LOCAL_ANN_MIN_ROWS", "50000")),
+        )
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    # --- Matriz de vectores ---
+    def _n_rows(self) -> int:
+        if self.dim is None or not self._vectors_path.exists():
+            return 0
+        return self._vectors_path.stat().st_size // (4 * self.dim)
+
+    def _open_matrix(self) -> Optional[np.memmap]:
+        if self._matrix is None and len(self._alive):
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._alive), self.dim))
+        return self._matrix
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._alive.sum())
+
+    # --- Escritura ---
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+
+        # Si un id se repite en el lote, gana la última aparición
+        latest = {id_: i for i, id_ in enumerate(ids)}
+        order = list(latest.values())
+        vectors = self._normalize(np.asarray(self._embedding.embed_documents([texts[i] for i in order]), dtype=np.float32))
+
+        with self._lock:
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+
+            batch_ids = [ids[i] for i in order]
+            existing = dict(self._select("SELECT id, row FROM chunks WHERE id IN ({})", batch_ids))
+            n_rows = len(self._alive)
+            rows, appended = [], []
+            for j, id_ in enumerate(batch_ids):
+                if id_ in existing:
+                    rows.append(existing[id_])
+                else:
+                    rows.append(n_rows + len(appended))
+                    appended.append(j)
+
+            overwrite = [j for j, id_ in enumerate(batch_ids) if id_ in existing]
+            if overwrite:
+                matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(n_rows, self.dim))
+                matrix[[rows[j] for j in overwrite]] = vectors[overwrite]
+                matrix.flush()
+                del matrix
+            if appended:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(vectors[appended].tobytes())
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(rows[j], batch_ids[j], texts[i], json.dumps(metadatas[i], ensure_ascii=False))
+                 for j, i in enumerate(order)],
+            )
+            self._db.commit()
+
+            self._alive = np.concatenate([self._alive, np.zeros(len(appended), dtype=bool)])
+            self._alive[rows] = True
+            self._matrix = None
+            self._bitmaps.update(rows, [metadatas[i] for i in order])
+
+            # Inserción incremental en el índice aproximado: cada fila va a la lista de su centroide
+            if self._ann is not None and self._ann.is_trained:
+                self._ann.set_rows(np.asarray(rows), vectors)
+                self._ann_dirty = True
+            self._remember_state()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            self._refresh()
+            rows = [row for _, row in self._select("SELECT id, row FROM chunks WHERE id IN ({})", ids)]
+            self._delete_in_batches("DELETE FROM chunks WHERE id IN ({})", ids)
+            self._db.commit()
+            self._alive[[row for row in rows if row < len(self._alive)]] = False
+            if len(self._alive) and self._alive.sum() < len(self._alive) / 2:
+                self._compact()
+            self._remember_state()
+        return True
+
+    def clear(self):
+        """Elimina todos los chunks del índice."""
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
+            self._vectors_path.unlink(missing_ok=True)
+            self._alive = np.zeros(0, dtype=bool)
+            self._matrix = None
+            self._bitmaps.reset()
+            if self._ann is not None:
+                self._ann.reset()
+                self._ann.save(self.directory)
+            self._remember_state()
+
+    def flush(self):
+        """
+        Cierra una tanda de escrituras (RAGSystem lo llama al final de cada
+        sincronización): reentrena el índice aproximado si hace falta y lo guarda
+        una sola vez, en lugar de reescribirlo con cada lote.
+        """
+        if self._ann is None:
+            return
+        with self._lock:
+            self.build_ann_index()
+            if self._ann_dirty:
+                self._ann.save(self.directory)
+                self._ann_dirty = False
+                self._remember_state()
+
+    def build_ann_index(self, force: bool = False):
+        """
+        (Re)entrena el índice aproximado si hace falta: la primera vez que se supera
+        `ann_min_rows` y cuando el índice ha crecido mucho desde el último entrenamiento.
+        Solo se llama desde la ingesta (`flush`), nunca al buscar: entrenar k-means
+        bloquearía las consultas concurrentes.
+        """
+        if self._ann is None:
+            return
+        with self._lock:
+            self._refresh()
+            n_rows = len(self._alive)
+            if n_rows == 0 or (n_rows < self.ann_min_rows and not force):
+                return
+            if force or self._ann.needs_training(n_rows):
+                self._ann.train(self._open_matrix())
+                self._ann.save(self.directory)
+                self._ann_dirty = False
+                self._remember_state()
+
+    def _compact(self):
+        """Reescribe la matriz solo con las filas vivas y renumera las filas en SQLite."""
+        live_rows = np.flatnonzero(self._alive)
+        matrix = self._open_matrix()
+        tmp_path = self._vectors_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for start in range(0, len(live_rows), 4096):
+                f.write(np.ascontiguousarray(matrix[live_rows[start:start + 4096]]).tobytes())
+        self._matrix = None
+        del matrix
+        # Filas en orden ascendente: el destino siempre está libre
+        self._db.executemany("UPDATE chunks SET row = ? WHERE row = ?",
+                             [(new, int(old)) for new, old in enumerate(live_rows) if new != old])
+        self._db.commit()
+        tmp_path.replace(self._vectors_path)
+        self._alive = np.ones(len(live_rows), dtype=bool)
+        self._bitmaps.compact(live_rows)
+        if self._ann is not None and self._ann.is_trained:
+            self._ann.compact(live_rows)
+            self._ann_dirty = True
+
+    def _select(self, sql: str, values: List) -> List[Tuple]:
+        results = []
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            results.extend(self._db.execute(sql.format(",".join("?" * len(batch))), batch).fetchall())
+        return results
+
+    def _delete_in_batches(self, sql: str, values: List):
+        for start in range(0, len(values), 500):
+            batch = values[start:start + 500]
+            self._db.execute(sql.format(",".join("?" * len(batch))), batch)
+
+    # --- Lectura ---
+    def get_by_ids(self, ids: List[str]) -> List[LCDocument]:
+        with self._lock:
+            rows = self._select("SELECT id, text, metadata FROM chunks WHERE id IN ({})", list(ids))
+        return [LCDocument(id=id_, page_content=text, metadata=json.loads(metadata)) for id_, text, metadata in rows]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[LCDocument, float]]:
+        """
+        `filter` restringe la búsqueda a los chunks cuya metadata lo cumple.
+        `n_probe` (solo con `index_type="ivf"`) ajusta por consulta cuántas listas se exploran.
+        """
+        metadata_filter = kwargs.get("filter")
+        with self._lock:
+            self._refresh()
+            matrix = self._open_matrix()
+            allowed = self._alive
+            if metadata_filter:
+                allowed = allowed & self._bitmaps.mask(metadata_filter, len(allowed))
+            n_allowed = int(allowed.sum())
+            if matrix is None or n_allowed == 0:
+                return []
+
+            query = self._normalize(np.asarray(embedding, dtype=np.float32))
+            # Con un filtro selectivo es más barato (y exacto) puntuar solo las filas que lo cumplen
+            if self._ann is not None and self._ann.is_trained and n_allowed >= self.ann_min_rows:
+                candidates = self._ann.candidates(query, kwargs.get("n_probe"))
+                candidates = candidates[allowed[candidates]]
+                candidate_scores = matrix[candidates] @ query
+            elif metadata_filter:
+                candidates = np.flatnonzero(allowed)
+                candidate_scores = matrix[candidates] @ query
+            else:
+                candidates = np.flatnonzero(allowed)
+                candidate_scores = matrix @ query
+                candidate_scores = candidate_scores[candidates]
+            if not len(candidates):
+                return []
+
+            k = min(k, len(candidates))
+            best = np.argpartition(-candidate_scores, k - 1)[:k]
+            best = best[np.argsort(-candidate_scores[best])]
+            top, top_scores = candidates[best], candidate_scores[best]
+
+            found = {row: (id_, text, metadata) for row, id_, text, metadata in
+                     self._select("SELECT row, id, text, metadata FROM chunks WHERE row IN ({})", [int(r) for r in top])}
+        results = []
+        for row, score in zip(top, top_scores):
+            # Una fila sin chunk en SQLite está muerta (borrada por otro proceso a mitad de consulta)
+            if int(row) not in found:
+                continue
+            id_, text, metadata = found[int(row)]
+            results.append((LCDocument(id=id_, page_content=text, metadata=json.loads(metadata)), float(score)))
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[LCDocument]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[LCDocument, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[LCDocument]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Similitud coseno [-1, 1] -> relevancia [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *,
+                   ids: Optional[List[str]] = None, directory: Union[str, Path] = "./index/vector/local",
+                   **kwargs: Any) -> "LocalVectorStore":
+        store = cls(directory, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
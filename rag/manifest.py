@@ -0,0 +1,71 @@
+import hashlib
+import itertools
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+def file_hash(file_path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 del contenido binario de un archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def iter_chunk_ids(relative_path: str) -> Iterator[str]:
+    """IDs estables de los chunks de un archivo: dependen solo de su ruta relativa y posición."""
+    prefix = hashlib.sha256(relative_path.encode("utf-8")).hexdigest()[:32]
+    return (f"{prefix}-{i:05d}" for i in itertools.count())
+
+
+def chunk_ids_for(relative_path: str, n_chunks: int) -> List[str]:
+    """Los `n_chunks` primeros IDs de `iter_chunk_ids`."""
+    return list(itertools.islice(iter_chunk_ids(relative_path), n_chunks))
+
+
+class FileManifest:
+    """
+    Manifiesto de los archivos indexados: ruta relativa -> {size, mtime, hash, chunk_ids}.
+    Permite calcular qué archivos se han añadido, modificado o borrado desde la
+    última sincronización. El hash solo se recalcula si cambian tamaño o mtime.
+    Con `path=None` el manifiesto vive solo en memoria.
+    """
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path) if path is not None else None
+        self.entries: Dict[str, Dict] = {}
+        if self.path is not None and self.path.exists():
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def scan(self, root: Path, files: Iterable[Path]) -> Dict[str, Dict]:
+        """Estado actual de `files` (bajo `root`), reutilizando el hash de las entradas sin cambios."""
+        current = {}
+        for file_path in files:
+            stat = file_path.stat()
+            key = file_path.relative_to(root).as_posix()
+            previous = self.entries.get(key)
+            if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+                current[key] = dict(previous)
+            else:
+                current[key] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": file_hash(file_path)}
+                # Archivo "tocado" pero con el mismo contenido: sus chunks siguen siendo válidos
+                if previous and previous["hash"] == current[key]["hash"]:
+                    current[key]["chunk_ids"] = previous.get("chunk_ids", [])
+        return current
+
+    def diff(self, current: Dict[str, Dict]) -> Tuple[List[str], List[str], List[str]]:
+        """Devuelve (añadidos, modificados, borrados) respecto al manifiesto guardado."""
+        added = [p for p in current if p not in self.entries]
+        changed = [p for p in current if p in self.entries and current[p]["hash"] != self.entries[p]["hash"]]
+        removed = [p for p in self.entries if p not in current]
+        return added, changed, removed
+
+    def save(self, entries: Dict[str, Dict]):
+        self.entries = entries
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entries, ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp_path.replace(self.path)
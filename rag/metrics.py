@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .embedding_scheduler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Límites (en segundos) de los buckets de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_str(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"La métrica {self.name} espera las etiquetas {self.labelnames}, no {tuple(labels)}.")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    """Contador monótono con etiquetas, p. ej. `tokens.inc(120, kind="prompt")`."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_label_str(self.labelnames, key)} {value:g}" for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Histograma de buckets acumulados (formato Prometheus), p. ej. latencias por etapa."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}  # etiquetas -> [conteos por bucket (+Inf al final), suma]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def snapshot(self, **labels) -> Dict:
+        """`{"count", "sum"}` de una serie (ceros si no hay observaciones)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return {"count": sum(series[0]), "sum": series[1]} if series else {"count": 0, "sum": 0.0}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {total:g}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso, exportables en el formato de texto de Prometheus."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+# Content-Type del formato de texto de Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Duración de cada etapa de consulta e ingesta.", ("stage",))
+STAGE_ERRORS = REGISTRY.counter(
+    "rag_stage_errors_total", "Etapas terminadas con una excepción.", ("stage",))
+LLM_TOKENS = REGISTRY.counter(
+    "rag_llm_tokens_total", "Tokens de las llamadas al LLM (estimados si el proveedor no los informa).", ("kind",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "rag_cache_requests_total", "Consultas a las cachés de respuestas y embeddings.", ("cache", "result"))
+INGESTED_FILES = REGISTRY.counter(
+    "rag_ingested_files_total", "Archivos procesados por la indexación.", ("result",))
+INGESTED_CHUNKS = REGISTRY.counter(
+    "rag_ingested_chunks_total", "Chunks embebidos y subidos al índice.")
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Mide la duración de una etapa: la registra en `rag_stage_duration_seconds`, cuenta
+    las excepciones en `rag_stage_errors_total` y deja una línea de log DEBUG con
+    `stage` y `duration_ms` como campos estructurados (`extra`).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %.1f ms", stage, elapsed * 1000,
+                         extra={"stage": stage, "duration_ms": round(elapsed * 1000, 3)})
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """
+    Callback de LangChain que mide cada llamada al LLM (etapa `stage`) y cuenta sus
+    tokens de prompt y de respuesta. Si el proveedor no devuelve `usage_metadata`
+    se estiman a partir del texto.
+    """
+    def __init__(self, stage: str = "generate"):
+        self.stage = stage
+        self._runs: Dict[UUID, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, prompt_text: str):
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), estimate_tokens(prompt_text))
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[float, int]]:
+        with self._lock:
+            started = self._runs.pop(run_id, None)
+        if started is None:
+            return None
+        STAGE_SECONDS.observe(time.perf_counter() - started[0], stage=self.stage)
+        return started
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id, "".join(str(m.content) for batch in messages for m in batch))
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id, "".join(prompts))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        started = self._finish(run_id)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), kind="prompt")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), kind="completion")
+                else:
+                    LLM_TOKENS.inc(started[1] if started else 0, kind="prompt")
+                    LLM_TOKENS.inc(estimate_tokens(generation.text), kind="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+        STAGE_ERRORS.inc(stage=self.stage)
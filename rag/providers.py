@@ -0,0 +1,53 @@
+import os
+import threading
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Los SDK de los proveedores (langchain_google_genai, pinecone...) tardan segundos en
+# importarse, así que solo se importan dentro de estas funciones, al usarlos por primera vez.
+
+
+def gemini_embeddings(model: str) -> Embeddings:
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(model=model, task_type="retrieval_query")
+
+
+def gemini_chat(model: str):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, temperature=0.1, convert_system_message_to_human=True)
+
+
+def pinecone_client():
+    from pinecone import Pinecone
+    return Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+
+class LazyEmbeddings(Embeddings):
+    """Embeddings que crean el proveedor real con `factory` la primera vez que se usan."""
+    def __init__(self, factory: Callable[[], Embeddings], model: Optional[str] = None):
+        self._factory = factory
+        self._embeddings: Optional[Embeddings] = None
+        self._lock = threading.Lock()
+        # Nombre del modelo disponible sin crear el proveedor (lo usa la caché de embeddings)
+        self.model = model
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._factory()
+        return self._embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
@@ -1,70 +1,119 @@
 from langchain_core.documents import Document as LCDocument
-from typing import List
-import re
+from langchain_core.vectorstores import VectorStore
+from typing import Dict, List, Optional, Tuple
+import logging
 
-from chatbox.index.vector.faiss_index import FAISSIndexer
+import numpy as np
+
+from .lexical_index import BM25Index
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Campo de metadata con la parte estática de la puntuación de re-ranking
+STATIC_SCORE_KEY = "static_score"
+
+def static_score(metadata: Dict) -> int:
+    """
+    Prioridad de una fuente independiente de la consulta (tipo de fuente + bonus por
+    el año de la metadata). Se calcula una vez en la ingesta y se guarda en la metadata
+    bajo `STATIC_SCORE_KEY`.
+    """
+    source_type = metadata.get("source_type", "unknown")
+
+    if source_type == "video_audio":
+        return 300
+    if source_type == "web_page":
+        return 100
+    if source_type in ["pdf", "txt_md", "docx", "pptx", "xlsx_csv"]:
+        base_score = 200
+        # Año que la ingesta extrae de la ruta (`year`), independiente del separador del sistema
+        year = metadata.get("year")
+        if year is not None and str(year).isdigit():
+            return base_score + int(year) - 2000
+        return base_score
+    return 0
+
+def _doc_key(doc: LCDocument):
+    return doc.id or (doc.metadata.get("file_path"), doc.page_content)
+
+def reciprocal_rank_fusion(rankings: List[List[LCDocument]], k: int = 60) -> List[Tuple[LCDocument, float]]:
+    """
+    Fusiona varias listas ordenadas con Reciprocal Rank Fusion: cada documento suma
+    1 / (k + posición) por cada lista en la que aparece. No depende de la escala de
+    las puntuaciones, así que combina sin calibrar la similitud coseno y BM25.
+    """
+    fused: Dict = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            best_doc, score = fused.get(key, (doc, 0.0))
+            fused[key] = (best_doc, score + 1.0 / (k + rank))
+    return sorted(fused.values(), key=lambda item: item[1], reverse=True)
 
 class Retriever:
-    def __init__(self, indexer: FAISSIndexer):
-        self.indexer = indexer
-
-    def _get_priority_score(self, doc: LCDocument) -> int:
-        metadata = doc.metadata
-        source_type = metadata.get("source_type", "unknown")
-        file_path = metadata.get("file_path", "")
-
-        if source_type == "video_audio":
-            return 300
-        if source_type == "web_page":
-            return 100
-        if source_type in ["pdf", "txt_md", "docx", "pptx", "xlsx_csv"]:
-            base_score = 200
-            year_match = re.search(r'\\(202[0-9])', file_path)
-            if year_match:
-                year = int(year_match.group(1))
-                year_bonus = year - 2000
-                return base_score + year_bonus
-            return base_score
-        return 0
-
-    def retrieve(self, query: str, k: int = 10) -> List[LCDocument]:
-        print(f"Realizando recuperación para la consulta: '{query}'")
-        
-        # 1. Recuperación Amplia (Fetch)
-        initial_results = self.indexer.search(query, k=50)
-        print(f"Recuperados {len(initial_results)} documentos iniciales para re-ranking.")
+    def __init__(self, vector_store: VectorStore, lexical_index: Optional[BM25Index] = None, fetch_k: int = 50):
+        # Cualquier backend de RAGSystem: PineconeVectorStore, LocalVectorStore...
+        self.vector_store = vector_store
+        # Índice BM25 construido en la ingesta; sin él la búsqueda es solo densa
+        self.lexical_index = lexical_index
+        self.fetch_k = fetch_k
+
+    def search(self, query: str, k: int = 10, fetch_k: Optional[int] = None,
+               filter: Optional[Dict] = None) -> List[Tuple[LCDocument, float]]:
+        """
+        Búsqueda híbrida: recupera `fetch_k` candidatos por similitud de embeddings y
+        otros tantos por BM25 (que encuentra nombres exactos de campañas o productos
+        aunque la búsqueda densa no los devuelva) y los fusiona con RRF.
+        `filter` (ver `rag.filters.build_metadata_filter`) se aplica dentro de ambas
+        búsquedas, así que los chunks que no lo cumplen no ocupan candidatos.
+        """
+        fetch_k = fetch_k or self.fetch_k
+        # Todos los backends aceptan el filtro con la sintaxis de Pinecone
+        dense_kwargs = {"filter": filter} if filter else {}
+        with span("retrieve.dense"):
+            rankings = [self.vector_store.similarity_search(query, k=fetch_k, **dense_kwargs)]
+        if self.lexical_index is not None:
+            with span("retrieve.lexical"):
+                rankings.append([doc for doc, _ in self.lexical_index.search(query, k=fetch_k, filter=filter)])
+        with span("retrieve.fusion"):
+            return reciprocal_rank_fusion(rankings)[:k]
+
+    def retrieve(self, query: str, k: int = 10, filter: Optional[Dict] = None) -> List[LCDocument]:
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Realizando recuperación para la consulta: '%s'", query)
+
+        # 1. Recuperación Amplia (Fetch), densa + léxica
+        initial_results = self.search(query, k=self.fetch_k, filter=filter)
+        if debug:
+            logger.debug("Recuperados %d documentos iniciales para re-ranking.", len(initial_results))
 
         if not initial_results:
             return []
 
-        # 2. Re-ranking Avanzado (Doble Filtro)
-        query_keywords = set(query.lower().split())
-        
-        scored_docs = []
-        for i, doc in enumerate(initial_results):
-            content = doc.page_content.lower()
-            
-            # Score de similitud base (más alto para los primeros resultados)
-            similarity_score = 1.0 / (i + 1)
-            
-            # Score de palabras clave (bonus si contiene todas las palabras)
-            keyword_score = 1.0 if all(keyword in content for keyword in query_keywords) else 0.0
-            
-            # Score de prioridad de fuente
-            priority_score = self._get_priority_score(doc)
-
-            # Puntuación final combinada
-            # Damos un peso enorme a la prioridad y a las palabras clave
-            final_score = (priority_score * 100) + (keyword_score * 50) + similarity_score
-            scored_docs.append((doc, final_score))
-
-        # Ordenar por la puntuación final combinada
-        reranked_results = sorted(scored_docs, key=lambda x: x[1], reverse=True)
-        
-        print("\n--- Resultados después de Re-ranking Avanzado ---")
-        final_docs = []
-        for i, (doc, score) in enumerate(reranked_results[:k]):
-            final_docs.append(doc)
-            print(f"{i+1}. (Score: {score:.2f}) {doc.metadata.get('file_name')} - Tipo: {doc.metadata.get('source_type')}")
-
-        return final_docs
+        # 2. Re-ranking por prioridad de fuente, vectorizado sobre todos los candidatos.
+        # La prioridad viene precalculada en la metadata ("static_score"); los chunks
+        # indexados antes de guardarla la calculan aquí.
+        with span("retrieve.rerank"):
+            docs = [doc for doc, _ in initial_results]
+            static_scores = np.fromiter(
+                (doc.metadata[STATIC_SCORE_KEY] if STATIC_SCORE_KEY in doc.metadata else static_score(doc.metadata)
+                 for doc in docs),
+                dtype=np.float64, count=len(docs))
+            fused_scores = np.fromiter((score for _, score in initial_results), dtype=np.float64, count=len(docs))
+            # La prioridad manda; a igual prioridad decide la fusión densa + BM25
+            final_scores = static_scores * 100 + fused_scores
+
+            k = min(k, len(docs))
+            top = np.argpartition(-final_scores, k - 1)[:k]
+            top = top[np.argsort(-final_scores[top], kind="stable")]
+
+        if debug:
+            logger.debug("--- Resultados después de Re-ranking Avanzado ---")
+            for i, idx in enumerate(top):
+                doc = docs[idx]
+                logger.debug("%d. (Score: %.4f) %s - Tipo: %s", i + 1, final_scores[idx],
+                             doc.metadata.get("file_name"), doc.metadata.get("source_type"))
+
+        return [docs[idx] for idx in top]
@@ -0,0 +1,93 @@
+# scripts/bench_ann.py
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# --- sys.path para importar rag.ann_index ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from rag.ann_index import IVFIndex
+
+
+def synthetic_embeddings(n: int, dim: int, n_topics: int, rng: np.random.Generator) -> np.ndarray:
+    """Embeddings normalizados agrupados en `n_topics` temas, como los de un corpus real."""
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, n_topics, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = matrix @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def ivf_top_k(index: IVFIndex, matrix: np.ndarray, query: np.ndarray, k: int, n_probe: int) -> np.ndarray:
+    candidates = index.candidates(query, n_probe)
+    scores = matrix[candidates] @ query
+    best = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+    return candidates[best[np.argsort(-scores[best])]]
+
+
+def latency_stats(seconds: list) -> dict:
+    ms = np.array(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k y latencia del índice IVF frente a la búsqueda exacta.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=50, help="Candidatos por consulta (Retriever pide 50).")
+    parser.add_argument("--lists", type=int, default=1024)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--output", type=str, default=None, help="Guarda los resultados en este JSON.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"Generando {args.rows} embeddings sintéticos de dimensión {args.dim}...")
+    matrix = synthetic_embeddings(args.rows, args.dim, n_topics=max(16, args.lists // 4), rng=rng)
+    queries = synthetic_embeddings(args.queries, args.dim, n_topics=max(16, args.lists // 4), rng=rng)
+
+    index = IVFIndex(n_lists=args.lists)
+    start = time.perf_counter()
+    index.train(matrix)
+    build_seconds = time.perf_counter() - start
+    print(f"Índice IVF ({args.lists} listas) entrenado en {build_seconds:.1f}s")
+
+    exact_results, exact_times = [], []
+    for query in queries:
+        start = time.perf_counter()
+        exact_results.append(exact_top_k(matrix, query, args.k))
+        exact_times.append(time.perf_counter() - start)
+    results = {
+        "rows": args.rows, "dim": args.dim, "k": args.k, "lists": args.lists,
+        "build_seconds": round(build_seconds, 2),
+        "exact": latency_stats(exact_times),
+        "ivf": [],
+    }
+    print(f"exacta          recall@{args.k}=1.000  p50={results['exact']['p50_ms']}ms  p99={results['exact']['p99_ms']}ms")
+
+    for n_probe in args.probes:
+        recalls, times = [], []
+        for query, expected in zip(queries, exact_results):
+            start = time.perf_counter()
+            found = ivf_top_k(index, matrix, query, args.k, n_probe)
+            times.append(time.perf_counter() - start)
+            recalls.append(len(np.intersect1d(found, expected)) / args.k)
+        row = {"n_probe": n_probe, f"recall@{args.k}": round(float(np.mean(recalls)), 4), **latency_stats(times)}
+        results["ivf"].append(row)
+        print(f"ivf n_probe={n_probe:<4} recall@{args.k}={row[f'recall@{args.k}']:.3f}  "
+              f"p50={row['p50_ms']}ms  p99={row['p99_ms']}ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Resultados guardados en {args.output}")
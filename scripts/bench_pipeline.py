@@ -0,0 +1,300 @@
+# scripts/bench_pipeline.py
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# --- sys.path para importar rag.* e ingest.* ---
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# El proveedor falso no tiene cuota: sin esto el scheduler limitaría a 600 peticiones/min
+os.environ.setdefault("EMBED_REQUESTS_PER_MINUTE", "1e9")
+
+from docx import Document as DocxDocument
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+from ingest.chunking import count_tokens, iter_chunks
+from rag.context import build_context
+from rag.core import RAGSystem, read_document
+from rag.embedding_scheduler import EmbeddingScheduler
+
+# --- CORPUS SINTÉTICO ---
+_WORDS = ("campaña marca cliente estrategia contenido audiencia inversión resultado conversión "
+          "anuncio presupuesto informe trimestre crecimiento canal social búsqueda display vídeo "
+          "creatividad métrica alcance impresiones clics retorno agencia equipo propuesta mercado").split()
+_NAMES = ["Aurora", "Brisa", "Cumbre", "Delta", "Estela", "Faro", "Galena", "Horizonte"]
+FORMATS = (".txt", ".md", ".docx", ".pdf")
+
+
+def synthetic_text(rng: np.random.Generator, n_paragraphs: int) -> str:
+    """Párrafos de frases con vocabulario de marketing y nombres de campaña (para BM25)."""
+    paragraphs = []
+    for _ in range(n_paragraphs):
+        sentences = []
+        for _ in range(int(rng.integers(3, 8))):
+            words = list(rng.choice(_WORDS, size=int(rng.integers(6, 16))))
+            if rng.random() < 0.3:
+                words.insert(int(rng.integers(0, len(words))), f"Campaña{rng.choice(_NAMES)}{int(rng.integers(2020, 2026))}")
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_minimal_pdf(path: Path, text: str, lines_per_page: int = 45, width: int = 90):
+    """Escribe un PDF de texto (Helvetica, WinAnsi) sin dependencias, legible por pypdf."""
+    lines = []
+    for paragraph in text.split("\n"):
+        while len(paragraph) > width:
+            cut = paragraph.rfind(" ", 0, width)
+            cut = cut if cut > 0 else width
+            lines.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip()
+        lines.append(paragraph)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    # Objetos: 1 catálogo, 2 árbol de páginas, 3 fuente, y por página (página, contenido)
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"}
+    kids = []
+    for i, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in page_lines) + " ET"
+        data = stream.encode("cp1252", errors="replace")
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>").encode()
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offsets[obj_id] for obj_id in sorted(objects))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def generate_corpus(data_dir: Path, files_per_format: int, paragraphs: int, seed: int = 0) -> Dict[str, List[Path]]:
+    """Genera `files_per_format` archivos de cada formato soportado, repartidos por carpetas de año."""
+    rng = np.random.default_rng(seed)
+    corpus: Dict[str, List[Path]] = {suffix: [] for suffix in FORMATS}
+    for suffix in FORMATS:
+        for i in range(files_per_format):
+            folder = data_dir / f"informes_{2020 + i % 6}"
+            if suffix == ".txt" and i % 4 == 0:
+                folder = data_dir / "transcripciones_tiktok"
+            folder.mkdir(parents=True, exist_ok=True)
+            path = folder / f"documento_{i:04d}{suffix}"
+            text = synthetic_text(rng, paragraphs)
+            if suffix == ".docx":
+                document = DocxDocument()
+                for paragraph in text.split("\n\n"):
+                    document.add_paragraph(paragraph)
+                document.save(str(path))
+            elif suffix == ".pdf":
+                write_minimal_pdf(path, text)
+            else:
+                path.write_text(text, encoding="utf-8")
+            corpus[suffix].append(path)
+    return corpus
+
+
+def synthetic_queries(n: int, seed: int = 1) -> List[str]:
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in range(n):
+        words = " ".join(rng.choice(_WORDS, size=4))
+        queries.append(f"¿Qué {words} tuvo la Campaña{_NAMES[i % len(_NAMES)]}{2020 + i % 6}? ({i})")
+    return queries
+
+
+# --- MEDICIÓN ---
+def latency_stats(seconds: List[float]) -> Dict:
+    ms = np.array(seconds) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "mean_ms": round(float(ms.mean()), 3)}
+
+
+def time_each(fn: Callable, items: List) -> List[float]:
+    seconds = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def bench_parsing(corpus: Dict[str, List[Path]]) -> Dict:
+    results = {}
+    for suffix, paths in corpus.items():
+        start = time.perf_counter()
+        chars = sum(len(read_document(path)) for path in paths)
+        seconds = time.perf_counter() - start
+        results[suffix.lstrip(".")] = {
+            "files": len(paths),
+            "files_per_s": round(len(paths) / seconds, 2),
+            "mb_per_s": round(sum(p.stat().st_size for p in paths) / 1e6 / seconds, 3),
+            "chars_per_s": round(chars / seconds, 1),
+        }
+    return results
+
+
+def bench_chunking(texts: List[str]) -> Dict:
+    start = time.perf_counter()
+    chunks = sum(1 for text in texts for _ in iter_chunks(text))
+    seconds = time.perf_counter() - start
+    tokens = sum(count_tokens(text) for text in texts)
+    return {"chunks": chunks, "chunks_per_s": round(chunks / seconds, 1), "tokens_per_s": round(tokens / seconds, 1)}
+
+
+def bench_embedding(chunks: List[str], batch_size: int, dim: int) -> Dict:
+    scheduler = EmbeddingScheduler(DeterministicFakeEmbedding(size=dim), batch_size=batch_size,
+                                   requests_per_minute=1e9)
+    start = time.perf_counter()
+    scheduler.embed_documents(chunks)
+    seconds = time.perf_counter() - start
+    return {"chunks": len(chunks), "batch_size": batch_size, "chunks_per_s": round(len(chunks) / seconds, 1)}
+
+
+def build_system(work_dir: Path, dim: int) -> RAGSystem:
+    """RAGSystem offline: índice local, embeddings deterministas y LLM de respuestas fijas."""
+    return RAGSystem(
+        data_dir=str(work_dir / "data"),
+        vector_store_backend="local",
+        local_index_dir=str(work_dir / "index"),
+        cache_dir=str(work_dir / "cache"),
+        embed_fn=DeterministicFakeEmbedding(size=dim),
+        llm=FakeListChatModel(responses=["Respuesta sintética basada en el contexto. Fuentes: documento."]),
+    )
+
+
+def run_benchmarks(work_dir: Path, files_per_format: int = 20, paragraphs: int = 30,
+                   n_queries: int = 50, dim: int = 768, batch_size: int = 100, seed: int = 0) -> Dict:
+    """Ejecuta todas las etapas sobre un corpus sintético en `work_dir` y devuelve los resultados."""
+    corpus = generate_corpus(work_dir / "data", files_per_format, paragraphs, seed)
+    texts = [read_document(path) for paths in corpus.values() for path in paths]
+    chunks = [chunk for text in texts for chunk, _ in iter_chunks(text)]
+    queries = synthetic_queries(n_queries)
+
+    results: Dict = {"parsing": bench_parsing(corpus), "chunking": bench_chunking(texts),
+                     "embedding": bench_embedding(chunks, batch_size, dim)}
+
+    # Con el índice local vacío, el constructor indexa todo `data_dir`
+    start = time.perf_counter()
+    rag = build_system(work_dir, dim)
+    rag.sync_index()
+    seconds = time.perf_counter() - start
+    n_files = sum(len(paths) for paths in corpus.values())
+    results["indexing"] = {"files": n_files, "chunks": rag.vector_store.count(),
+                           "files_per_s": round(n_files / seconds, 2),
+                           "chunks_per_s": round(rag.vector_store.count() / seconds, 1)}
+
+    # Consultas ya embebidas (como tras la caché de embeddings) para medir solo la recuperación
+    rag.embed_fn.embed_documents(queries)
+    retriever = rag.hybrid_retriever
+    results["retrieve"] = {"fetch_k": retriever.fetch_k,
+                           **latency_stats(time_each(lambda q: retriever.retrieve(q, k=rag.top_k), queries))}
+
+    retrieved = [retriever.retrieve(q, k=rag.top_k) for q in queries]
+    results["context"] = {"max_tokens": rag.context_max_tokens,
+                          **latency_stats(time_each(lambda docs: build_context(docs, rag.context_max_tokens), retrieved))}
+
+    # Preguntas distintas a las anteriores para no servirlas desde la caché de respuestas
+    end_to_end = [f"{q} (completa)" for q in queries]
+    results["query"] = latency_stats(time_each(rag.query, end_to_end))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Métricas que empeoran más de `tolerance` (fracción) respecto a `baseline`."""
+    regressions = []
+    current, previous = _flatten(results), _flatten(baseline)
+    for metric, value in current.items():
+        old = previous.get(metric)
+        if not old or not (metric.endswith("_ms") or metric.endswith("_per_s")):
+            continue
+        # En latencias (_ms) peor es mayor; en rendimiento (_per_s) peor es menor
+        change = (value - old) / old if metric.endswith("_ms") else (old - value) / old
+        verdict = f"{change:.1%} peor" if change > 0 else f"{-change:.1%} mejor"
+        print(f"{metric:<32} {old:>12} -> {value:<12} {verdict}")
+        if change > tolerance:
+            regressions.append(metric)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks offline de cada etapa del pipeline RAG.")
+    parser.add_argument("--files-per-format", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=30, help="Párrafos por archivo sintético.")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, default=None, help="Guarda los resultados en este JSON.")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON de una ejecución anterior con el que comparar.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Empeoramiento tolerado respecto a --baseline.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_benchmarks(Path(tmp), args.files_per_format, args.paragraphs, args.queries,
+                                 args.dim, args.batch_size, args.seed)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "results": results,
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        print(f"\nComparación con {args.baseline} (commit {baseline.get('commit')}):")
+        regressions = compare(results, baseline.get("results", baseline), args.tolerance)
+        if regressions:
+            print(f"Regresiones de más del {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
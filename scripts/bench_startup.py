@@ -0,0 +1,90 @@
+# scripts/bench_startup.py
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Puntos de entrada cuyo arranque medimos (API, Streamlit/CLI a través de rag.core)
+DEFAULT_MODULES = ["rag.core", "api.main", "ingest.chunking"]
+# Dependencias pesadas que solo deben cargarse al usarse por primera vez
+LAZY_MODULES = ["pinecone", "langchain_pinecone", "langchain_google_genai", "google.generativeai",
+                "pypdf", "docx", "openpyxl", "bs4"]
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def import_time(module: str) -> Dict:
+    """Importa `module` en un proceso nuevo con `-X importtime` y devuelve sus tiempos en ms."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        if self_us.isdigit():
+            rows.append((name, int(cumulative_us)))
+    cumulative = next(us for name, us in reversed(rows) if name == module)
+    # Paquetes de primer nivel (sin punto en el nombre) que más tardan en importarse
+    heaviest = sorted(((name, us) for name, us in rows if "." not in name), key=lambda row: -row[1])[:5]
+    return {"import_ms": cumulative / 1000, "process_ms": wall * 1000,
+            "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in heaviest]}
+
+
+def loaded_lazy_modules(module: str) -> List[str]:
+    """Dependencias de `LAZY_MODULES` que quedan cargadas tras importar `module`."""
+    code = (f"import json, sys; import {module}; "
+            f"print(json.dumps(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def bench_module(module: str, repeat: int) -> Dict:
+    runs = [import_time(module) for _ in range(repeat)]
+    return {
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "process_ms": round(statistics.median(run["process_ms"] for run in runs), 1),
+        "heaviest": runs[-1]["heaviest"],
+        "eager_heavy_imports": loaded_lazy_modules(module),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de arranque (python -X importtime) de los puntos de entrada.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="Procesos por módulo; se informa la mediana.")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Falla si la mediana de import de algún módulo supera este tiempo.")
+    parser.add_argument("--output", type=str, default=None, help="Guarda los resultados en este JSON.")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON de una ejecución anterior con el que comparar.")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Empeoramiento tolerado respecto a --baseline.")
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else {}
+    for module in args.modules:
+        row = results[module] = bench_module(module, args.repeat)
+        heaviest = ", ".join(f"{h['module']} {h['ms']}ms" for h in row["heaviest"])
+        print(f"{module:<20} import={row['import_ms']:>8.1f}ms  proceso={row['process_ms']:>8.1f}ms  ({heaviest})")
+        if row["eager_heavy_imports"]:
+            failures.append(f"{module} importa al arrancar: {', '.join(row['eager_heavy_imports'])}")
+        if args.budget_ms is not None and row["import_ms"] > args.budget_ms:
+            failures.append(f"{module} tarda {row['import_ms']}ms en importarse (presupuesto {args.budget_ms}ms)")
+        old = baseline.get(module, {}).get("import_ms")
+        if old and row["import_ms"] > old * (1 + args.tolerance):
+            failures.append(f"{module}: {old}ms -> {row['import_ms']}ms respecto a {args.baseline}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Resultados guardados en {args.output}")
+    for failure in failures:
+        print(f"REGRESIÓN: {failure}")
+    sys.exit(1 if failures else 0)
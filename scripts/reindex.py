@@ -1,5 +1,7 @@
 # scripts/reindex.py
 
+import argparse
+import logging
 import os
 import sys
 from pathlib import Path
@@ -16,10 +18,29 @@ from rag.core import RAGSystem
 load_dotenv(dotenv_path=str(ROOT / ".env"))
 
 if __name__ == "__main__":
-    print("Re-indexing all documents...")
+    parser = argparse.ArgumentParser(description="Sincroniza el índice vectorial con DATA_DIR.")
+    parser.add_argument("--full", action="store_true",
+                        help="Borra el índice y lo reconstruye desde cero en lugar de sincronizar incrementalmente.")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INGEST_WORKERS", "1")),
+                        help="Procesos para parsear archivos en paralelo (por defecto INGEST_WORKERS o 1). "
+                             "El tiempo máximo por archivo solo se aplica con más de un proceso.")
+    parser.add_argument("--media", action="store_true",
+                        help="Indexa también audio y vídeo transcribiéndolos (por defecto INDEX_MEDIA). Es lento: "
+                             "las transcripciones se guardan en la caché y solo se repiten si cambia el archivo.")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     # La inicialización ahora es mucho más simple y usa los defaults de la clase
     rag_system = RAGSystem(
         data_dir=os.getenv("DATA_DIR", "./data"),
+        parse_workers=args.workers,
+        index_media=args.media or None,
     )
-    rag_system.rebuild_index()
-    print("Re-indexing complete.")
+    if args.full:
+        print("Re-indexing all documents...")
+        rag_system.rebuild_index()
+        print("Re-indexing complete.")
+    else:
+        print("Syncing changed documents...")
+        summary = rag_system.sync_index()
+        print(f"Sync complete: {summary['added']} added, {summary['changed']} changed, {summary['removed']} removed.")
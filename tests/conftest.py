@@ -0,0 +1,35 @@
+# tests/conftest.py
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from rag.core import RAGSystem
+from rag.filters import matches
+
+class FilterableInMemoryVectorStore(InMemoryVectorStore):
+    """InMemoryVectorStore que acepta filtros con la sintaxis de Pinecone, como el resto de backends."""
+    def _similarity_search_with_score_by_vector(self, embedding, k=4, filter=None):
+        if isinstance(filter, dict):
+            metadata_filter = filter
+            filter = lambda doc: matches(metadata_filter, doc.metadata)
+        return super()._similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+@pytest.fixture
+def make_rag_system(tmp_path):
+    """Construye un RAGSystem offline: embeddings y LLM falsos y un vector store en memoria."""
+    def factory(documents=None, responses=None, **kwargs):
+        embed_fn = DeterministicFakeEmbedding(size=16)
+        vector_store = FilterableInMemoryVectorStore(embed_fn)
+        if documents:
+            vector_store.add_documents(documents)
+        kwargs.setdefault("cache_dir", str(tmp_path / "cache"))
+        kwargs.setdefault("data_dir", str(tmp_path / "data"))
+        return RAGSystem(
+            embed_fn=embed_fn,
+            llm=FakeListChatModel(responses=responses or ["Respuesta de prueba."]),
+            vector_store=vector_store,
+            **kwargs,
+        )
+    return factory
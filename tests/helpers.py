@@ -0,0 +1,19 @@
+# tests/helpers.py
+
+import functools
+import importlib.util
+from pathlib import Path
+
+_SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+
+@functools.lru_cache(maxsize=None)
+def load_script(name):
+    """Carga `scripts/<name>.py` como módulo (los scripts no forman un paquete importable)."""
+    spec = importlib.util.spec_from_file_location(name, _SCRIPTS / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def write_minimal_pdf(path, text, **kwargs):
+    """PDF de texto sin dependencias, el mismo que genera el benchmark de ingesta."""
+    load_script("bench_pipeline").write_minimal_pdf(path, text, **kwargs)
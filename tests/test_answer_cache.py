@@ -0,0 +1,48 @@
+# tests/test_answer_cache.py
+
+import time
+
+from rag.answer_cache import SemanticAnswerCache, bump_index_version
+
+def test_similar_question_hits_cache(tmp_path):
+    cache = SemanticAnswerCache(cache_dir=tmp_path, max_distance=0.05)
+    cache.put([1.0, 0.0, 0.0], "¿Cómo solicito vacaciones?", "Desde el portal.", ["vacaciones.txt"])
+
+    assert cache.get([0.99, 0.05, 0.0]) == {"answer": "Desde el portal.", "sources": ["vacaciones.txt"]}
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get_stats()["hit_rate"] == 0.5
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = SemanticAnswerCache(cache_dir=tmp_path, ttl=60)
+    cache.put([1.0, 0.0], "pregunta", "respuesta", [])
+    cache._created_at[:] = time.time() - 120
+
+    assert cache.get([1.0, 0.0]) is None
+
+def test_index_change_invalidates_other_instances(tmp_path):
+    cache = SemanticAnswerCache(cache_dir=tmp_path)
+    cache.put([1.0, 0.0], "pregunta", "respuesta", [])
+    assert SemanticAnswerCache(cache_dir=tmp_path).get([1.0, 0.0]) is not None
+
+    bump_index_version(tmp_path)
+
+    assert cache.get([1.0, 0.0]) is None
+    assert cache.stats["invalidations"] == 1
+    assert SemanticAnswerCache(cache_dir=tmp_path).get([1.0, 0.0]) is None
+
+def test_workers_sharing_cache_dir_keep_each_others_entries(tmp_path):
+    worker_a = SemanticAnswerCache(cache_dir=tmp_path)
+    worker_b = SemanticAnswerCache(cache_dir=tmp_path)
+    worker_a.put([1.0, 0.0], "pregunta A", "respuesta A", [])
+    worker_b.put([0.0, 1.0], "pregunta B", "respuesta B", [])
+
+    assert worker_a.get([0.0, 1.0])["answer"] == "respuesta B"
+    assert worker_b.get([1.0, 0.0])["answer"] == "respuesta A"
+    assert SemanticAnswerCache(cache_dir=tmp_path).get_stats()["entries"] == 2
+
+def test_max_entries_is_enforced_on_disk(tmp_path):
+    cache = SemanticAnswerCache(cache_dir=tmp_path, max_entries=2)
+    for i in range(4):
+        cache.put([1.0, float(i)], f"pregunta {i}", f"respuesta {i}", [])
+
+    assert SemanticAnswerCache(cache_dir=tmp_path, max_entries=2).get_stats()["entries"] == 2
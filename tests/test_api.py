@@ -0,0 +1,115 @@
+# tests/test_api.py
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document as LCDocument
+
+from api.main import app, get_rag_system
+from api.concurrency import QueryLimiter, QueueFullError, QueueTimeoutError
+
+@pytest.fixture
+def stub_rag_system(make_rag_system):
+    return make_rag_system(
+        documents=[
+            LCDocument(page_content="Las vacaciones se solicitan desde el portal del empleado.",
+                       metadata={"file_path": "data/rrhh/vacaciones.txt"}),
+        ],
+        responses=["Desde el portal del empleado."],
+    )
+
+@pytest.fixture
+def client(stub_rag_system):
+    app.dependency_overrides[get_rag_system] = lambda: stub_rag_system
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+def test_query_endpoint(client):
+    response = client.post("/query", json={"question": "¿Cómo solicito vacaciones?"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "answer": "Desde el portal del empleado.",
+        "sources": ["data/rrhh/vacaciones.txt"],
+    }
+
+def test_query_stream_endpoint(client):
+    response = client.post("/query/stream", json={"question": "¿Cómo solicito vacaciones?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: token" in response.text
+    assert response.text.rstrip().splitlines()[-2] == "event: sources"
+
+def test_limiter_rejects_when_queue_is_full():
+    async def scenario():
+        limiter = QueryLimiter(max_concurrency=1, max_queue=0)
+        async with limiter.slot():
+            with pytest.raises(QueueFullError):
+                await limiter.acquire()
+        assert limiter.active == 0
+
+    asyncio.run(scenario())
+
+def test_limiter_queue_timeout():
+    async def scenario():
+        limiter = QueryLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+        async with limiter.slot():
+            with pytest.raises(QueueTimeoutError):
+                await limiter.acquire()
+        assert limiter.waiting == 0
+
+    asyncio.run(scenario())
+
+def test_query_endpoint_passes_metadata_filters(client, stub_rag_system):
+    response = client.post("/query", json={"question": "¿Cómo solicito vacaciones?",
+                                           "filters": {"source_type": ["pdf"], "year": [2024]}})
+    assert response.status_code == 200
+    # Ningún chunk cumple el filtro, así que no hay fuentes
+    assert response.json()["sources"] == []
+
+def test_metrics_endpoint(client):
+    client.post("/query", json={"question": "¿Cómo solicito vacaciones?"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_duration_seconds_count{stage="api.query"}' in response.text
+
+def test_query_stream_times_out_and_releases_slot(client, stub_rag_system, monkeypatch):
+    async def slow_stream(prompt, filter=None):
+        yield {"type": "token", "token": "Desde"}
+        await asyncio.sleep(5)
+        yield {"type": "token", "token": " el portal"}
+    monkeypatch.setattr(stub_rag_system, "astream_query", slow_stream)
+    limiter = client.app.state.limiter
+    limiter.query_timeout = 0.1
+
+    response = client.post("/query/stream", json={"question": "¿Cómo solicito vacaciones?"})
+    assert "event: token" in response.text
+    assert response.text.rstrip().splitlines()[-2] == "event: error"
+    assert limiter.active == 0
+
+def test_stream_slot_is_released_if_body_never_starts():
+    from api.main import _SlotStreamingResponse
+
+    async def scenario():
+        limiter = QueryLimiter(max_concurrency=1)
+        await limiter.acquire()
+
+        async def body():
+            yield "data: nunca\n\n"
+
+        async def failing_send(message):
+            raise ConnectionResetError("cliente desconectado")
+
+        response = _SlotStreamingResponse(body(), limiter, media_type="text/event-stream")
+        async def receive():
+            await asyncio.sleep(10)
+
+        # Según la versión de Starlette el error llega tal cual o dentro de un ExceptionGroup
+        with pytest.raises(Exception):
+            await response({"type": "http", "asgi": {"spec_version": "2.3"}}, receive, failing_send)
+        assert limiter.active == 0
+        # El hueco vuelve a estar disponible
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+    asyncio.run(scenario())
@@ -0,0 +1,27 @@
+# tests/test_bench_pipeline.py
+
+import json
+
+from rag.core import read_document
+from tests.helpers import load_script
+
+bench = load_script("bench_pipeline")
+
+def test_synthetic_pdf_is_readable(tmp_path):
+    path = tmp_path / "informe.pdf"
+    bench.write_minimal_pdf(path, "Campaña (Aurora) 2024.\n\nSegundo párrafo del informe.", lines_per_page=2)
+    text = read_document(path)
+    assert "Campaña (Aurora) 2024." in text and "Segundo párrafo" in text
+
+def test_run_benchmarks_covers_every_stage(tmp_path):
+    results = bench.run_benchmarks(tmp_path, files_per_format=2, paragraphs=3, n_queries=3, dim=16)
+    assert set(results) == {"parsing", "chunking", "embedding", "indexing", "retrieve", "context", "query"}
+    assert set(results["parsing"]) == {"txt", "md", "docx", "pdf"}
+    assert results["indexing"]["files"] == 8 and results["indexing"]["chunks"] > 0
+    assert results["query"]["p99_ms"] >= results["query"]["p50_ms"] > 0
+    json.dumps(results)
+
+def test_compare_flags_regressions():
+    baseline = {"retrieve": {"p50_ms": 10.0}, "chunking": {"chunks_per_s": 100.0, "chunks": 5}}
+    current = {"retrieve": {"p50_ms": 12.0}, "chunking": {"chunks_per_s": 105.0, "chunks": 5}}
+    assert bench.compare(current, baseline, tolerance=0.1) == ["retrieve.p50_ms"]
@@ -0,0 +1,31 @@
+# tests/test_chunking.py
+
+from ingest.chunking import count_tokens, iter_chunk_spans, iter_chunks
+
+TEXT = ("Primera frase del informe. Segunda frase, algo más larga que la primera! ¿Tercera?\n\n" * 20
+        + "palabra " * 600)
+
+def test_chunks_respect_token_budget_and_sentence_boundaries():
+    spans = list(iter_chunk_spans(TEXT, max_tokens=64, overlap_tokens=16))
+    assert len(spans) > 1
+    assert all(count_tokens(TEXT, start, end) <= 64 for start, end in spans)
+    # Salvo en la parte sin puntuación, los cortes caen al final de una frase
+    for start, end in spans:
+        if end <= TEXT.index("palabra"):
+            assert TEXT[end - 1] in ".!?"
+
+def test_chunks_cover_the_text_in_order():
+    spans = list(iter_chunk_spans(TEXT, max_tokens=64, overlap_tokens=16))
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT.rstrip())
+    for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+        # Consecutivos: sin huecos salvo espacios y, a lo sumo, `overlap_tokens` de solapamiento
+        assert not TEXT[previous_end:start].strip()
+        assert start >= previous_end or count_tokens(TEXT, start, previous_end) <= 16
+
+def test_iter_chunks_records_offsets():
+    chunks = list(iter_chunks(TEXT, {"file_name": "a.txt"}, max_tokens=64))
+    for i, (text, metadata) in enumerate(chunks):
+        assert metadata["chunk_index"] == i
+        assert metadata["file_name"] == "a.txt"
+        assert TEXT[metadata["char_start"]:metadata["char_end"]] == text
+    assert list(iter_chunks("")) == []
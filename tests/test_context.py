@@ -0,0 +1,45 @@
+# tests/test_context.py
+
+from langchain_core.documents import Document as LCDocument
+
+from ingest.chunking import count_tokens, iter_chunks
+from rag.context import build_context, citation_header
+
+TEXT = "Frase número uno del informe anual. " * 60
+
+def _chunk_docs(text, file_name, **metadata):
+    return [LCDocument(page_content=chunk, metadata=meta)
+            for chunk, meta in iter_chunks(text, {"file_name": file_name, "file_path": f"/docs/{file_name}", **metadata},
+                                           max_tokens=64, overlap_tokens=16)]
+
+def test_overlapping_chunks_are_merged_once():
+    chunks = _chunk_docs(TEXT, "informe.pdf", source_type="pdf", year=2024)
+    # Recuperados fuera de orden: se fusionan en el orden del texto original
+    context = build_context([chunks[1], chunks[0], chunks[2]], max_tokens=10_000)
+    header, body = context.split("\n", 1)
+    assert header == "[1] informe.pdf (pdf, 2024)"
+    assert body == TEXT[chunks[0].metadata["char_start"]:chunks[2].metadata["char_end"]]
+
+def test_compact_headers_and_relevance_order():
+    a = LCDocument(page_content="Texto A.", metadata={"file_name": "a.txt", "source_type": "txt_md", "year": "unknown"})
+    b = LCDocument(page_content="Texto B.", metadata={"file_name": "b.mp4", "source_type": "video_audio"})
+    context = build_context([b, a])
+    assert context == "[1] b.mp4 (video_audio)\nTexto B.\n\n[2] a.txt (txt_md)\nTexto A."
+    assert citation_header(3, {}) == "[3] desconocido"
+
+def test_budget_truncates_the_last_passage():
+    first = _chunk_docs(TEXT, "a.pdf")[0]
+    second = _chunk_docs("otra " * 200, "b.pdf")[0]
+    context = build_context([first, second], max_tokens=120)
+    assert count_tokens(context) <= 120
+    assert context.startswith("[1] a.pdf\n")
+    assert "[2] b.pdf\n" in context and context.endswith(" […]")
+    # Sin sitio para un trozo útil, el pasaje se descarta entero
+    assert "[2]" not in build_context([first, second], max_tokens=count_tokens(first.page_content) + 10)
+
+def test_merging_is_transitive_in_any_retrieval_order():
+    chunks = _chunk_docs(TEXT, "informe.pdf")
+    # c0 y c2 no se solapan entre sí; c1 los une aunque llegue el último
+    context = build_context([chunks[0], chunks[2], chunks[1]], max_tokens=10_000)
+    assert context.count("[") == 1
+    assert context.split("\n", 1)[1] == TEXT[chunks[0].metadata["char_start"]:chunks[2].metadata["char_end"]]
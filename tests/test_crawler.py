@@ -0,0 +1,167 @@
+# tests/test_crawler.py
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ingest.crawler import CrawlCache, WebCrawler, _HostLimiter, crawl_site, normalize_url
+
+# Sitio de prueba: / -> /docs/a, /docs/b; /docs/a -> /docs/c; /docs/c -> /docs/d (profundidad 3)
+PAGES = {
+    "/": '<a href="/docs/a">A</a> <a href="/docs/b#seccion">B</a> <a href="https://otro.example/">fuera</a>',
+    "/docs/a": '<p>Página A</p><a href="c">C</a><a href="/">inicio</a>',
+    "/docs/b": '<p>Página B</p><a href="/docs/a">A</a>',
+    "/docs/c": '<p>Página C</p><a href="/docs/d">D</a>',
+    "/docs/d": '<p>Página D</p>',
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, time.monotonic()))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.latency)
+            body = PAGES.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            etag = f'"{hash(body)}"'
+            if self.headers.get("If-None-Match") == etag:
+                server.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            payload = f"<html><body>{body}</body></html>".encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.lock = threading.Lock()
+    server.requests, server.active, server.max_active, server.not_modified = [], 0, 0, 0
+    server.latency = 0.0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def _paths(pages):
+    return sorted(page.url.split("/", 3)[3] for page in pages)
+
+def test_normalize_url():
+    assert normalize_url("../b#x", "HTTP://Example.com/docs/a") == "http://example.com/b"
+    assert normalize_url("mailto:equipo@example.com") is None
+
+def test_depth_limit_and_dedupe(site):
+    crawler = WebCrawler(delay=0)
+    pages = crawl_site({"name": "prueba", "base_urls": [site.base_url], "crawl": True, "depth": 2}, crawler)
+
+    # /docs/d está a profundidad 3 y el enlace externo queda fuera del sitio
+    assert _paths(pages) == ["", "docs/a", "docs/b", "docs/c"]
+    assert sorted(path for path, _ in site.requests) == ["/", "/docs/a", "/docs/b", "/docs/c"]
+    assert {page.url: page.depth for page in pages}[site.base_url + "docs/c"] == 2
+    assert "Página A" in next(page.text for page in pages if page.url.endswith("/docs/a"))
+
+def test_crawl_false_fetches_only_base_urls(site):
+    pages = crawl_site({"base_urls": [site.base_url], "crawl": False, "depth": 2}, WebCrawler(delay=0))
+    assert _paths(pages) == [""]
+
+def test_recrawl_skips_unchanged_pages(site, tmp_path):
+    cache_path = tmp_path / "crawl_cache.json"
+    cache = CrawlCache(cache_path)
+    first = asyncio.run(WebCrawler(cache, delay=0).crawl([site.base_url], depth=3))
+    assert len(first) == 5
+    # Las páginas indexadas se confirman en la caché
+    for page in first:
+        cache.commit(page)
+    cache.save()
+
+    crawler = WebCrawler(CrawlCache(cache_path), delay=0)
+    second = asyncio.run(crawler.crawl([site.base_url], depth=3))
+    # Todas responden 304 y el recorrido sigue usando los enlaces guardados
+    assert second == [] and site.not_modified == 5
+    assert crawler.stats == {"fetched": 0, "unchanged": 5, "failed": 0}
+
+def test_rebuild_reuses_cached_text_of_unchanged_pages(site, tmp_path):
+    cache_path = tmp_path / "crawl_cache.json"
+    cache = CrawlCache(cache_path)
+    first = asyncio.run(WebCrawler(cache, delay=0).crawl([site.base_url], depth=3))
+    for page in first:
+        cache.commit(page)
+    cache.save()
+
+    # Un índice nuevo necesita todas las páginas, pero las que no cambian no se descargan
+    crawler = WebCrawler(CrawlCache(cache_path), delay=0, emit_unchanged=True)
+    second = asyncio.run(crawler.crawl([site.base_url], depth=3))
+    assert site.not_modified == 5 and crawler.stats["fetched"] == 0
+    assert {page.url: page.text for page in second} == {page.url: page.text for page in first}
+    assert all(page.cache_entry is None for page in second)
+
+def test_rebuild_fetches_cache_entries_without_text(site, tmp_path):
+    cache = CrawlCache()
+    for page in asyncio.run(WebCrawler(cache, delay=0).crawl([site.base_url])):
+        cache.commit(page)
+    del cache.entries[site.base_url]["text"]
+
+    pages = asyncio.run(WebCrawler(cache, delay=0, emit_unchanged=True).crawl([site.base_url]))
+    # Sin texto guardado la petición no es condicional; la entrada nueva lo incluye
+    assert site.not_modified == 0 and _paths(pages) == [""]
+    assert pages[0].cache_entry["text"] == pages[0].text
+
+def test_per_host_concurrency_and_politeness_delay(site):
+    site.latency = 0.05
+    crawler = WebCrawler(per_host_concurrency=1, delay=0.05)
+    asyncio.run(crawler.crawl([site.base_url], depth=1))
+
+    assert site.max_active == 1
+    starts = [start for _, start in site.requests]
+    assert all(b - a >= 0.05 for a, b in zip(starts, starts[1:]))
+
+def test_host_limiter_releases_its_slot_when_cancelled():
+    async def scenario():
+        limiter = _HostLimiter(concurrency=1, delay=0)
+        limiter._next_start = time.monotonic() + 60
+        waiting = asyncio.create_task(limiter.__aenter__())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        # El hueco del semáforo vuelve a estar libre
+        limiter._next_start = 0.0
+        await asyncio.wait_for(limiter.__aenter__(), timeout=1)
+        await limiter.__aexit__(None, None, None)
+
+    asyncio.run(scenario())
+
+def test_pages_not_committed_are_emitted_again(site, tmp_path):
+    cache_path = tmp_path / "crawl_cache.json"
+    cache = CrawlCache(cache_path)
+    first = asyncio.run(WebCrawler(cache, delay=0).crawl([site.base_url], depth=1))
+    # Solo se indexó la portada: el resto falló y no se confirma
+    cache.commit(next(page for page in first if page.url == site.base_url))
+    cache.save()
+
+    second = asyncio.run(WebCrawler(CrawlCache(cache_path), delay=0).crawl([site.base_url], depth=1))
+    assert _paths(second) == ["docs/a", "docs/b"]
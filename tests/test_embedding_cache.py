@@ -0,0 +1,76 @@
+# tests/test_embedding_cache.py
+
+import asyncio
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.embedding_cache import CachedEmbeddings
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+def test_repeated_queries_hit_memory_cache(tmp_path):
+    inner = CountingEmbeddings(size=8)
+    cached = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path)
+
+    first = cached.embed_query("¿Cómo solicito vacaciones?")
+    second = cached.embed_query("  ¿cómo solicito   vacaciones? ")
+
+    assert first == second
+    assert inner.calls == 1
+    assert cached.stats["memory_hits"] == 1
+    assert cached.stats["misses"] == 1
+
+def test_disk_cache_survives_restart(tmp_path):
+    inner = CountingEmbeddings(size=8)
+    expected = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path).embed_query("política de gastos")
+
+    restarted = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path)
+    assert restarted.embed_query("política de gastos") == expected
+    assert inner.calls == 1
+    assert restarted.stats["disk_hits"] == 1
+
+def test_async_queries_share_the_disk_cache(tmp_path):
+    inner = CountingEmbeddings(size=8)
+    expected = asyncio.run(CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path).aembed_query("política de gastos"))
+
+    restarted = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path)
+    assert asyncio.run(restarted.aembed_query("política de gastos")) == expected
+    assert inner.calls == 1
+    assert restarted.stats["disk_hits"] == 1
+
+def test_memory_tier_is_bounded_and_keyed_by_model(tmp_path):
+    inner = CountingEmbeddings(size=8)
+    cached = CachedEmbeddings(inner, model_name="fake", max_memory_items=2)
+    for text in ["a", "b", "c"]:
+        cached.embed_query(text)
+    assert cached.get_stats()["memory_items"] == 2
+
+    other_model = CachedEmbeddings(inner, model_name="other", cache_dir=tmp_path)
+    other_model.embed_query("a")
+    assert other_model.stats["misses"] == 1
+
+class CountingDocumentEmbeddings(DeterministicFakeEmbedding):
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+def test_document_embeddings_are_content_addressed(tmp_path):
+    inner = CountingDocumentEmbeddings(size=8, embedded=[])
+    first = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path).embed_documents(["uno", "dos"])
+
+    # Un reindexado posterior solo embebe el texto nuevo.
+    rebuild = CachedEmbeddings(inner, model_name="fake", cache_dir=tmp_path)
+    vectors = rebuild.embed_documents(["uno", "dos", "tres", "tres"])
+
+    assert vectors[:2] == first
+    assert vectors[2] == vectors[3]
+    assert inner.embedded == ["uno", "dos", "tres"]
+    assert rebuild.stats["document_hits"] == 2
+    assert rebuild.stats["document_misses"] == 1
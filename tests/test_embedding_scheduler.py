@@ -0,0 +1,65 @@
+# tests/test_embedding_scheduler.py
+
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.embedding_scheduler import EmbeddingScheduler, TokenBucket
+
+class RateLimitError(Exception):
+    status_code = 429
+
+class FlakyEmbeddings(DeterministicFakeEmbedding):
+    """Proveedor falso que devuelve un 429 en las primeras `failures` peticiones."""
+    failures: int = 0
+    batches: list = []
+
+    def embed_documents(self, texts):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RateLimitError("429 RESOURCE_EXHAUSTED")
+        self.batches.append(len(texts))
+        return super().embed_documents(texts)
+
+def test_batches_concurrently_and_preserves_order():
+    inner = FlakyEmbeddings(size=8, batches=[])
+    scheduler = EmbeddingScheduler(inner, batch_size=3, max_concurrency=3, requests_per_minute=60_000)
+    texts = [f"chunk {i}" for i in range(10)]
+
+    assert scheduler.embed_documents(texts) == inner.embed_documents(texts)
+    assert sorted(inner.batches[:4]) == [1, 3, 3, 3]
+    assert scheduler.stats["chunks"] == 10
+    assert scheduler.throughput()["chunks_per_second"] > 0
+
+def test_retries_rate_limit_errors():
+    inner = FlakyEmbeddings(size=8, failures=2, batches=[])
+    scheduler = EmbeddingScheduler(inner, batch_size=10, base_delay=0.0, requests_per_minute=60_000)
+
+    assert len(scheduler.embed_documents(["a", "b"])) == 2
+    assert scheduler.stats["retries"] == 2
+
+def test_gives_up_after_max_retries_and_does_not_retry_other_errors():
+    scheduler = EmbeddingScheduler(FlakyEmbeddings(size=8, failures=5, batches=[]),
+                                   max_retries=1, base_delay=0.0, requests_per_minute=60_000)
+    with pytest.raises(RateLimitError):
+        scheduler.embed_documents(["a"])
+
+    class Broken(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            raise ValueError("texto inválido")
+    scheduler = EmbeddingScheduler(Broken(size=8), base_delay=0.0)
+    with pytest.raises(ValueError):
+        scheduler.embed_documents(["a"])
+    assert scheduler.stats["retries"] == 0
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,70 @@
+# tests/test_lexical_index.py
+
+from langchain_core.documents import Document as LCDocument
+
+from rag.lexical_index import BM25Index, tokenize
+from rag.retriever import Retriever, reciprocal_rank_fusion
+
+def _doc(text, name):
+    return LCDocument(page_content=text, metadata={"file_path": name})
+
+def test_tokenize_folds_accents_stopwords_and_plurals():
+    assert tokenize("Las Campañas de Navidad 2024") == ["campana", "navidad", "2024"]
+    assert tokenize("ciudades y luces") == ["ciudad", "luz"]
+
+def test_bm25_ranks_exact_terms_and_handles_updates(tmp_path):
+    index = BM25Index(tmp_path / "bm25.sqlite")
+    index.add([_doc("Resultados de la campaña Verano Azul en redes", "a.txt"),
+               _doc("Informe general de campañas del año", "b.txt"),
+               _doc("Notas sin relación", "c.txt")], ["a", "b", "c"])
+
+    assert [doc.id for doc, _ in index.search("verano azul")] == ["a"]
+    assert [doc.id for doc, _ in index.search("campañas")][0] in {"a", "b"}
+
+    index.add([_doc("Campaña Verano Azul cancelada", "b.txt")], ["b"])
+    index.delete(["a"])
+    index.flush()
+    reopened = BM25Index(tmp_path / "bm25.sqlite")
+    assert reopened.count() == 2
+    results = reopened.search("verano azul")
+    assert [doc.id for doc, _ in results] == ["b"]
+    assert results[0][0].page_content == "Campaña Verano Azul cancelada"
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (LCDocument(id=i, page_content=i) for i in "abc")
+    fused = reciprocal_rank_fusion([[a, b], [c, b]])
+    assert [doc.id for doc, _ in fused] == ["b", "a", "c"]
+
+def test_hybrid_search_finds_docs_missed_by_dense_search(make_rag_system):
+    rag_system = make_rag_system(documents=[_doc("Texto genérico", "a.txt")])
+    lexical_index = BM25Index()
+    lexical_index.add([_doc("Lanzamiento del producto Zentrix", "z.txt")], ["z"])
+
+    retriever = Retriever(rag_system.vector_store, lexical_index, fetch_k=5)
+    assert "z.txt" in [doc.metadata["file_path"] for doc, _ in retriever.search("Zentrix", k=5)]
+
+def test_filters_apply_to_dense_and_lexical_search(make_rag_system):
+    docs = [
+        LCDocument(id="a", page_content="Novedades de TikTok Ads", metadata={"file_path": "a.txt", "year": 2023}),
+        LCDocument(id="b", page_content="Novedades de TikTok Ads", metadata={"file_path": "b.txt", "year": 2024}),
+    ]
+    rag_system = make_rag_system(documents=docs)
+    rag_system.lexical_index.add(docs, ["a", "b"])
+
+    found = rag_system.hybrid_retriever.search("TikTok Ads", k=5, filter={"year": {"$in": [2024]}})
+    assert [doc.metadata["file_path"] for doc, _ in found] == ["b.txt"]
+
+def test_changes_from_another_process_are_picked_up(tmp_path):
+    writer = BM25Index(tmp_path / "bm25.sqlite")
+    reader = BM25Index(tmp_path / "bm25.sqlite")
+    assert reader.search("verano azul") == []
+
+    writer.add([_doc("Campaña Verano Azul", "a.txt"), _doc("Otra campaña", "b.txt")], ["a", "b"])
+    writer.flush()
+    assert [doc.id for doc, _ in reader.search("verano azul")] == ["a"]
+
+    # Borrado y compactación en el otro proceso: la búsqueda no falla ni devuelve el chunk borrado
+    writer.delete(["a", "b"])
+    writer.add([_doc("Verano Azul, segunda edición", "c.txt")], ["c"])
+    writer.flush()
+    assert [doc.id for doc, _ in reader.search("verano azul")] == ["c"]
@@ -0,0 +1,117 @@
+# tests/test_local_store.py
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+from rag.core import RAGSystem
+from rag.local_store import LocalVectorStore
+
+def _store(tmp_path):
+    return LocalVectorStore(tmp_path / "index", DeterministicFakeEmbedding(size=32))
+
+def test_top_k_matches_brute_force(tmp_path):
+    store = _store(tmp_path)
+    texts = [f"chunk número {i}" for i in range(50)]
+    store.add_texts(texts, [{"i": i} for i in range(50)], ids=[str(i) for i in range(50)])
+
+    query = store.embeddings.embed_query("consulta")
+    vectors = np.array(store.embeddings.embed_documents(texts))
+    similarity = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    expected = [str(i) for i in np.argsort(-similarity)[:5]]
+
+    results = store.similarity_search_by_vector_with_score(query, k=5)
+    assert [doc.id for doc, _ in results] == expected
+    assert results[0][0].metadata == {"i": int(expected[0])}
+    assert np.isclose(results[0][1], similarity.max(), atol=1e-5)
+
+def test_upsert_delete_compact_and_reopen(tmp_path):
+    store = _store(tmp_path)
+    store.add_texts(["a", "b", "c"], ids=["1", "2", "3"])
+    store.add_texts(["b bis"], ids=["2"])
+    assert store.count() == 3
+    assert store.get_by_ids(["2"])[0].page_content == "b bis"
+
+    store.delete(ids=["1", "3"])
+    assert store.count() == 1
+    assert store._vectors_path.stat().st_size == 32 * 4  # compactado
+
+    reopened = _store(tmp_path)
+    assert [d.page_content for d in reopened.similarity_search("a", k=3)] == ["b bis"]
+
+def test_rag_system_builds_local_index_offline(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "vacaciones.txt").write_text("Las vacaciones se piden en el portal.", encoding="utf-8")
+
+    rag_system = RAGSystem(
+        data_dir=str(data_dir),
+        cache_dir=str(tmp_path / "cache"),
+        vector_store_backend="local",
+        local_index_dir=str(tmp_path / "index"),
+        embed_fn=DeterministicFakeEmbedding(size=16),
+        llm=FakeListChatModel(responses=["En el portal."]),
+    )
+
+    assert rag_system.vector_store.count() == 1
+    assert rag_system.query("¿Cómo pido vacaciones?") == {
+        "answer": "En el portal.",
+        "sources": [str(data_dir / "vacaciones.txt")],
+    }
+
+def test_ivf_index_incremental_insert_and_reopen(tmp_path):
+    def open_store():
+        return LocalVectorStore(tmp_path / "index", DeterministicFakeEmbedding(size=32),
+                                index_type="ivf", n_lists=8, n_probe=2, ann_min_rows=100)
+
+    store = open_store()
+    texts = [f"chunk número {i}" for i in range(200)]
+    store.add_texts(texts, ids=[str(i) for i in range(200)])
+    # Las búsquedas nunca entrenan: el entrenamiento es parte de la ingesta
+    store.similarity_search("consulta", k=10)
+    assert not store._ann.is_trained
+    store.flush()
+    exact = [doc.id for doc in store.similarity_search("consulta", k=10, n_probe=8)]
+    assert store._ann.is_trained
+    assert len(store.similarity_search("consulta", k=10)) == 10
+
+    # Las filas nuevas entran en su lista sin reentrenar
+    store.add_texts(["chunk añadido después"], ids=["nuevo"])
+    store.flush()
+    assert store._ann.trained_rows == 200
+    assert store.similarity_search("chunk añadido después", k=1)[0].id == "nuevo"
+
+    reopened = open_store()
+    assert reopened._ann.is_trained
+    assert [doc.id for doc in reopened.similarity_search("consulta", k=10, n_probe=8)] == exact
+
+def test_metadata_filter_only_scores_matching_chunks(tmp_path):
+    store = _store(tmp_path)
+    texts = [f"informe de campaña {i}" for i in range(40)]
+    metadatas = [{"source_type": "pdf" if i % 2 else "video_audio", "year": 2023 + i % 3} for i in range(40)]
+    store.add_texts(texts, metadatas, ids=[str(i) for i in range(40)])
+    metadata_filter = {"source_type": {"$in": ["pdf"]}, "year": {"$in": [2024]}}
+
+    results = store.similarity_search("campaña", k=40, filter=metadata_filter)
+    expected = {str(i) for i in range(40) if i % 2 and 2023 + i % 3 == 2024}
+    assert {doc.id for doc in results} == expected
+
+    # Los bitmaps siguen al día tras sobrescribir y compactar
+    store.add_texts(["informe reescrito"], [{"source_type": "pdf", "year": 2020}], ids=["1"])
+    store.delete(ids=[str(i) for i in range(2, 40)])
+    assert [doc.id for doc in store.similarity_search("informe", k=5, filter={"year": 2020})] == ["1"]
+    assert [doc.id for doc in store.similarity_search("informe", k=5, filter=metadata_filter)] == []
+
+def test_other_process_changes_are_picked_up(tmp_path):
+    api_store, reindex_store = _store(tmp_path), _store(tmp_path)
+    reindex_store.add_texts([f"chunk {i}" for i in range(6)], ids=[str(i) for i in range(6)])
+    assert api_store.count() == 6
+    assert len(api_store.similarity_search("chunk", k=6)) == 6
+
+    # Borrado con compactación en otro proceso: la matriz encoge y las filas se renumeran
+    reindex_store.delete(ids=["0", "1", "2", "3"])
+    assert {doc.id for doc in api_store.similarity_search("chunk", k=6)} == {"4", "5"}
+
+    reindex_store.add_texts(["chunk nuevo"], ids=["nuevo"])
+    assert api_store.count() == 3
+    assert api_store.similarity_search("chunk nuevo", k=1)[0].id == "nuevo"
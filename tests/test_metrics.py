@@ -0,0 +1,50 @@
+# tests/test_metrics.py
+
+import pytest
+from langchain_core.documents import Document as LCDocument
+
+from rag.metrics import CACHE_REQUESTS, LLM_TOKENS, REGISTRY, STAGE_ERRORS, STAGE_SECONDS, MetricsRegistry, span
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+def test_span_records_duration_and_errors():
+    with span("prueba"):
+        pass
+    with pytest.raises(RuntimeError):
+        with span("prueba"):
+            raise RuntimeError("fallo")
+    assert STAGE_SECONDS.snapshot(stage="prueba")["count"] == 2
+    assert STAGE_ERRORS.value(stage="prueba") == 1
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    latency = registry.histogram("demo_seconds", "Latencia.", ("stage",), buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="a")
+    latency.observe(0.5, stage="a")
+    registry.counter("demo_total", "Eventos.").inc(3)
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="a"} 2' in text
+    assert "demo_total 3" in text
+
+def test_query_records_stages_tokens_and_cache(make_rag_system):
+    rag = make_rag_system(
+        documents=[LCDocument(page_content="El presupuesto de 2024 fue de 3 millones.", metadata={"file_path": "a.txt"})],
+        responses=["Fueron 3 millones."],
+    )
+    rag.query("¿Cuál fue el presupuesto?")
+    rag.query("¿Cuál fue el presupuesto?")
+
+    for stage in ("query", "embed_query", "retrieve", "retrieve.dense", "context", "generate"):
+        assert STAGE_SECONDS.snapshot(stage=stage)["count"] >= 1, stage
+    # La segunda pregunta se sirve desde la caché y no vuelve a llamar al LLM
+    assert STAGE_SECONDS.snapshot(stage="generate")["count"] == 1
+    assert CACHE_REQUESTS.value(cache="answer", result="hit") == 1
+    assert LLM_TOKENS.value(kind="prompt") > 0 and LLM_TOKENS.value(kind="completion") > 0
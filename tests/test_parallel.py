@@ -0,0 +1,52 @@
+# tests/test_parallel.py
+
+import time
+
+import pytest
+
+from ingest.parallel import parallel_map
+from ingest.streaming import batched, prefetch
+
+def _parse(n):
+    if n == 3:
+        raise ValueError("archivo corrupto")
+    if n == 5:
+        time.sleep(5)
+    return n * n
+
+def test_parallel_matches_serial_and_isolates_errors():
+    items = [1, 2, 3, 4]
+    serial = list(parallel_map(_parse, items, max_workers=1))
+    progress = []
+    parallel = list(parallel_map(_parse, items, max_workers=3, progress_cb=lambda i, n: progress.append((i, n))))
+
+    assert [(i, r) for i, r, _ in parallel] == [(i, r) for i, r, _ in serial] == [(1, 1), (2, 4), (3, None), (4, 16)]
+    assert isinstance(parallel[2][2], ValueError)
+    assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+def test_per_file_timeout():
+    results = list(parallel_map(_parse, [5, 2], max_workers=2, timeout=0.5))
+
+    assert isinstance(results[0][2], TimeoutError)
+    assert results[1][1] == 4
+
+def test_hung_workers_do_not_make_later_files_time_out():
+    # Tantos archivos bloqueados como workers: sin reemplazar el pool, 2 y 4 también caducarían
+    results = list(parallel_map(_parse, [5, 5, 2, 4], max_workers=2, timeout=0.5))
+
+    assert [type(e) for _, _, e in results[:2]] == [TimeoutError, TimeoutError]
+    assert [(i, r, e) for i, r, e in results[2:]] == [(2, 4, None), (4, 16, None)]
+
+def test_batched_and_prefetch_preserve_order():
+    assert list(prefetch(batched(range(7), 3), maxsize=1)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_prefetch_propagates_producer_errors():
+    def broken():
+        yield 1
+        raise RuntimeError("parser roto")
+
+    consumed = []
+    with pytest.raises(RuntimeError):
+        for item in prefetch(broken()):
+            consumed.append(item)
+    assert consumed == [1]
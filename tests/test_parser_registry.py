@@ -0,0 +1,83 @@
+# tests/test_parser_registry.py
+
+import sys
+
+from docx import Document as DocxDocument
+
+from ingest.chunking import iter_section_chunks
+from ingest.parsers.registry import PARSERS, ParserRegistry, ParserSpec, sniff_mime, source_type_for
+from rag.core import get_document_metadata
+from tests.helpers import write_minimal_pdf
+
+def test_dispatch_by_extension():
+    assert PARSERS.for_path("informe.PDF").name == "pdf"
+    assert PARSERS.for_path("notas.md").name == "txt"
+    assert PARSERS.for_path("desconocido.xyz") is None
+
+def test_placeholders_are_excluded_unless_requested():
+    assert PARSERS.for_path("slides.pptx") is None
+    assert PARSERS.for_path("slides.pptx", include_placeholders=True).name == "pptx"
+    assert ".pptx" not in PARSERS.extensions() and ".pptx" in PARSERS.extensions(include_placeholders=True)
+
+def test_sniffs_files_without_extension(tmp_path):
+    pdf = tmp_path / "informe"
+    write_minimal_pdf(pdf, "Texto del informe.")
+    document = DocxDocument()
+    document.add_paragraph("Texto del documento.")
+    docx = tmp_path / "documento.bin"
+    document.save(str(docx))
+
+    assert sniff_mime(pdf) == "application/pdf"
+    assert PARSERS.for_path(pdf).name == "pdf"
+    assert PARSERS.for_path(docx).name == "docx"
+    assert PARSERS.read_text(docx) == "Texto del documento."
+    assert get_document_metadata(docx)["source_type"] == "docx"
+    assert PARSERS.for_path(docx, sniff=False) is None
+
+def test_sniffs_text_files_without_extension(tmp_path):
+    (tmp_path / "notas").write_text("Reunión de equipo: revisar presupuestos.\nSiguiente paso pendiente.\n")
+    (tmp_path / "guia").write_text("# Onboarding\n\nPrimeros pasos en Labelix.\n")
+    (tmp_path / "ventas").write_text("mes;importe;región\nenero;100;norte\nfebrero;120;sur\n")
+    (tmp_path / "binario").write_bytes(b"\x00\x01\x02datos")
+
+    assert sniff_mime(tmp_path / "notas") == "text/plain"
+    assert sniff_mime(tmp_path / "guia") == "text/markdown"
+    assert sniff_mime(tmp_path / "ventas") == "text/csv"
+    assert sniff_mime(tmp_path / "binario") is None
+    assert PARSERS.for_path(tmp_path / "guia").name == "txt"
+    assert PARSERS.read_text(tmp_path / "ventas") == "mes | importe | región\nenero | 100 | norte\nfebrero | 120 | sur"
+
+def test_source_type_of_transcripts():
+    path = "data/transcripciones_tiktok/video1.txt"
+    assert source_type_for(path, PARSERS.for_path(path)) == "video_audio"
+    assert source_type_for("data/nota.txt", PARSERS.for_path("data/nota.txt")) == "txt_md"
+
+def test_parser_module_is_imported_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / "plugins_demo").mkdir()
+    (tmp_path / "plugins_demo" / "__init__.py").write_text("")
+    (tmp_path / "plugins_demo" / "parser.py").write_text(
+        "def load(path):\n    return 'uno'\n"
+        "def sections(path):\n    yield 'uno', {'page': 1}\n    yield 'dos', {'page': 2}\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    registry = ParserRegistry()
+    registry.register(ParserSpec("demo", "plugins_demo.parser", "load", (".demo",), "demo",
+                                 streaming="page", section_function="sections"))
+    (tmp_path / "a.demo").write_text("x")
+
+    assert registry.for_path(tmp_path / "a.demo").name == "demo"
+    assert "plugins_demo.parser" not in sys.modules
+    assert list(registry.iter_sections(tmp_path / "a.demo")) == [("uno", {"page": 1}), ("dos", {"page": 2})]
+    assert registry.read_text(tmp_path / "a.demo") == "uno\ndos"
+    assert "plugins_demo.parser" in sys.modules
+    for name in ("plugins_demo", "plugins_demo.parser"):
+        monkeypatch.delitem(sys.modules, name)
+
+def test_section_chunks_keep_section_metadata_and_global_offsets():
+    sections = [("Primera página.", {"page": 1}), ("Segunda página.", {"page": 2})]
+    full_text = "\n".join(text for text, _ in sections)
+    chunks = list(iter_section_chunks(sections, {"file_name": "a.pdf"}))
+    assert [meta["page"] for _, meta in chunks] == [1, 2]
+    assert [meta["chunk_index"] for _, meta in chunks] == [0, 1]
+    for text, meta in chunks:
+        assert meta["file_name"] == "a.pdf"
+        assert full_text[meta["char_start"]:meta["char_end"]] == text
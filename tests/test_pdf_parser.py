@@ -0,0 +1,45 @@
+# tests/test_pdf_parser.py
+
+from langchain_core.documents import Document as LCDocument
+
+from ingest.parsers import pdf
+from rag.context import citation_header, build_context
+from rag.core import read_document, read_sections
+from tests.helpers import write_minimal_pdf
+
+def _write_pdf(path, pages):
+    write_minimal_pdf(path, "\n".join(f"Contenido de la página {n}." for n in range(1, pages + 1)), lines_per_page=1)
+
+def test_pages_are_emitted_with_their_number(tmp_path):
+    path = tmp_path / "informe.pdf"
+    _write_pdf(path, 3)
+
+    pages = list(pdf.iter_pdf_pages(str(path)))
+    assert [meta for _, meta in pages] == [{"page": 1}, {"page": 2}, {"page": 3}]
+    assert "página 2" in pages[1][0]
+    assert read_document(path) == "\n".join(text for text, _ in pages)
+
+def test_page_ranges_in_parallel_match_serial(tmp_path, monkeypatch):
+    path = tmp_path / "informe.pdf"
+    _write_pdf(path, 7)
+    monkeypatch.setattr(pdf, "PAGES_PER_TASK", 2)
+
+    serial = list(pdf.iter_pdf_pages(str(path), workers=1))
+    parallel = list(pdf.iter_pdf_pages(str(path), workers=3, min_pages=1))
+    assert parallel == serial and len(serial) == 7
+
+def test_chunks_and_citations_carry_the_page(tmp_path, make_rag_system):
+    rag = make_rag_system()
+    rag.data_dir.mkdir(parents=True)
+    _write_pdf(rag.data_dir / "informe.pdf", 3)
+
+    chunks, ids = rag._chunk_file("informe.pdf", read_sections(rag.data_dir / "informe.pdf"))
+    assert [chunk.metadata["page"] for chunk in chunks] == [1, 2, 3]
+    assert len(ids) == 3
+    assert citation_header(1, chunks[1].metadata).endswith("(pdf, p. 2)")
+    # Chunks contiguos de páginas distintas se fusionan en un pasaje que cita el rango
+    assert build_context([chunks[1], chunks[2]]).startswith("[1] informe.pdf (pdf, pp. 2-3)")
+
+def test_page_metadata_is_optional():
+    assert citation_header(1, {"file_name": "a.txt", "source_type": "txt_md"}) == "[1] a.txt (txt_md)"
+    assert build_context([LCDocument(page_content="Hola.", metadata={"file_name": "a.txt"})]) == "[1] a.txt\nHola."
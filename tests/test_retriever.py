@@ -0,0 +1,45 @@
+# tests/test_retriever.py
+
+from pathlib import Path
+
+from langchain_core.documents import Document as LCDocument
+
+from rag import retriever as retriever_module
+from rag.core import get_document_metadata
+from rag.retriever import Retriever, static_score
+
+def _doc(id_, **metadata):
+    return LCDocument(id=id_, page_content=id_, metadata=metadata)
+
+class _FixedSearch(Retriever):
+    def __init__(self, results):
+        super().__init__(vector_store=None)
+        self.results = results
+
+    def search(self, query, k=10, fetch_k=None, filter=None):
+        return self.results[:k]
+
+def test_static_score_is_computed_at_ingestion(tmp_path):
+    metadata = get_document_metadata(tmp_path / "transcripciones_tiktok" / "clip.txt")
+    assert metadata["static_score"] == static_score(metadata) == 300
+
+def test_year_bonus_uses_the_year_extracted_from_posix_paths():
+    metadata = get_document_metadata(Path("informes/2023/memoria.pdf"))
+    assert metadata["year"] == 2023
+    assert metadata["static_score"] == 223
+
+def test_retrieve_ranks_by_static_score_then_fused_score(monkeypatch):
+    results = [
+        (_doc("web", static_score=100), 0.03),
+        (_doc("video", static_score=300), 0.01),
+        (_doc("pdf_a", static_score=220), 0.02),
+        (_doc("pdf_b", static_score=220), 0.025),
+    ]
+    # La prioridad precalculada evita recalcularla en cada consulta
+    monkeypatch.setattr(retriever_module, "static_score", lambda metadata: 1 / 0)
+    ranked = _FixedSearch(results).retrieve("consulta", k=3)
+    assert [doc.id for doc in ranked] == ["video", "pdf_b", "pdf_a"]
+
+def test_retrieve_falls_back_for_chunks_without_static_score():
+    results = [(_doc("txt", source_type="txt_md"), 0.01), (_doc("otro", source_type="unknown"), 0.03)]
+    assert [doc.id for doc in _FixedSearch(results).retrieve("consulta", k=2)] == ["txt", "otro"]
@@ -0,0 +1,22 @@
+# tests/test_startup.py
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+_SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "bench_startup.py"
+_spec = importlib.util.spec_from_file_location("bench_startup", _SCRIPT)
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+@pytest.mark.parametrize("module", ["rag.core", "api.main"])
+def test_heavy_dependencies_are_imported_lazily(module):
+    assert bench.loaded_lazy_modules(module) == []
+
+def test_rag_system_construction_does_not_create_providers(tmp_path):
+    from rag.core import RAGSystem
+    rag = RAGSystem(data_dir=str(tmp_path / "data"), vector_store_backend="local",
+                    local_index_dir=str(tmp_path / "index"), cache_dir=str(tmp_path / "cache"))
+    # Ni el índice ni el LLM se crean hasta la primera consulta
+    assert rag._vector_store is None and "llm" not in vars(rag)
@@ -0,0 +1,180 @@
+# tests/test_sync_index.py
+
+import pytest
+
+def _indexed_ids(rag_system):
+    return set(rag_system.vector_store.store)
+
+@pytest.mark.parametrize("parse_workers", [1, 2])
+def test_sync_only_touches_changed_files(make_rag_system, tmp_path, parse_workers):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Documento A " * 200, encoding="utf-8")
+    (data_dir / "b.txt").write_text("Documento B", encoding="utf-8")
+    rag_system = make_rag_system(parse_workers=parse_workers)
+
+    assert rag_system.sync_index() == {"added": 2, "changed": 0, "removed": 0}
+    ids_a = rag_system.manifest.entries["a.txt"]["chunk_ids"]
+    assert len(ids_a) > 1
+    assert _indexed_ids(rag_system) == set(ids_a) | set(rag_system.manifest.entries["b.txt"]["chunk_ids"])
+
+    assert rag_system.sync_index() == {"added": 0, "changed": 0, "removed": 0}
+
+    (data_dir / "a.txt").write_text("Documento A reducido", encoding="utf-8")
+    (data_dir / "b.txt").unlink()
+    assert rag_system.sync_index() == {"added": 0, "changed": 1, "removed": 1}
+    assert _indexed_ids(rag_system) == {ids_a[0]}
+    assert rag_system.vector_store.store[ids_a[0]]["text"] == "Documento A reducido"
+
+def test_manifest_persists_between_instances(make_rag_system, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Documento A", encoding="utf-8")
+    make_rag_system().sync_index()
+
+    assert make_rag_system().sync_index() == {"added": 0, "changed": 0, "removed": 0}
+
+def test_chunks_are_uploaded_in_fixed_size_batches(make_rag_system, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ["a", "b", "c"]:
+        (data_dir / f"{name}.txt").write_text(f"Documento {name} " * 300, encoding="utf-8")
+    rag_system = make_rag_system(upsert_batch_size=3)
+
+    batch_sizes = []
+    add_documents = rag_system.vector_store.add_documents
+    def recording_add_documents(documents, **kwargs):
+        batch_sizes.append(len(documents))
+        return add_documents(documents, **kwargs)
+    rag_system.vector_store.add_documents = recording_add_documents
+
+    rag_system.sync_index()
+
+    total = sum(len(e["chunk_ids"]) for e in rag_system.manifest.entries.values())
+    assert sum(batch_sizes) == total == len(rag_system.vector_store.store)
+    assert all(size == 3 for size in batch_sizes[:-1])
+
+def test_failed_batch_only_affects_its_files(make_rag_system, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Documento A", encoding="utf-8")
+    (data_dir / "b.txt").write_text("Documento B", encoding="utf-8")
+    rag_system = make_rag_system(upsert_batch_size=1)
+
+    add_documents = rag_system.vector_store.add_documents
+    def flaky_add_documents(documents, **kwargs):
+        if documents[0].page_content == "Documento A":
+            raise ConnectionError("upsert fallido")
+        return add_documents(documents, **kwargs)
+    rag_system.vector_store.add_documents = flaky_add_documents
+
+    rag_system.sync_index()
+
+    assert list(rag_system.manifest.entries) == ["b.txt"]
+    rag_system.vector_store.add_documents = add_documents
+    assert rag_system.sync_index() == {"added": 1, "changed": 0, "removed": 0}
+
+def test_large_files_are_chunked_and_uploaded_while_parsing(make_rag_system, tmp_path, monkeypatch):
+    from ingest.parsers.registry import PARSERS
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "grande.txt").write_text("x", encoding="utf-8")
+    (data_dir / "roto.txt").write_text("x", encoding="utf-8")
+    produced = []
+
+    def iter_sections(path):
+        for n in range(60):
+            if path.name == "roto.txt" and n == 30:
+                raise ValueError("archivo corrupto")
+            produced.append(n)
+            yield f"Sección número {n}.", {"page": n + 1}
+    monkeypatch.setattr(PARSERS, "iter_sections", iter_sections)
+    rag_system = make_rag_system(upsert_batch_size=4)
+
+    produced_at_upload = []
+    add_documents = rag_system.vector_store.add_documents
+    def recording_add_documents(documents, **kwargs):
+        produced_at_upload.append(len(produced))
+        return add_documents(documents, **kwargs)
+    rag_system.vector_store.add_documents = recording_add_documents
+
+    rag_system.sync_index()
+
+    # La primera subida llega antes de terminar de parsear: el archivo no se materializa entero
+    assert produced_at_upload[0] < 20
+    assert len(rag_system.manifest.entries["grande.txt"]["chunk_ids"]) == 60
+    # Un error a mitad de archivo solo descarta ese archivo
+    assert list(rag_system.manifest.entries) == ["grande.txt"]
+
+def test_new_file_failing_midway_leaves_no_orphan_chunks(make_rag_system, tmp_path, monkeypatch):
+    from ingest.parsers.registry import PARSERS
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "bueno.txt").write_text("x", encoding="utf-8")
+    (data_dir / "roto.txt").write_text("x", encoding="utf-8")
+
+    def iter_sections(path):
+        for n in range(30 if path.name == "roto.txt" else 5):
+            yield f"Sección número {n}.", {"page": n + 1}
+        if path.name == "roto.txt":
+            raise ValueError("archivo corrupto")
+    monkeypatch.setattr(PARSERS, "iter_sections", iter_sections)
+    rag_system = make_rag_system(upsert_batch_size=4)
+
+    rag_system.sync_index()
+
+    # Los lotes de roto.txt subidos antes del fallo se borran del vector store y del BM25
+    kept_ids = rag_system.manifest.entries["bueno.txt"]["chunk_ids"]
+    assert list(rag_system.manifest.entries) == ["bueno.txt"]
+    assert set(rag_system.vector_store.store) == set(kept_ids)
+    assert rag_system.lexical_index.count() == len(kept_ids) == 5
+
+def test_sync_keeps_bm25_index_in_step(make_rag_system, tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Campaña Verano Azul", encoding="utf-8")
+    (data_dir / "b.txt").write_text("Documento B", encoding="utf-8")
+    rag_system = make_rag_system()
+    rag_system.sync_index()
+    assert rag_system.lexical_index.count() == 2
+
+    (data_dir / "a.txt").unlink()
+    rag_system.sync_index()
+    assert rag_system.lexical_index.count() == 1
+    assert rag_system.lexical_index.search("verano azul") == []
+
+def test_index_without_manifest_is_rebuilt_instead_of_duplicated(tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models import FakeListChatModel
+    from rag.core import RAGSystem
+
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("Documento A", encoding="utf-8")
+    kwargs = dict(data_dir=str(data_dir), cache_dir=str(tmp_path / "cache"), vector_store_backend="local",
+                  local_index_dir=str(tmp_path / "index"), embed_fn=DeterministicFakeEmbedding(size=16),
+                  llm=FakeListChatModel(responses=["Respuesta."]))
+    # Índice de una versión anterior: el mismo chunk con un ID aleatorio y sin manifiesto
+    legacy = RAGSystem(**kwargs)
+    legacy.vector_store.add_texts(["Documento A"], [{"file_path": str(data_dir / "a.txt")}], ids=["3f2c9a"])
+    legacy.vector_store.delete(ids=legacy.manifest.entries["a.txt"]["chunk_ids"])
+    (tmp_path / "index" / "manifest.json").unlink()
+
+    rag_system = RAGSystem(**kwargs)
+    assert rag_system.sync_index() == {"added": 1, "changed": 0, "removed": 0}
+    assert rag_system.vector_store.count() == 1
+    assert rag_system.vector_store.get_by_ids(["3f2c9a"]) == []
+
+def test_progress_is_reported_from_the_calling_thread(make_rag_system, tmp_path):
+    import threading
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ["a", "b", "c"]:
+        (data_dir / f"{name}.txt").write_text(f"Documento {name}", encoding="utf-8")
+    calls = []
+    rag_system = make_rag_system(progress_cb=lambda stage, i, n: calls.append((threading.current_thread(), i, n)))
+
+    rag_system.sync_index()
+
+    assert [(i, n) for _, i, n in calls] == [(1, 3), (2, 3), (3, 3)]
+    assert all(thread is threading.current_thread() for thread, _, _ in calls)
@@ -0,0 +1,109 @@
+# tests/test_transcription.py
+
+import wave
+
+import numpy as np
+
+from ingest.transcription import TRANSCRIBERS, Transcriber, load_audio, split_on_silence, transcribe_media
+from rag.context import citation_header
+from rag.core import read_sections
+
+RATE = 8000
+
+
+class StubTranscriber(Transcriber):
+    """Devuelve la duración del segmento en lugar de transcribirlo."""
+    name = "stub"
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, sample_rate):
+        self.calls += 1
+        return f"Segmento de {len(audio) / sample_rate:.2f} segundos."
+
+
+def _write_wav(path, bursts=8, tone_seconds=4.0, silence_seconds=0.5):
+    """Tonos de `tone_seconds` separados por silencios; devuelve los intervalos de silencio (en muestras)."""
+    t = np.arange(int(tone_seconds * RATE)) / RATE
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    silence = np.zeros(int(silence_seconds * RATE))
+    parts, silences, position = [], [], 0
+    for _ in range(bursts):
+        parts += [tone, silence]
+        position += len(tone)
+        silences.append((position, position + len(silence)))
+        position += len(silence)
+    audio = np.concatenate(parts)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return silences
+
+def test_segments_are_cut_in_silences(tmp_path):
+    path = tmp_path / "video.wav"
+    silences = _write_wav(path)
+    audio, rate = load_audio(str(path))
+
+    segments = split_on_silence(audio, rate, min_seconds=3, max_seconds=6)
+    assert segments[0][0] == 0 and segments[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    for _, cut in segments[:-1]:
+        assert any(start <= cut <= end for start, end in silences)
+        assert np.abs(audio[cut:cut + 100]).max() < 1e-3
+
+def test_parallel_transcription_matches_serial(tmp_path):
+    path = tmp_path / "video.wav"
+    _write_wav(path)
+    kwargs = dict(cache_dir="", min_seconds=3, max_seconds=6)
+
+    serial = transcribe_media(str(path), StubTranscriber(), workers=1, **kwargs)
+    parallel = transcribe_media(str(path), StubTranscriber(), workers=3, **kwargs)
+    assert parallel == serial and len(serial) > 1
+    assert serial[0].start == 0 and all(a.end == b.start for a, b in zip(serial, serial[1:]))
+
+def test_transcripts_are_cached_by_file_hash(tmp_path):
+    _write_wav(tmp_path / "video.wav")
+    (tmp_path / "copia.wav").write_bytes((tmp_path / "video.wav").read_bytes())
+    transcriber = StubTranscriber()
+    cache_dir = str(tmp_path / "transcripts")
+
+    first = transcribe_media(str(tmp_path / "video.wav"), transcriber, cache_dir=cache_dir)
+    calls = transcriber.calls
+    # Mismo contenido con otro nombre: se reutiliza la transcripción
+    assert transcribe_media(str(tmp_path / "copia.wav"), transcriber, cache_dir=cache_dir) == first
+    assert transcriber.calls == calls
+
+def test_chunks_carry_timestamps(tmp_path, monkeypatch, make_rag_system):
+    monkeypatch.setitem(TRANSCRIBERS, "stub", StubTranscriber)
+    monkeypatch.setenv("TRANSCRIBER_BACKEND", "stub")
+    monkeypatch.setenv("TRANSCRIPT_CACHE_DIR", str(tmp_path / "transcripts"))
+    rag = make_rag_system()
+    (rag.data_dir / "transcripciones_tiktok").mkdir(parents=True)
+    path = rag.data_dir / "transcripciones_tiktok" / "video.wav"
+    _write_wav(path, bursts=16)
+
+    chunks, _ = rag._chunk_file("transcripciones_tiktok/video.wav", read_sections(path))
+    assert chunks[0].metadata["time_start"] == 0 and chunks[-1].metadata["time_end"] == 72.0
+    assert all(c.metadata["time_start"] < c.metadata["time_end"] for c in chunks)
+    assert all(c.metadata["source_type"] == "video_audio" for c in chunks)
+    assert citation_header(1, chunks[0].metadata).startswith("[1] video.wav (video_audio, 00:00-00:")
+
+def test_media_is_indexed_only_when_enabled(tmp_path, monkeypatch, make_rag_system):
+    monkeypatch.setitem(TRANSCRIBERS, "stub", StubTranscriber)
+    monkeypatch.setenv("TRANSCRIBER_BACKEND", "stub")
+    monkeypatch.delenv("INDEX_MEDIA", raising=False)
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _write_wav(data_dir / "video.wav")
+    (data_dir / "nota.txt").write_text("Nota", encoding="utf-8")
+
+    assert make_rag_system().sync_index() == {"added": 1, "changed": 0, "removed": 0}
+
+    rag = make_rag_system(index_media=True, parse_workers=2)
+    assert rag.sync_index() == {"added": 1, "changed": 0, "removed": 0}
+    assert rag.manifest.entries["video.wav"]["chunk_ids"]
+    # La transcripción se guarda en la caché del RAGSystem
+    assert list((rag.cache_dir / "transcripts").glob("*-stub.json"))
@@ -0,0 +1,69 @@
+# tests/test_xlsx_parser.py
+
+import itertools
+
+import pytest
+
+from ingest.parsers.registry import PARSERS
+from ingest.parsers.xlsx import _group_rows, iter_row_groups
+from rag.core import get_document_metadata, read_sections
+
+def _write_csv(path, rows, delimiter=","):
+    lines = ["Campaña,Impresiones,Clics".replace(",", delimiter)]
+    lines += [delimiter.join([f"Campaña {i}", str(i * 100), str(i)]) for i in range(1, rows + 1)]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+def test_csv_row_groups_repeat_the_header(tmp_path):
+    path = tmp_path / "campanas.csv"
+    _write_csv(path, 40)
+
+    groups = list(iter_row_groups(str(path), max_tokens=60))
+    assert len(groups) > 1
+    for text, _ in groups:
+        assert text.splitlines()[0] == "Campaña | Impresiones | Clics"
+    assert groups[0][1]["row_start"] == 2 and groups[-1][1]["row_end"] == 41
+    # Los grupos cubren todas las filas, sin huecos ni repeticiones
+    assert all(a[1]["row_end"] + 1 == b[1]["row_start"] for a, b in zip(groups, groups[1:]))
+    assert sum(len(text.splitlines()) - 1 for text, _ in groups) == 40
+
+def test_csv_delimiter_is_detected_and_empty_rows_skipped(tmp_path):
+    path = tmp_path / "campanas.csv"
+    path.write_text("Campaña;Clics\n\nAurora;5\n;\nBoreal;7\n", encoding="utf-8")
+
+    assert list(iter_row_groups(str(path))) == [
+        ("Campaña | Clics\nAurora | 5\nBoreal | 7", {"row_start": 3, "row_end": 5})]
+
+def test_header_only_sheet_is_emitted_as_its_own_group():
+    rows = [(1, ["", None]), (2, ["Campaña", "Clics"]), (3, [None, ""])]
+    assert list(_group_rows(rows, "Plantilla", max_tokens=60)) == [
+        ("Campaña | Clics", {"sheet": "Plantilla", "row_start": 2, "row_end": 2})]
+    assert list(_group_rows([(1, [None])], "Vacía", max_tokens=60)) == []
+
+def test_spreadsheets_are_indexed_as_xlsx_csv(tmp_path):
+    path = tmp_path / "campanas.csv"
+    _write_csv(path, 3)
+
+    assert PARSERS.for_path(path).name == "xlsx"
+    assert get_document_metadata(path)["source_type"] == "xlsx_csv"
+    assert read_sections(path)[0][1] == {"row_start": 2, "row_end": 4}
+
+def test_xlsx_sheets_are_streamed(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook(write_only=True)
+    for title in ("Enero", "Febrero"):
+        sheet = workbook.create_sheet(title)
+        sheet.append(["Campaña", "Clics"])
+        sheet.append([f"Aurora {title}", 5])
+    path = tmp_path / "campanas.xlsx"
+    workbook.save(str(path))
+
+    assert list(iter_row_groups(str(path))) == [
+        ("Campaña | Clics\nAurora Enero | 5", {"sheet": "Enero", "row_start": 2, "row_end": 2}),
+        ("Campaña | Clics\nAurora Febrero | 5", {"sheet": "Febrero", "row_start": 2, "row_end": 2}),
+    ]
+
+def test_row_groups_are_lazy():
+    # Un flujo de filas sin fin: solo se lee lo necesario para el primer grupo
+    rows = ((n, ["Campaña", "Clics"] if n == 1 else [f"Campaña {n}", n]) for n in itertools.count(1))
+    text, metadata = next(_group_rows(rows, "Hoja1", max_tokens=40))
+    assert metadata["sheet"] == "Hoja1" and metadata["row_start"] == 2